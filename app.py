@@ -1,8 +1,13 @@
+import json
 import sys
+from typing import Any, Iterable, Optional, TextIO
 from wgups.truck import Truck
-from wgups.package import Package
-from datastructures.hashmap import HashMap
-from utils import clock_to_minutes
+from wgups.package import EOD, Package
+from wgups.indexes import PackageIndex
+from wgups.store import PackageStore
+from wgups.timeline import StatusTimeline
+from datastructures import IntHashMap
+from utils import clock_to_minutes, minutes_to_clock
 
 instructions = '''
 Please select an option from the list:
@@ -10,8 +15,16 @@ Please select an option from the list:
     2. Get info on all packages
     3. Get one-liner info on all packages
     4. Get info on truck travel distance
+    5. Get package counts by status
+    6. Get packages whose status changed between two times
+    7. Find packages by zipcode, city, address, truck, status, deadline or delivery time
 '''
 
+# what a condition of a package query can be on, with the index field it is
+# answered by
+__FIELDS__ = {'zipcode': 'zipcode', 'city': 'city', 'address': 'address', 'truck': 'truck',
+              'status': 'status', 'deadline': 'deadline', 'delivered': 'delivered_at'}
+
 
 def get_input(prompt: str) -> str:
     """
@@ -45,10 +58,145 @@ def print_package(package: Package, time: int) -> None:
     print()
 
 
-def start_app(packages: HashMap[int, Package], trucks: list[Truck]) -> None:
+def get_time_input(prompt: str = 'Please enter a time in the format of HH:MM') -> int:
+    """
+    Prompts until a valid clock time is entered and returns it in minutes
+    """
+    while True:
+        try:
+            return clock_to_minutes(get_input(prompt))
+        except Exception:
+            continue
+
+
+def parse_conditions(text: str) -> dict[str, Any]:
+    """
+    Parses the comma-separated conditions of a package query into the keyword
+    arguments of PackageIndex.rows, e.g.
+
+        zipcode=84115,deadline<10:30,deadline>=9:00,status=delivered
+
+    zipcode, city, address, truck and status are matched with =, deadline and
+    delivered are compared with < and >= to a time or EOD
+    """
+    conditions: dict[str, Any] = {}
+    for condition in text.split(','):
+        for operator in ('>=', '<', '='):
+            name, found, value = condition.partition(operator)
+            if found:
+                break
+        name, value = name.strip(), value.strip()
+        if name not in __FIELDS__ or not found or len(value) == 0:
+            raise Exception(f'invalid condition "{condition}"')
+        field = __FIELDS__[name]
+        if field in PackageIndex.SORTED:
+            if operator == '=':
+                raise Exception(f'{name} is compared with < and >=')
+            time = EOD if value.upper() == 'EOD' else clock_to_minutes(value)
+            low, high = conditions.get(field, (None, None))
+            conditions[field] = (time, high) if operator == '>=' else (low, time)
+        elif operator != '=':
+            raise Exception(f'{name} is matched with =')
+        elif field == 'truck':
+            conditions[field] = int(value)
+        elif field == 'status':
+            conditions[field] = Package.Status[value.upper().replace(' ', '_')]
+        else:
+            conditions[field] = value
+    return conditions
+
+
+def select(index: PackageIndex, timeline: StatusTimeline, conditions: dict[str, Any],
+           time: float) -> list[int]:
+    """
+    Returns the timeline indexes of the packages meeting the conditions, in
+    order. The index holds the statuses at the end of the day, so a status
+    condition is checked against the status at the given time instead
+
+    Time complexity: O(c * k) for c conditions and k packages of the smallest
+    condition
+    """
+    status = conditions.pop('status', None)
+    rows = [timeline.index_of(p.id) for p in index.query(**conditions)]
+    if status is not None:
+        rows = [i for i in rows if timeline.status_of(timeline.ids[i], time) == status]
+    rows.sort()
+    return rows
+
+
+def parse_query(line: str) -> tuple[int, str]:
+    """
+    Parses a batch query of the form `HH:MM <package ID | all | conditions>`,
+    see parse_conditions
+    """
+    clock, target = line.split(maxsplit=1)
+    if target != 'all' and not target.isdigit():
+        parse_conditions(target)
+    return clock_to_minutes(clock), target
+
+
+def run_batch(packages: IntHashMap[Package], queries: Iterable[str], out: TextIO,
+              fmt: str = 'tsv', color: bool = False, timeline: Optional[StatusTimeline] = None,
+              index: Optional[PackageIndex] = None) -> int:
+    """
+    Answers status queries non-interactively. Every line of the queries is of
+    the form `HH:MM <package ID | all | conditions>`, where the conditions
+    select packages through the index as parsed by parse_conditions. Blank
+    lines and lines starting with # are skipped. Each answer is a line per package, either the time followed by
+    the package's tab-delimited info (tsv) or a JSON object (jsonl). The lines
+    of a query are written to the output in one go. Returns the number of
+    queries that could not be parsed, these are reported on stderr
+
+    Time complexity: O(q * n) for q queries
+    """
+    if timeline is None:
+        timeline = StatusTimeline(package for (_, package) in packages)
+    everything = range(len(timeline))
+    errors = 0
+    for (number, line) in enumerate(queries, 1):
+        line = line.strip()
+        if len(line) == 0 or line.startswith('#'):
+            continue
+        try:
+            time, target = parse_query(line)
+            if target == 'all':
+                rows = everything
+            elif target.isdigit():
+                rows = [timeline.index_of(int(target))]
+            else:
+                if index is None:
+                    index = PackageIndex.of(PackageStore.of(packages))
+                rows = select(index, timeline, parse_conditions(target), time)
+        except Exception:
+            print(f'line {number}: invalid query "{line}"', file=sys.stderr)
+            errors += 1
+            continue
+
+        clock = minutes_to_clock(time)
+        if fmt == 'jsonl':
+            status = timeline.status_at(time) if rows is everything else None
+            lines = [json.dumps({
+                'time': clock,
+                'id': timeline.ids[i],
+                'status': (status[i] if status else timeline.status_of(timeline.ids[i], time)).name,
+                'info': timeline.info_of(i, time, color),
+            }) for i in rows]
+        else:
+            lines = [f'{clock}\t{timeline.info_of(i, time, color)}' for i in rows]
+        out.write(str.join('\n', lines))
+        out.write('\n')
+    out.flush()
+    return errors
+
+
+def start_app(packages: IntHashMap[Package], trucks: list[Truck]) -> None:
     """
     Starts the command-line app for retrieving information between
     """
+    # the schedule doesn't change while the app runs, so the package states
+    # are indexed once and every query is answered from the index
+    timeline = StatusTimeline(package for (_, package) in packages)
+    index = PackageIndex.of(PackageStore.of(packages))
     print('Welcome to WGUPS Package Tracking.')
     while True:
         selection = get_input(instructions)
@@ -57,14 +205,8 @@ def start_app(packages: HashMap[int, Package], trucks: list[Truck]) -> None:
             break
 
         time = 0
-        if selection != '4':
-            while time == 0:
-                try:
-                    string = get_input(
-                        'Please enter a time in the format of HH:MM')
-                    time = clock_to_minutes(string)
-                except Exception:
-                    continue
+        if selection not in ['4', '6']:
+            time = get_time_input()
 
         if selection == '1':
             while not (pkg_num := get_int_input('Please enter a valid package ID')) in packages:
@@ -77,12 +219,32 @@ def start_app(packages: HashMap[int, Package], trucks: list[Truck]) -> None:
                 print_package(package, time)
 
         elif selection == '3':
-            package_list = [package for (_, package) in packages]
-            package_list.sort(key=lambda p: p.id)
-            for package in package_list:
-                print(package.info(time))
+            print(str.join('\n', timeline.info_at(time)))
 
         elif selection == '4':
             for truck in trucks:
                 print(
                     f'Truck {truck.number} traveled {round(truck.miles_traveled, 1)} miles')
+
+        elif selection == '5':
+            for (status, count) in timeline.counts_at(time).items():
+                print(f'{status.name}: {count}')
+
+        elif selection == '6':
+            start = get_time_input('Please enter the start time as HH:MM')
+            end = get_time_input('Please enter the end time as HH:MM')
+            for (package_id, before, after) in timeline.changes_between(start, end):
+                print(f'Package {package_id}: {before.name} -> {after.name}')
+
+        elif selection == '7':
+            while True:
+                try:
+                    conditions = parse_conditions(get_input(
+                        'Please enter conditions such as zipcode=84115,deadline<10:30,truck=2'))
+                    break
+                except Exception as e:
+                    print(e)
+            matches = select(index, timeline, conditions, time)
+            for i in matches:
+                print(timeline.info_of(i, time))
+            print(f'{len(matches)} packages found')
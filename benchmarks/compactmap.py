@@ -0,0 +1,53 @@
+"""
+Compares the memory use and put/get throughput of the bucket HashMap against
+the open-addressing CompactHashMap and IntHashMap
+
+Usage: python -m benchmarks.compactmap [number of keys]
+"""
+import sys
+import tracemalloc
+from time import perf_counter
+from typing import Any, Callable
+from datastructures import CompactHashMap, HashMap, IntHashMap
+
+
+def measure(factory: Callable[[], Any], keys: list[int]) -> tuple[int, float, float]:
+    """
+    Returns the bytes allocated by the map and its put and get throughput in
+    operations per second
+    """
+    # tracing slows allocation down, so memory is measured on a separate build
+    tracemalloc.start()
+    m = factory()
+    for key in keys:
+        m.put(key, key)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    start = perf_counter()
+    m = factory()
+    for key in keys:
+        m.put(key, key)
+    put = len(keys) / (perf_counter() - start)
+
+    start = perf_counter()
+    for key in keys:
+        m.get(key)
+    get = len(keys) / (perf_counter() - start)
+
+    return memory, put, get
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    keys = list(range(1, n + 1))
+    print(f'{n} integer keys')
+    print(f'{"map":>14} {"bytes/entry":>12} {"put/s":>12} {"get/s":>12}')
+    for (name, factory) in [('HashMap', HashMap), ('CompactHashMap', CompactHashMap),
+                            ('IntHashMap', IntHashMap)]:
+        memory, put, get = measure(factory, keys)
+        print(f'{name:>14} {memory / n:>12.1f} {put:>12,.0f} {get:>12,.0f}')
+
+
+if __name__ == '__main__':
+    main()
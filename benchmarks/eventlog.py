@@ -0,0 +1,58 @@
+"""
+Schedules a generated instance with and without an event log, then replays
+the log at random times with snapshots at several intervals, reporting the
+size of the log and how long loading it and seeking a time take compared to
+scheduling the day again
+
+Usage: python -m benchmarks.eventlog [packages] [places] [trucks] [seeks]
+"""
+import os
+import random
+import sys
+import tempfile
+from time import perf_counter
+from benchmarks.generate import generate
+from wgups.eventlog import EventLog, Replayer
+from wgups.schedule import schedule_delivery
+from wgups.truck import Truck
+
+
+def main() -> None:
+    packages = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+    places = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    trucks = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+    seeks = int(sys.argv[4]) if len(sys.argv) > 4 else 50
+    with tempfile.TemporaryDirectory() as directory:
+        packages_path, distances_path = generate(packages, places, directory)
+        log_path = os.path.join(directory, 'day.jsonl')
+
+        start = perf_counter()
+        schedule_delivery(Truck.fleet(trucks), packages_path=packages_path,
+                          distances_path=distances_path)
+        unlogged = perf_counter() - start
+        start = perf_counter()
+        with EventLog(log_path) as log:
+            schedule = schedule_delivery(Truck.fleet(trucks), packages_path=packages_path,
+                                         distances_path=distances_path, event_log=log)
+        logged = perf_counter() - start
+        print(f'{packages} packages, {places} places, {trucks} trucks: scheduling took '
+              f'{unlogged:.2f}s, {logged:.2f}s writing {log.events} events '
+              f'({os.path.getsize(log_path) / 2 ** 20:.1f} MiB)')
+
+        end = max(t.time_at(t.miles_traveled) for t in schedule.trucks)
+        rng = random.Random(0)
+        times = [rng.uniform(8 * 60, end) for _ in range(seeks)]
+        for interval in [64, 256, 1024, log.events + 1]:
+            start = perf_counter()
+            replayer = Replayer.load(log_path, interval)
+            loaded = perf_counter() - start
+            start = perf_counter()
+            for time in times:
+                replayer.at(time)
+            seek = (perf_counter() - start) / seeks
+            print(f'  snapshots every {interval} events: loaded in {loaded:.2f}s, '
+                  f'{seek * 1000:.1f}ms per seek')
+
+
+if __name__ == '__main__':
+    main()
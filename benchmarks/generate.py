@@ -0,0 +1,122 @@
+"""
+Generates synthetic package and distance files in the formats read by
+wgups.schedule, including every kind of note Package understands
+
+Usage: python -m benchmarks.generate <packages> <places> [directory] [seed]
+"""
+import csv
+import math
+import os
+import random
+import sys
+from typing import Iterator
+
+CITIES = ['Salt Lake City', 'West Valley City', 'Millcreek', 'Holladay', 'Murray']
+DEADLINES = ['9:00 AM', '10:30 AM', 'EOD', 'EOD', 'EOD', 'EOD']
+# the address a package listed with the wrong address is corrected to, it must
+# be one of the places of the distance table
+CORRECTED_ADDRESS = ('410 S State St', '84111')
+
+
+def generate_places(count: int, rng: random.Random) -> list[tuple[str, str, float, float]]:
+    """
+    Returns the street, zipcode and coordinates of each place, the first place
+    is the hub and the second one the corrected address
+    """
+    places = [('HUB', '', 0.0, 0.0),
+              (*CORRECTED_ADDRESS, rng.uniform(-5, 5), rng.uniform(-5, 5))]
+    for i in range(count - 2):
+        street = f'{100 + i} {rng.choice("NS")} {rng.randrange(1, 99) * 100} {rng.choice("EW")}'
+        zipcode = str(84100 + rng.randrange(100))
+        places.append((street, zipcode, rng.uniform(-10, 10),
+                       rng.uniform(-10, 10)))
+    return places
+
+
+def distance_rows(places: list[tuple[str, str, float, float]]) -> Iterator[list[str]]:
+    """
+    Yields the rows of the lower-triangular distance table, the distances are
+    the euclidean distances between the places rounded to a tenth of a mile
+    """
+    for (i, (street, zipcode, x, y)) in enumerate(places):
+        if i == 0:
+            name, address = 'Western Governors University\n4001 South 700 East,\nSalt Lake City, UT 84107', 'HUB'
+        else:
+            name, address = f'Place {i}\n {street}', f'{street}\n({zipcode})'
+        dists = [f'{round(math.hypot(x - px, y - py), 1):.1f}'
+                 for (_, _, px, py) in places[:i]]
+        yield [name, address, *dists, '0.0']
+
+
+def package_rows(count: int, places: list[tuple[str, str, float, float]],
+                 rng: random.Random) -> Iterator[list[str]]:
+    """
+    Yields the rows of the package file. Roughly one in ten packages carries
+    a note: a delayed arrival, a truck restriction, a wrong address or a group
+    of packages that must be delivered together
+    """
+    grouped = set[int]()
+    for package_id in range(1, count + 1):
+        street, zipcode, _, _ = places[rng.randrange(1, len(places))]
+        deadline = rng.choice(DEADLINES)
+        notes = ''
+        roll = rng.random()
+        if package_id in grouped:
+            pass
+        elif roll < 0.03:
+            notes = f'Delayed on flight---will not arrive to depot until {rng.choice(["9:05", "9:30", "10:10"])} am'
+            deadline = 'EOD'
+        elif roll < 0.06:
+            notes = f'Can only be on truck {rng.choice([1, 2])}'
+        elif roll < 0.07:
+            notes = 'Wrong address listed'
+            deadline = 'EOD'
+        elif roll < 0.09 and package_id + 3 <= count:
+            # only packages further down the file are referenced so they
+            # aren't already part of another group or carrying a note
+            members = rng.sample(range(package_id + 1, min(package_id + 20, count) + 1),
+                                 rng.randint(1, 2))
+            members = [m for m in members if m not in grouped]
+            if len(members) != 0:
+                grouped.update(members)
+                # like some notes of the sample file, every other one also
+                # names an earlier package, which the parsers don't link
+                named = sorted(members + ([package_id // 2] if package_id % 2 == 0 else []))
+                notes = f'Must be delivered with {", ".join(map(str, named))}'
+        yield [str(package_id), street, rng.choice(CITIES), 'UT', zipcode,
+               deadline, str(rng.randint(1, 99)), notes]
+
+
+def generate(packages: int, places: int, directory: str, seed: int = 0) -> tuple[str, str]:
+    """
+    Writes packages.csv and distances.csv into the directory and returns their
+    paths
+    """
+    if places < 3:
+        raise ValueError('an instance needs at least three places')
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    place_list = generate_places(places, rng)
+    packages_path = os.path.join(directory, 'packages.csv')
+    distances_path = os.path.join(directory, 'distances.csv')
+    with open(distances_path, 'w', newline='') as f:
+        csv.writer(f, delimiter=';', quotechar='"',
+                   lineterminator='\n').writerows(distance_rows(place_list))
+    with open(packages_path, 'w', newline='') as f:
+        csv.writer(f, delimiter=';', lineterminator='\n').writerows(
+            package_rows(packages, place_list, rng))
+    return packages_path, distances_path
+
+
+def main() -> None:
+    if len(sys.argv) < 3:
+        print(__doc__)
+        sys.exit(1)
+    directory = sys.argv[3] if len(sys.argv) > 3 else '.'
+    seed = int(sys.argv[4]) if len(sys.argv) > 4 else 0
+    for path in generate(int(sys.argv[1]), int(sys.argv[2]), directory, seed):
+        print(f'wrote {path}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""
+Microbenchmark for datastructures.HashMap put/get throughput
+
+Usage: python -m benchmarks.hashmap [max exponent]
+"""
+import sys
+from time import perf_counter
+from datastructures import HashMap
+
+
+def run(n: int) -> tuple[float, float, float]:
+    """
+    Returns the put, presized put and get throughput in operations per second
+    for a map of n integer keys
+    """
+    keys = list(range(n))
+
+    start = perf_counter()
+    m = HashMap[int, int]()
+    for key in keys:
+        m.put(key, key)
+    put = n / (perf_counter() - start)
+
+    start = perf_counter()
+    presized = HashMap[int, int](n)
+    for key in keys:
+        presized.put(key, key)
+    presized_put = n / (perf_counter() - start)
+
+    start = perf_counter()
+    for key in keys:
+        m.get(key)
+    get = n / (perf_counter() - start)
+
+    return put, presized_put, get
+
+
+def main() -> None:
+    max_exponent = int(sys.argv[1]) if len(sys.argv) > 1 else 6
+    print(f'{"keys":>10} {"put/s":>12} {"presized/s":>12} {"get/s":>12}')
+    for exponent in range(3, max_exponent + 1):
+        n = 10 ** exponent
+        put, presized_put, get = run(n)
+        print(f'{n:>10} {put:>12,.0f} {presized_put:>12,.0f} {get:>12,.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Compares the exact Held-Karp sequencer with the 2-opt/Or-opt improver on
+every trip of a schedule, recording the runtime and the miles saved per trip,
+and writes the results as JSON
+
+Usage: python -m benchmarks.held_karp [output.json] [packages:places:trucks ...]
+"""
+import json
+import sys
+import tempfile
+from time import perf_counter
+from typing import Union
+from benchmarks.generate import generate
+from datastructures import DistanceMatrix
+from wgups.place import Place
+from wgups.routing import held_karp, improve_route
+from wgups.schedule import schedule_delivery
+from wgups.truck import Truck
+
+DEFAULT_SIZES = [(200, 15, 3), (400, 25, 4), (400, 60, 4)]
+
+
+def compare(trips: list[dict[str, float]]):
+    """
+    Returns a route improver that runs both improvers on the same load and
+    records a trip for each load. The truck departs with the exact sequence
+    """
+    def improver(truck: Truck, graph: DistanceMatrix[Union[Place, str]]) -> float:
+        loaded = list(truck.packages)
+        start = perf_counter()
+        heuristic = improve_route(truck, graph)
+        heuristic_seconds = perf_counter() - start
+        truck.packages = loaded
+        start = perf_counter()
+        exact = held_karp(truck, graph, max_stops=16, fallback=None)
+        exact_seconds = perf_counter() - start
+        trips.append({
+            'stops': len(set(p.address for p in loaded)),
+            'held_karp_seconds': exact_seconds,
+            'held_karp_saved': exact,
+            'improve_route_seconds': heuristic_seconds,
+            'improve_route_saved': heuristic,
+        })
+        return exact
+    return improver
+
+
+def run(packages_path: str, distances_path: str, trucks: int) -> list[dict[str, float]]:
+    trips: list[dict[str, float]] = []
+    schedule_delivery(Truck.fleet(trucks), route_improver=compare(trips),
+                      packages_path=packages_path, distances_path=distances_path)
+    return trips
+
+
+def summarize(trips: list[dict[str, float]]) -> list[str]:
+    """
+    Returns one line per stop count with the mean runtime and the total miles
+    saved by each improver
+    """
+    lines = []
+    for stops in sorted(set(int(t['stops']) for t in trips)):
+        group = [t for t in trips if t['stops'] == stops]
+        mean = {key: sum(t[key] for t in group) / len(group) * 1000
+                for key in ['held_karp_seconds', 'improve_route_seconds']}
+        lines.append(f'{stops:>2} stops, {len(group):>3} trips: '
+                     f'held-karp {mean["held_karp_seconds"]:8.2f}ms '
+                     f'{sum(t["held_karp_saved"] for t in group):6.1f}mi saved, '
+                     f'2-opt/or-opt {mean["improve_route_seconds"]:6.2f}ms '
+                     f'{sum(t["improve_route_saved"] for t in group):6.1f}mi saved')
+    return lines
+
+
+def main() -> None:
+    output = sys.argv[1] if len(sys.argv) > 1 else 'bench_held_karp.json'
+    sizes = [tuple(map(int, size.split(':'))) for size in sys.argv[2:]] or DEFAULT_SIZES
+    results = {'wgups': run('packages.csv', 'distances.csv', 2)}
+    with tempfile.TemporaryDirectory() as directory:
+        for (packages, places, trucks) in sizes:
+            results[f'{packages}:{places}:{trucks}'] = run(
+                *generate(packages, places, directory), trucks)
+    for (name, trips) in results.items():
+        print(name)
+        for line in summarize(trips):
+            print(f'  {line}')
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f'wrote {output}')
+
+
+if __name__ == '__main__':
+    main()
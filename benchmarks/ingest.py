@@ -0,0 +1,53 @@
+"""
+Measures the time and peak memory of ingesting a generated package manifest,
+once keeping every package and once streaming it chunk by chunk
+
+Usage: python -m benchmarks.ingest [rows] [chunk size]
+"""
+import sys
+import tempfile
+import tracemalloc
+from time import perf_counter
+from typing import Callable
+from benchmarks.generate import generate
+from wgups.ingest import ingest
+
+
+def keep_all(path: str, chunk_size: int) -> int:
+    packages = [p for chunk in ingest(path, chunk_size) for p in chunk]
+    return len(packages)
+
+
+def stream(path: str, chunk_size: int) -> int:
+    return sum(len(chunk) for chunk in ingest(path, chunk_size))
+
+
+def measure(consume: Callable[[str, int], int], path: str, chunk_size: int) -> dict[str, float]:
+    """
+    Times the consumer, then runs it again under tracemalloc for its peak
+    memory as tracing slows it down
+    """
+    start = perf_counter()
+    count = consume(path, chunk_size)
+    seconds = perf_counter() - start
+    tracemalloc.start()
+    consume(path, chunk_size)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'rows': count, 'seconds': seconds, 'peak_mb': peak / (1 << 20)}
+
+
+def main() -> None:
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    chunk_size = int(sys.argv[2]) if len(sys.argv) > 2 else 10_000
+    with tempfile.TemporaryDirectory() as directory:
+        packages_path, _ = generate(rows, 50, directory)
+        for consume in [keep_all, stream]:
+            result = measure(consume, packages_path, chunk_size)
+            print(f'{consume.__name__}: {result["rows"]} rows in {result["seconds"]:.2f}s '
+                  f'({result["rows"] / result["seconds"]:,.0f} rows/s), '
+                  f'peak {result["peak_mb"]:.1f} MiB')
+
+
+if __name__ == '__main__':
+    main()
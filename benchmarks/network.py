@@ -0,0 +1,40 @@
+"""
+Compares parsing a generated distance table with loading its compiled,
+memory-mapped form
+
+Usage: python -m benchmarks.network [places ...]
+"""
+import os
+import sys
+import tempfile
+from time import perf_counter
+import wgups.schedule
+from benchmarks.generate import generate
+
+DEFAULT_SIZES = [100, 1_000, 2_000]
+
+
+def run(places: int) -> dict[str, float]:
+    parse = getattr(wgups.schedule, '__parse_distances')
+    with tempfile.TemporaryDirectory() as directory:
+        _, distances_path = generate(1, places, directory)
+        cache_dir = os.path.join(directory, 'cache')
+        timings: dict[str, float] = {'places': places}
+        for phase in ['parse', 'compile', 'load']:
+            start = perf_counter()
+            graph = parse(distances_path, None if phase == 'parse' else cache_dir)
+            # touch every distance so the mapped pages are actually read
+            sum(graph.triangle())
+            timings[phase] = perf_counter() - start
+    return timings
+
+
+def main() -> None:
+    for places in [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES:
+        timings = run(places)
+        print(f'{places} places: parse {timings["parse"]:.3f}s, '
+              f'parse and compile {timings["compile"]:.3f}s, load {timings["load"]:.3f}s')
+
+
+if __name__ == '__main__':
+    main()
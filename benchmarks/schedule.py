@@ -0,0 +1,65 @@
+"""
+Times each phase of schedule_delivery on generated instances of increasing
+size and writes the results as JSON
+
+Usage: python -m benchmarks.schedule [--simulate] [output.json] [packages:places:trucks ...]
+"""
+import json
+import sys
+import tempfile
+from time import perf_counter
+from benchmarks.generate import generate
+from wgups.schedule import schedule_delivery
+from wgups.truck import Truck
+
+DEFAULT_SIZES = [(100, 10, 2), (1_000, 100, 4), (10_000, 1_000, 20)]
+
+
+def run(packages: int, places: int, trucks: int, seed: int = 0, simulate: bool = False) -> dict[str, object]:
+    """
+    Schedules a generated instance and returns its size, phase timings and
+    total miles
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        packages_path, distances_path = generate(
+            packages, places, directory, seed)
+        timings: dict[str, float] = {}
+        start = perf_counter()
+        _, fleet = schedule_delivery(Truck.fleet(trucks),
+                                     packages_path=packages_path,
+                                     distances_path=distances_path,
+                                     timings=timings,
+                                     simulate=simulate)
+        total = perf_counter() - start
+    return {
+        'packages': packages,
+        'places': places,
+        'trucks': trucks,
+        'seed': seed,
+        'simulate': simulate,
+        'timings': {**timings, 'total': total},
+        'miles': sum(t.miles_traveled for t in fleet),
+    }
+
+
+def main() -> None:
+    args = sys.argv[1:]
+    simulate = '--simulate' in args
+    if simulate:
+        args.remove('--simulate')
+    output = args[0] if len(args) > 0 else 'bench_schedule.json'
+    sizes = [tuple(map(int, size.split(':'))) for size in args[1:]] or DEFAULT_SIZES
+    results = []
+    for (packages, places, trucks) in sizes:
+        result = run(packages, places, trucks, simulate=simulate)
+        phases = ', '.join(f'{phase} {seconds:.3f}s' for (phase, seconds)
+                           in result['timings'].items())  # type: ignore
+        print(f'{packages} packages, {places} places, {trucks} trucks: {phases}')
+        results.append(result)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f'wrote {output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Load tests the tracking service on localhost: schedules the packages, serves
+them in a separate process and sends a mix of single-package, all-package and
+truck queries from concurrent keep-alive connections, reporting the requests
+per second and the latency percentiles
+
+Usage: python -m benchmarks.service [requests] [connections] [port]
+"""
+import asyncio
+import multiprocessing
+import random
+import socket
+import sys
+from time import perf_counter, sleep
+from wgups.schedule import schedule_delivery
+from wgups.service import serve
+
+
+def start_server(port: int) -> None:
+    packages, trucks = schedule_delivery()
+    serve(packages, trucks, port=port)
+
+
+def wait_for(port: int, timeout: float = 30) -> None:
+    deadline = perf_counter() + timeout
+    while True:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            if perf_counter() > deadline:
+                raise
+            sleep(0.05)
+
+
+def target(rng: random.Random) -> str:
+    """
+    Returns a query, mostly of single packages as agents look up one
+    customer's package at a time
+    """
+    time = f'{rng.randint(8, 17)}:{rng.randrange(60):02}'
+    kind = rng.random()
+    if kind < 0.8:
+        return f'/packages/{rng.randint(1, 40)}?time={time}'
+    if kind < 0.95:
+        return f'/packages?time={time}'
+    return '/trucks'
+
+
+async def client(port: int, requests: int, seed: int, latencies: list[float]) -> None:
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    for _ in range(requests):
+        start = perf_counter()
+        writer.write(f'GET {target(rng)} HTTP/1.1\r\nHost: localhost\r\n\r\n'.encode())
+        length = 0
+        while (line := await reader.readline()) != b'\r\n':
+            if line.lower().startswith(b'content-length:'):
+                length = int(line.split(b':')[1])
+        await reader.readexactly(length)
+        latencies.append(perf_counter() - start)
+    writer.close()
+
+
+async def load(port: int, requests: int, connections: int) -> dict[str, float]:
+    latencies: list[float] = []
+    start = perf_counter()
+    await asyncio.gather(*[client(port, requests // connections, seed, latencies)
+                           for seed in range(connections)])
+    seconds = perf_counter() - start
+    latencies.sort()
+
+    def percentile(p: float) -> float:
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000
+
+    return {'requests': len(latencies), 'seconds': seconds,
+            'requests_per_second': len(latencies) / seconds, 'p50_ms': percentile(0.5),
+            'p95_ms': percentile(0.95), 'p99_ms': percentile(0.99), 'max_ms': latencies[-1] * 1000}
+
+
+def main() -> None:
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    connections = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    port = int(sys.argv[3]) if len(sys.argv) > 3 else 18950
+    server = multiprocessing.Process(target=start_server, args=(port,), daemon=True)
+    server.start()
+    try:
+        wait_for(port)
+        result = asyncio.run(load(port, requests, connections))
+    finally:
+        server.terminate()
+    print(f'{result["requests"]} requests over {connections} connections in '
+          f'{result["seconds"]:.2f}s: {result["requests_per_second"]:,.0f} requests/s, '
+          f'p50 {result["p50_ms"]:.2f}ms, p95 {result["p95_ms"]:.2f}ms, '
+          f'p99 {result["p99_ms"]:.2f}ms, max {result["max_ms"]:.2f}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,2 +1,6 @@
 from datastructures.hashmap import *
 from datastructures.graph import *
+from datastructures.matrix import *
+from datastructures.compactmap import *
+from datastructures.neighbors import *
+from datastructures.disjointset import *
@@ -0,0 +1,247 @@
+from __future__ import annotations
+from array import array
+from typing import Any, Generic, Iterator, Optional, TypeVar
+
+Key = TypeVar('Key')
+Value = TypeVar('Value')
+
+# markers for slots that have never been used and slots whose entry was removed
+_EMPTY: Any = object()
+_DELETED: Any = object()
+
+
+class CompactHashMap(Generic[Key, Value]):
+    """
+    An open-addressing hash map with the same interface as HashMap. Instead of
+    a list of buckets holding tuples, the entries are kept in flat parallel
+    arrays of keys, values and hashes and collisions are resolved with linear
+    probing, which avoids allocating a list per bucket and a tuple per entry.
+    """
+    __slots__ = ('_keys', '_values', '_hashes', '_mask', '_used', 'size')
+    # the map doubles in size once this fraction of the slots is occupied by
+    # live or removed entries
+    _max_load_factor = 2 / 3
+    _min_storage_size = 8
+
+    def __init__(self, capacity: int = 0) -> None:
+        size = self._min_storage_size
+        while capacity > size * self._max_load_factor:
+            size *= 2
+        self._initialize_storage(size)
+        self.size = 0
+
+    def _initialize_storage(self, storage_size: int) -> None:
+        self._keys: list[Any] = [_EMPTY] * storage_size
+        self._values: list[Any] = [None] * storage_size
+        self._hashes = array('q', bytes(8 * storage_size))
+        self._mask = storage_size - 1
+        # live entries plus tombstones, both of which lengthen probe sequences
+        self._used = 0
+
+    def _find(self, key: Key, h: int) -> int:
+        """
+        Returns the slot holding the key or the slot the key should be inserted
+        into if it isn't present. Tombstones are reused for insertion
+
+        Time complexity: O(1) average
+        """
+        keys = self._keys
+        hashes = self._hashes
+        mask = self._mask
+        index = h & mask
+        tombstone = -1
+        while True:
+            k = keys[index]
+            if k is _EMPTY:
+                return index if tombstone == -1 else tombstone
+            if k is _DELETED:
+                if tombstone == -1:
+                    tombstone = index
+            elif hashes[index] == h and (k is key or k == key):
+                return index
+            index = (index + 1) & mask
+
+    def put(self, key: Key, value: Value) -> None:
+        """
+        Inserts a key-value pair into the map or updates an existing key-value
+        pair if it is already present
+        """
+        h = hash(key)
+        index = self._find(key, h)
+        k = self._keys[index]
+        if k is not _EMPTY and k is not _DELETED:
+            self._values[index] = value
+            return
+
+        if k is _EMPTY:
+            self._used += 1
+        self._keys[index] = key
+        self._values[index] = value
+        self._hashes[index] = h
+        self.size += 1
+
+        if self._used > (self._mask + 1) * self._max_load_factor:
+            self._resize()
+
+    def get(self, key: Key) -> Optional[Value]:
+        """
+        Retrieve a value from the map given a key or None if the key doesn't
+        exist
+        """
+        index = self._find(key, hash(key))
+        k = self._keys[index]
+        if k is _EMPTY or k is _DELETED:
+            return None
+        return self._values[index]
+
+    def remove(self, key: Key) -> Optional[Value]:
+        """
+        Removes a key from the map and returns its value or None if the key
+        doesn't exist. The slot is marked with a tombstone so that probe
+        sequences passing through it stay intact
+        """
+        index = self._find(key, hash(key))
+        k = self._keys[index]
+        if k is _EMPTY or k is _DELETED:
+            return None
+        value = self._values[index]
+        self._keys[index] = _DELETED
+        self._values[index] = None
+        self.size -= 1
+        return value
+
+    def _resize(self) -> None:
+        """
+        Rehashes every live entry, dropping tombstones along the way. The map
+        only grows when it is mostly full of live entries
+
+        Time complexity: O(n)
+        """
+        storage_size = self._mask + 1
+        if self.size > storage_size * self._max_load_factor / 2:
+            storage_size *= 2
+        entries = [(k, v, h) for (k, v, h) in zip(self._keys, self._values, self._hashes)
+                   if k is not _EMPTY and k is not _DELETED]
+        self._initialize_storage(storage_size)
+        keys = self._keys
+        values = self._values
+        hashes = self._hashes
+        mask = self._mask
+        for (k, v, h) in entries:
+            index = h & mask
+            while keys[index] is not _EMPTY:
+                index = (index + 1) & mask
+            keys[index] = k
+            values[index] = v
+            hashes[index] = h
+        self._used = len(entries)
+
+    def __contains__(self, key: Key) -> bool:
+        k = self._keys[self._find(key, hash(key))]
+        return k is not _EMPTY and k is not _DELETED
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __iter__(self) -> Iterator[tuple[Key, Value]]:
+        for (k, v) in zip(self._keys, self._values):
+            if k is not _EMPTY and k is not _DELETED:
+                yield (k, v)
+
+
+class IntHashMap(CompactHashMap[int, Value]):
+    """
+    A CompactHashMap specialized for integer keys such as package IDs. Keys are
+    stored unboxed in a signed 64-bit array and are their own hash, so there is
+    neither a separate hash array nor a call to hash() on lookup. Slot states
+    are tracked in a byte array instead of with sentinel objects.
+    """
+    __slots__ = ('_states',)
+    __EMPTY = 0
+    __USED = 1
+    __DELETED = 2
+
+    def _initialize_storage(self, storage_size: int) -> None:
+        self._keys = array('q', bytes(8 * storage_size))  # type: ignore
+        self._values = [None] * storage_size
+        self._states = array('b', bytes(storage_size))
+        self._mask = storage_size - 1
+        self._used = 0
+
+    def _find(self, key: int, h: int = 0) -> int:
+        keys = self._keys
+        states = self._states
+        mask = self._mask
+        index = key & mask
+        tombstone = -1
+        while True:
+            state = states[index]
+            if state == self.__EMPTY:
+                return index if tombstone == -1 else tombstone
+            if state == self.__DELETED:
+                if tombstone == -1:
+                    tombstone = index
+            elif keys[index] == key:
+                return index
+            index = (index + 1) & mask
+
+    def put(self, key: int, value: Value) -> None:
+        index = self._find(key)
+        state = self._states[index]
+        if state == self.__USED:
+            self._values[index] = value
+            return
+
+        if state == self.__EMPTY:
+            self._used += 1
+        self._keys[index] = key
+        self._values[index] = value
+        self._states[index] = self.__USED
+        self.size += 1
+
+        if self._used > (self._mask + 1) * self._max_load_factor:
+            self._resize()
+
+    def get(self, key: int) -> Optional[Value]:
+        index = self._find(key)
+        if self._states[index] != self.__USED:
+            return None
+        return self._values[index]
+
+    def remove(self, key: int) -> Optional[Value]:
+        index = self._find(key)
+        if self._states[index] != self.__USED:
+            return None
+        value = self._values[index]
+        self._states[index] = self.__DELETED
+        self._values[index] = None
+        self.size -= 1
+        return value
+
+    def _resize(self) -> None:
+        storage_size = self._mask + 1
+        if self.size > storage_size * self._max_load_factor / 2:
+            storage_size *= 2
+        entries = list(self)
+        self._initialize_storage(storage_size)
+        keys = self._keys
+        values = self._values
+        states = self._states
+        mask = self._mask
+        for (k, v) in entries:
+            index = k & mask
+            while states[index] != self.__EMPTY:
+                index = (index + 1) & mask
+            keys[index] = k
+            values[index] = v
+            states[index] = self.__USED
+        self._used = len(entries)
+
+    def __contains__(self, key: int) -> bool:
+        return self._states[self._find(key)] == self.__USED
+
+    def __iter__(self) -> Iterator[tuple[int, Value]]:
+        used = self.__USED
+        for (k, v, state) in zip(self._keys, self._values, self._states):
+            if state == used:
+                yield (k, v)
@@ -0,0 +1,85 @@
+from __future__ import annotations
+from array import array
+
+
+class DisjointSet:
+    """
+    A union-find over the elements 0 to n - 1, which are added one at a time.
+    Each set is represented by one of its elements, its root. Sets are joined
+    by size and paths are halved on every find, so any sequence of operations
+    takes nearly constant amortized time per operation
+    """
+
+    def __init__(self, size: int = 0) -> None:
+        """
+        Creates the given number of singleton sets
+        """
+        self.__parents = array('q', range(size))
+        self.__sizes = array('q', [1]) * size
+
+    def add(self) -> int:
+        """
+        Adds an element in a set of its own and returns it
+
+        Time complexity: O(1) amortized
+        """
+        element = len(self.__parents)
+        self.__parents.append(element)
+        self.__sizes.append(1)
+        return element
+
+    def find(self, element: int) -> int:
+        """
+        Returns the root of the element's set, pointing every other element on
+        the way at its grandparent
+
+        Time complexity: O(α(n)) amortized
+        """
+        parents = self.__parents
+        while (parent := parents[element]) != element:
+            grandparent = parents[parent]
+            parents[element] = grandparent
+            element = grandparent
+        return element
+
+    def union(self, a: int, b: int) -> int:
+        """
+        Joins the sets of the two elements and returns the root of the joined
+        set, which is the root of the larger one
+
+        Time complexity: O(α(n)) amortized
+        """
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return a
+        if self.__sizes[a] < self.__sizes[b]:
+            a, b = b, a
+        self.__parents[b] = a
+        self.__sizes[a] += self.__sizes[b]
+        return a
+
+    def size(self, element: int) -> int:
+        """
+        Returns the number of elements in the element's set
+
+        Time complexity: O(α(n)) amortized
+        """
+        return self.__sizes[self.find(element)]
+
+    def copy(self) -> DisjointSet:
+        """
+        Returns a copy of the sets, of the same class, that is changed
+        independently of this one. Subclasses copy their own fields on top
+
+        Time complexity: O(n)
+        """
+        copy = self.__class__.__new__(self.__class__)
+        copy.__parents = self.__parents[:]
+        copy.__sizes = self.__sizes[:]
+        return copy
+
+    def connected(self, a: int, b: int) -> bool:
+        return self.find(a) == self.find(b)
+
+    def __len__(self) -> int:
+        return len(self.__parents)
@@ -6,7 +6,10 @@ T = TypeVar('T')
 
 
 class Graph(Generic[T]):
-    __edges: HashMap[T, HashMap[T, float]] = HashMap()
+    __edges: HashMap[T, HashMap[T, float]]
+
+    def __init__(self) -> None:
+        self.__edges = HashMap()
 
     def add_vertex(self, vertex: T) -> None:
         """
@@ -1,20 +1,36 @@
-from typing import Generic, Optional, TypeVar
-from utils import gen_primes
+from __future__ import annotations
+from typing import Generic, Iterable, Iterator, Optional, TypeVar
 
 Key = TypeVar('Key')
 Value = TypeVar('Value')
 
 
 class HashMap(Generic[Key, Value]):
-    __max_bucket_size = 2
+    __min_storage_size = 2
+    # the map doubles in size whenever the average bucket holds more than this
+    # many entries
+    __max_load_factor = 0.75
     __storage: list[list[tuple[Key, Value]]]
 
-    def __init__(self) -> None:
-        self.__gen = gen_primes()
-        self.__storage_size = next(self.__gen)
+    def __init__(self, capacity: int = 0) -> None:
+        """
+        Creates an empty map. If a capacity is given, the storage is presized
+        so that the map can hold that many entries without resizing
+        """
+        self.__storage_size = self.__size_for(capacity)
         self.__initialize_storage()
         self.size = 0
-        self.__can_resize = True
+
+    @classmethod
+    def from_items(cls, items: Iterable[tuple[Key, Value]]) -> HashMap[Key, Value]:
+        """
+        Builds a map from key-value pairs, presizing the storage when the
+        number of items is known up front
+        """
+        capacity = len(items) if isinstance(items, (list, tuple)) else 0
+        m = cls(capacity)
+        m.update(items)
+        return m
 
     def put(self, key: Key, value: Value) -> None:
         """
@@ -26,18 +42,17 @@ class HashMap(Generic[Key, Value]):
         for (i, (k, _)) in enumerate(bucket):
             if k == key:
                 bucket[i] = (key, value)
-                break
+                return
+
         # if the key isn't found, we insert it into the bucket and increment
         # the size of the map
-        else:
-            bucket.append((key, value))
-            if self.__can_resize:
-                self.size += 1
+        bucket.append((key, value))
+        self.size += 1
 
-        # if the length of the current bucket exceeds the maximum size, we
-        # resize the map to accommodate the new size
-        if len(bucket) > self.__max_bucket_size:
-            self.__resize()
+        # if the map is now too full, we double the storage so that the
+        # buckets stay short on average
+        if self.size > self.__storage_size * self.__max_load_factor:
+            self.__resize(self.__storage_size * 2)
 
     def get(self, key: Key) -> Optional[Value]:
         """
@@ -50,25 +65,74 @@ class HashMap(Generic[Key, Value]):
 
         return None
 
+    def remove(self, key: Key) -> Optional[Value]:
+        """
+        Removes a key from the map and returns its value or None if the key
+        doesn't exist
+        """
+        bucket = self.__get_bucket(key)
+        for (i, (k, value)) in enumerate(bucket):
+            if k == key:
+                del bucket[i]
+                self.size -= 1
+                return value
+
+        return None
+
+    def update(self, items: Iterable[tuple[Key, Value]]) -> None:
+        """
+        Inserts every key-value pair into the map
+        """
+        for (key, value) in items:
+            self.put(key, value)
+
+    def keys(self) -> Iterator[Key]:
+        for (key, _) in self:
+            yield key
+
+    def values(self) -> Iterator[Value]:
+        for (_, value) in self:
+            yield value
+
+    def items(self) -> Iterator[tuple[Key, Value]]:
+        return iter(self)
+
+    @classmethod
+    def __size_for(cls, capacity: int) -> int:
+        """
+        Finds the smallest power of two that holds the capacity without going
+        over the load factor
+        """
+        size = cls.__min_storage_size
+        while capacity > size * cls.__max_load_factor:
+            size *= 2
+        return size
+
     def __get_bucket(self, key: Key) -> list[tuple[Key, Value]]:
-        index = hash(key) % self.__storage_size
+        # the storage size is always a power of two, so masking the hash is
+        # equivalent to taking the modulo
+        index = hash(key) & (self.__storage_size - 1)
         return self.__storage[index]
 
     def __initialize_storage(self) -> None:
         self.__storage = [[] for _ in range(self.__storage_size)]
 
-    def __resize(self) -> None:
-        if not self.__can_resize:
-            return
-        self.__can_resize = False
+    def __resize(self, storage_size: int) -> None:
+        """
+        Rehashes every entry into a storage of the given size. The keys are
+        known to be unique, so the entries are appended without the lookup
+        done in put
 
-        self.__storage_size = next(self.__gen)
+        Time complexity: O(n)
+        """
+        self.__storage_size = storage_size
         old_storage = self.__storage
         self.__initialize_storage()
+        storage = self.__storage
+        mask = storage_size - 1
         for bucket in old_storage:
-            for (key, value) in bucket:
-                self.put(key, value)
-        self.__can_resize = True
+            for entry in bucket:
+                storage[hash(entry[0]) & mask].append(entry)
 
     def __contains__(self, key: Key):
         bucket = self.__get_bucket(key)
@@ -78,6 +142,9 @@ class HashMap(Generic[Key, Value]):
 
         return False
 
-    def __iter__(self):
+    def __len__(self) -> int:
+        return self.size
+
+    def __iter__(self) -> Iterator[tuple[Key, Value]]:
         for bucket in self.__storage:
             yield from bucket
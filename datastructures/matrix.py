@@ -0,0 +1,167 @@
+from __future__ import annotations
+from array import array
+from typing import Iterable, Optional, Sequence, TypeVar, Union
+from datastructures.graph import Graph
+from datastructures.hashmap import HashMap
+
+T = TypeVar('T')
+
+
+class DistanceMatrix(Graph[T]):
+    """
+    A graph backend that interns every vertex to an integer index and stores
+    the distances in a single contiguous array of doubles. Because the graph is
+    undirected only the lower triangle (including the diagonal) is stored, row
+    by row, which is exactly the layout of the distance table we parse.
+    """
+    __data: Union[array[float], memoryview]
+    __indexes: HashMap[T, int]
+    __vertices: list[T]
+
+    def __init__(self) -> None:
+        self.__data = array('d')
+        self.__indexes = HashMap[T, int]()
+        self.__vertices = []
+
+    @classmethod
+    def from_buffer(cls, vertices: Sequence[T], data: memoryview) -> DistanceMatrix[T]:
+        """
+        Builds a matrix over an existing triangle of doubles, such as a memory
+        mapped file, without copying it. The matrix is read-only, vertices can't
+        be added to it
+
+        Time complexity: O(m)
+        """
+        if len(data) != len(vertices) * (len(vertices) + 1) // 2:
+            raise ValueError('the triangle does not match the number of vertices')
+        matrix = cls()
+        matrix.__data = data
+        for vertex in vertices:
+            matrix.__indexes.put(vertex, len(matrix.__vertices))
+            matrix.__vertices.append(vertex)
+        return matrix
+
+    def triangle(self) -> Union[array[float], memoryview]:
+        """
+        Returns the lower triangle of distances, row by row
+        """
+        return self.__data
+
+    def __len__(self) -> int:
+        return len(self.__vertices)
+
+    @staticmethod
+    def __offset(i: int, j: int) -> int:
+        if i < j:
+            i, j = j, i
+        return (i * (i + 1) >> 1) + j
+
+    def add_vertex(self, vertex: T) -> None:
+        """
+        Interns the vertex to the next free index and allocates its row of the
+        triangle
+
+        Time complexity: O(m)
+        """
+        if vertex in self.__indexes:
+            return
+        index = len(self.__vertices)
+        self.__indexes.put(vertex, index)
+        self.__vertices.append(vertex)
+        self.__data.extend(0.0 for _ in range(index + 1))
+
+    def add_edge(self, vertex1: T, vertex2: T, distance: float) -> None:
+        """
+        Sets the distance between two vertices. Only one cell is written as the
+        triangle is shared by both directions
+
+        Time complexity: O(1)
+        """
+        self.__data[self.__offset(self.index_of(vertex1),
+                                  self.index_of(vertex2))] = distance
+
+    def index_of(self, vertex: T) -> int:
+        """
+        Returns the integer index the vertex was interned to
+        """
+        index = self.__indexes.get(vertex)
+        if index is None:
+            raise KeyError(vertex)
+        return index
+
+    def vertex_at(self, index: int) -> T:
+        """
+        Returns the vertex interned at the given index
+        """
+        return self.__vertices[index]
+
+    def distance_between(self, vertex1: T, vertex2: T) -> float:
+        """
+        Returns the distance between two vertices
+
+        Time complexity: O(1)
+        """
+        return self.__data[self.__offset(self.index_of(vertex1),
+                                         self.index_of(vertex2))]
+
+    def distance_between_indexes(self, i: int, j: int) -> float:
+        """
+        Returns the distance between two interned indexes, skipping the vertex
+        lookup entirely
+
+        Time complexity: O(1)
+        """
+        if i < j:
+            i, j = j, i
+        return self.__data[(i * (i + 1) >> 1) + j]
+
+    def row(self, vertex: T) -> array[float]:
+        """
+        Returns the distances from the vertex to every other vertex, ordered by
+        index
+
+        Time complexity: O(m)
+        """
+        i = self.index_of(vertex)
+        data = self.__data
+        start = i * (i + 1) >> 1
+        row = array('d', data[start:start + i + 1])
+        # the remainder of the row is the column below the diagonal
+        row.extend(data[(j * (j + 1) >> 1) + i]
+                   for j in range(i + 1, len(self.__vertices)))
+        return row
+
+    def distances_from(self, vertex: T, candidates: Iterable[T]) -> list[float]:
+        """
+        Returns the distances from the vertex to each of the candidates, in the
+        order the candidates were given
+
+        Time complexity: O(n)
+        """
+        i = self.index_of(vertex)
+        data = self.__data
+        indexes = self.__indexes
+        distances: list[float] = []
+        for candidate in candidates:
+            j = indexes.get(candidate)
+            if j is None:
+                raise KeyError(candidate)
+            distances.append(data[(i * (i + 1) >> 1) + j] if j <= i
+                             else data[(j * (j + 1) >> 1) + i])
+        return distances
+
+    def closest(self, vertex: T, candidates: Sequence[T], mask: Optional[Sequence[bool]] = None) -> int:
+        """
+        Returns the position of the candidate closest to the vertex or -1 if
+        there are no candidates. When a mask is given, only candidates whose
+        mask entry is truthy are considered. Ties are resolved in favor of the
+        earliest candidate
+
+        Time complexity: O(n)
+        """
+        distances = self.distances_from(vertex, candidates)
+        positions = range(len(distances)) if mask is None else [
+            i for i in range(len(distances)) if mask[i]]
+        if len(positions) == 0:
+            return -1
+        return min(positions, key=distances.__getitem__)
@@ -0,0 +1,44 @@
+from __future__ import annotations
+import heapq
+from typing import Generic, TypeVar
+from datastructures.matrix import DistanceMatrix
+
+T = TypeVar('T')
+
+
+class NeighborIndex(Generic[T]):
+    """
+    Holds the k nearest vertices of every vertex of a distance matrix, sorted
+    by distance. A vertex is its own nearest neighbor at distance zero so that
+    callers walking the list also see the vertex they start from
+    """
+    __neighbors: list[list[tuple[float, int]]]
+
+    def __init__(self, matrix: DistanceMatrix[T], k: int) -> None:
+        """
+        Time complexity: O(m^2 log k)
+        Space complexity: O(m * k)
+        """
+        self.__matrix = matrix
+        self.k = k
+        self.__neighbors = [self.__nearest(i) for i in range(len(matrix))]
+
+    def __nearest(self, i: int) -> list[tuple[float, int]]:
+        distance = self.__matrix.distance_between_indexes
+        return heapq.nsmallest(self.k, ((distance(i, j), j) for j in range(len(self.__matrix))))
+
+    def neighbors(self, vertex: T) -> list[tuple[float, int]]:
+        """
+        Returns the (distance, index) pairs of the vertex's nearest neighbors in
+        increasing order of distance, ties are ordered by index
+        """
+        return self.__neighbors[self.__matrix.index_of(vertex)]
+
+    def exhausted(self, vertex: T, distance: float) -> bool:
+        """
+        Returns whether a vertex at the given distance could lie beyond the end
+        of the neighbor list, in which case the list can't be relied upon to
+        have found the closest vertex
+        """
+        neighbors = self.neighbors(vertex)
+        return len(neighbors) < len(self.__matrix) and distance >= neighbors[-1][0]
@@ -2,9 +2,84 @@
 # Andrew Dibble - 001467899
 #
 
-from app import start_app
-from wgups.schedule import schedule_delivery
+import argparse
+from contextlib import nullcontext
+import sys
+from app import run_batch, start_app
+from wgups import cache
+from wgups.eventlog import EventLog, Replayer
+from wgups.truck import Truck
 
-packages, trucks = schedule_delivery()
+PACKAGES_PATH = 'packages.csv'
+DISTANCES_PATH = 'distances.csv'
+# what the schedule is computed with, a cached schedule is only used for the
+# same settings and files
+SETTINGS = {'trucks': 2, 'neighbors': 10, 'simulate': False}
 
-start_app(packages, trucks)
+parser = argparse.ArgumentParser(description='WGUPS Package Tracking')
+parser.add_argument('--batch', metavar='FILE',
+                    help='answer the `HH:MM <package ID | all | conditions>` queries in FILE (- for stdin) instead of prompting')
+parser.add_argument('--format', choices=['tsv', 'jsonl'], default='tsv',
+                    help='the output format of batch mode')
+parser.add_argument('--color', action='store_true',
+                    help='color the statuses in batch mode with ANSI escape codes')
+parser.add_argument('--cache-dir', default='.cache',
+                    help='where to keep the compiled distance table and the computed schedule between runs')
+parser.add_argument('--no-cache', action='store_true',
+                    help='parse the files and compute the schedule without reading or writing the cache')
+parser.add_argument('--metrics', metavar='FILE',
+                    help='write the phase timings and operation counts of scheduling to FILE as JSON')
+parser.add_argument('--profile', action='store_true',
+                    help='include the functions that took the most time in the metrics')
+parser.add_argument('--trace-memory', action='store_true',
+                    help='include the peak memory and the lines that allocated the most in the metrics')
+parser.add_argument('--serve', action='store_true',
+                    help='answer tracking queries over HTTP on localhost instead of prompting')
+parser.add_argument('--port', type=int, default=8950,
+                    help='the port of the HTTP service')
+parser.add_argument('--event-log', metavar='FILE',
+                    help='write the loads, trips and address corrections of the day to FILE as JSON Lines')
+parser.add_argument('--replay', metavar='FILE',
+                    help='answer queries from the day recorded in the event log FILE instead of scheduling')
+args = parser.parse_args()
+
+# measuring or logging the scheduler needs it to run
+use_cache = not (args.no_cache or args.metrics or args.event_log)
+schedule_key = cache.key(PACKAGES_PATH, DISTANCES_PATH, SETTINGS) if use_cache else b''
+schedule_path = cache.cache_path(args.cache_dir, schedule_key)
+
+if args.replay is not None:
+    packages, trucks = Replayer.load(args.replay).final()
+elif use_cache and (cached := cache.load(schedule_path, schedule_key)) is not None:
+    packages, trucks = cached
+else:
+    # the scheduler takes a while to import and is only needed without a
+    # usable cached schedule
+    from wgups.metrics import capture
+    from wgups.schedule import schedule_delivery
+    with capture(args.profile, args.trace_memory) if args.metrics else nullcontext() as metrics, \
+            EventLog(args.event_log) if args.event_log else nullcontext() as event_log:
+        packages, trucks = schedule_delivery(
+            Truck.fleet(SETTINGS['trucks']),
+            packages_path=PACKAGES_PATH,
+            distances_path=DISTANCES_PATH,
+            neighbors=SETTINGS['neighbors'],
+            simulate=SETTINGS['simulate'],
+            cache_dir=None if args.no_cache else args.cache_dir,
+            timings=None if metrics is None else metrics.timings,
+            event_log=event_log)
+    if metrics is not None:
+        metrics.dump(args.metrics)
+    if use_cache:
+        cache.save(schedule_path, packages, trucks, schedule_key)
+
+if args.serve:
+    from wgups.service import serve
+    serve(packages, trucks, port=args.port)
+elif args.batch is None:
+    start_app(packages, trucks)
+elif args.batch == '-':
+    sys.exit(1 if run_batch(packages, sys.stdin, sys.stdout, args.format, args.color) else 0)
+else:
+    with open(args.batch) as queries:
+        sys.exit(1 if run_batch(packages, queries, sys.stdout, args.format, args.color) else 0)
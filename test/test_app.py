@@ -0,0 +1,107 @@
+import asyncio
+import io
+import json
+import unittest
+from app import run_batch
+from wgups.schedule import schedule_delivery
+from wgups.service import TrackingService
+
+
+class TestBatch(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.packages, _ = schedule_delivery()
+
+    def test_tsv(self):
+        out = io.StringIO()
+        errors = run_batch(self.packages, ['9:00 1', '', '# comment', '10:00 all'], out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(errors, 0)
+        self.assertEqual(len(lines), 41)
+        self.assertEqual(lines[0], f'9:00\t{self.packages.get(1).info(540, False)}')
+        self.assertNotIn('\033', out.getvalue())
+
+    def test_jsonl(self):
+        out = io.StringIO()
+        errors = run_batch(self.packages, ['12:00 all', 'nonsense', '9:00 999'], out,
+                           fmt='jsonl', color=True)
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(errors, 2)
+        self.assertEqual([row['id'] for row in rows], list(range(1, 41)))
+        self.assertTrue(all(row['status'] == 'DELIVERED' for row in rows))
+        self.assertIn('\033', rows[0]['info'])
+
+    def test_conditions(self):
+        out = io.StringIO()
+        errors = run_batch(self.packages, ['9:00 status=delivered,truck=1,deadline<10:31',
+                                           '12:00 zipcode=84111', '9:00 deadline=9:00',
+                                           '9:00 color=red'], out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(errors, 2)
+        early = [p for (_, p) in self.packages
+                 if p.delivered_by == 1 and p.deadline < 631 and p.delivered_at <= 540]
+        zipcode = sorted((p for (_, p) in self.packages if p.zipcode == '84111'), key=lambda p: p.id)
+        self.assertNotEqual(early, [])
+        self.assertEqual(len(lines), len(early) + len(zipcode))
+        self.assertEqual(lines[len(early):], [f'12:00\t{p.info(720, False)}' for p in zipcode])
+
+
+class TestService(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.packages, cls.trucks = schedule_delivery()
+
+    def test_respond(self):
+        service = TrackingService(self.packages, self.trucks)
+        status, body = service.respond('GET', '/packages/9?time=9:00')
+        self.assertEqual(status, 200)
+        package = json.loads(body)
+        self.assertEqual(package['status'], self.packages.get(9).status(540))
+        self.assertEqual(package['weight'], self.packages.get(9).mass)
+        status, body = service.respond('GET', '/packages?time=12:00')
+        self.assertEqual([p['id'] for p in json.loads(body)['packages']], list(range(1, 41)))
+        self.assertEqual(json.loads(service.respond('GET', '/trucks')[1])['total_miles'], 116.5)
+        self.assertEqual(service.respond('GET', '/packages/99?time=9:00')[0], 404)
+        self.assertEqual(service.respond('GET', '/packages/1')[0], 400)
+        self.assertEqual(service.respond('GET', '/nothing')[0], 404)
+        self.assertEqual(service.respond('POST', '/trucks')[0], 405)
+
+    def test_cache(self):
+        service = TrackingService(self.packages, self.trucks)
+        # nothing happens to package 9 between these times
+        first = service.respond('GET', '/packages/9?time=9:00')[1]
+        self.assertIs(service.respond('GET', '/packages/9?time=9:01')[1], first)
+        self.assertEqual((service.hits, service.misses), (1, 1))
+        later = json.loads(service.respond('GET', '/packages/9?time=17:00')[1])
+        self.assertTrue(later['status'].startswith('Delivered'))
+        self.assertEqual(service.misses, 2)
+        # the time of a cached response for all packages is still the queried one
+        service.respond('GET', '/packages?time=7:00')
+        self.assertEqual(json.loads(service.respond('GET', '/packages?time=7:01')[1])['time'], '7:01')
+
+    def test_http(self):
+        service = TrackingService(self.packages, self.trucks)
+
+        async def requests():
+            server = await service.start(port=0)
+            port = server.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            responses = []
+            for target in ['/packages/1?time=9:00', '/trucks']:
+                writer.write(f'GET {target} HTTP/1.1\r\nHost: localhost\r\n\r\n'.encode())
+                status = await reader.readline()
+                headers = {}
+                while (line := await reader.readline()) != b'\r\n':
+                    name, _, value = line.decode().partition(':')
+                    headers[name.lower()] = value.strip()
+                body = await reader.readexactly(int(headers['content-length']))
+                responses.append((status, json.loads(body)))
+            writer.close()
+            server.close()
+            await server.wait_closed()
+            return responses
+
+        responses = asyncio.run(requests())
+        self.assertTrue(all(status.startswith(b'HTTP/1.1 200') for (status, _) in responses))
+        self.assertEqual(responses[0][1]['id'], 1)
+        self.assertEqual(responses[1][1]['trucks'][0]['miles'], 45.2)
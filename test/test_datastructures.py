@@ -1,6 +1,6 @@
 from datastructures.graph import Graph
 import unittest
-from datastructures import HashMap
+from datastructures import CompactHashMap, DisjointSet, DistanceMatrix, HashMap, IntHashMap, NeighborIndex
 
 
 class TestMap(unittest.TestCase):
@@ -36,6 +36,84 @@ class TestMap(unittest.TestCase):
         m.put('key', 'value')
         self.assertEqual(m.get('key'), 'value')
 
+    def test_growth(self):
+        m = HashMap[int, int]()
+        for i in range(1000):
+            m.put(i, i * 2)
+        self.assertEqual(len(m), 1000)
+        self.assertEqual(len(m._HashMap__storage), 2048)
+        self.assertTrue(all(m.get(i) == i * 2 for i in range(1000)))
+
+    def test_from_items(self):
+        m = HashMap.from_items([(i, str(i)) for i in range(10)])
+        self.assertEqual(len(m._HashMap__storage), 16)
+        self.assertEqual(sorted(m.keys()), list(range(10)))
+        self.assertEqual(sorted(m.values()), sorted(map(str, range(10))))
+        m.update([(10, '10'), (0, 'zero')])
+        self.assertEqual(len(m), 11)
+        self.assertEqual(m.get(0), 'zero')
+        self.assertIn((10, '10'), list(m.items()))
+
+    def test_remove(self):
+        m = HashMap[str, int]()
+        m.put('a', 1)
+        m.put('b', 2)
+        self.assertEqual(m.remove('a'), 1)
+        self.assertIsNone(m.remove('a'))
+        self.assertNotIn('a', m)
+        self.assertEqual(m.get('b'), 2)
+        self.assertEqual(len(m), 1)
+
+
+class TestCompactMap(unittest.TestCase):
+    def check_map(self, m, keys):
+        for (i, key) in enumerate(keys):
+            m.put(key, i)
+        self.assertEqual(len(m), len(keys))
+        self.assertTrue(all(m.get(key) == i for (i, key) in enumerate(keys)))
+        m.put(keys[0], -1)
+        self.assertEqual(m.get(keys[0]), -1)
+        self.assertEqual(len(m), len(keys))
+        for key in keys[::2]:
+            self.assertIsNotNone(m.remove(key))
+        self.assertTrue(all(key not in m for key in keys[::2]))
+        self.assertTrue(all(key in m for key in keys[1::2]))
+        self.assertEqual(set(k for (k, _) in m), set(keys[1::2]))
+        self.assertIsNone(m.get(keys[0]))
+
+    def test_compact_map(self):
+        self.check_map(CompactHashMap[object, int](),
+                       [f'key {i}' for i in range(100)] + list(range(100)))
+
+    def test_int_map(self):
+        self.check_map(IntHashMap[int](), [i * 64 for i in range(200)])
+
+
+class TestDisjointSet(unittest.TestCase):
+    def test_union(self):
+        s = DisjointSet(4)
+        self.assertEqual(s.add(), 4)
+        self.assertFalse(s.connected(0, 1))
+        s.union(0, 1)
+        s.union(3, 4)
+        root = s.union(1, 4)
+        self.assertTrue(all(s.find(i) == root for i in [0, 1, 3, 4]))
+        self.assertEqual(s.size(0), 4)
+        self.assertEqual(s.size(2), 1)
+        self.assertEqual(s.union(0, 3), root)
+        copy = s.copy()
+        copy.union(2, 0)
+        self.assertEqual((copy.size(0), s.size(0)), (5, 4))
+        self.assertEqual(len(s), 5)
+
+    def test_chain(self):
+        # a long chain stays shallow once its paths are halved
+        s = DisjointSet(10_000)
+        for i in range(1, 10_000):
+            s.union(i, i - 1)
+        self.assertTrue(all(s.connected(0, i) for i in range(10_000)))
+        self.assertEqual(s.size(9_999), 10_000)
+
 
 class TestGraph(unittest.TestCase):
     def test_distance_between(self):
@@ -45,3 +123,45 @@ class TestGraph(unittest.TestCase):
         g.add_vertex(place2)
         g.add_edge(place1, place2, 1.0)
         self.assertEqual(g.distance_between(place1, place2), 1.0)
+
+
+class TestDistanceMatrix(unittest.TestCase):
+    def setUp(self):
+        self.m = DistanceMatrix[str]()
+        for place in ['a', 'b', 'c']:
+            self.m.add_vertex(place)
+        self.m.add_edge('b', 'a', 1.0)
+        self.m.add_edge('a', 'c', 2.0)
+        self.m.add_edge('c', 'b', 3.0)
+
+    def test_distance_between(self):
+        self.assertEqual(self.m.distance_between('a', 'b'), 1.0)
+        self.assertEqual(self.m.distance_between('b', 'a'), 1.0)
+        self.assertEqual(self.m.distance_between('c', 'b'), 3.0)
+        self.assertEqual(self.m.distance_between('a', 'a'), 0.0)
+        self.assertEqual(self.m.distance_between_indexes(0, 2), 2.0)
+
+    def test_row(self):
+        self.assertEqual(list(self.m.row('b')), [1.0, 0.0, 3.0])
+        self.assertEqual(self.m.distances_from('c', ['a', 'b']), [2.0, 3.0])
+
+    def test_closest(self):
+        self.assertEqual(self.m.closest('a', ['c', 'b', 'b']), 1)
+        self.assertEqual(self.m.closest(
+            'a', ['c', 'b'], [True, False]), 0)
+        self.assertEqual(self.m.closest('a', []), -1)
+
+    def test_from_buffer(self):
+        m = DistanceMatrix.from_buffer(['a', 'b', 'c'],
+                                       memoryview(bytes(self.m.triangle())).cast('d'))
+        self.assertEqual(m.distance_between('c', 'b'), 3.0)
+        self.assertEqual(list(m.row('b')), [1.0, 0.0, 3.0])
+        with self.assertRaises(ValueError):
+            DistanceMatrix.from_buffer(['a', 'b'], memoryview(bytes(self.m.triangle())).cast('d'))
+
+    def test_neighbors(self):
+        index = NeighborIndex(self.m, 2)
+        self.assertEqual(index.neighbors('c'), [(0.0, 2), (2.0, 0)])
+        self.assertTrue(index.exhausted('c', 2.0))
+        self.assertFalse(index.exhausted('c', 1.0))
+        self.assertFalse(NeighborIndex(self.m, 3).exhausted('c', 3.0))
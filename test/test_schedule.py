@@ -1,7 +1,27 @@
+import gc
 import unittest
 import re
+import io
 import json
-from wgups.schedule import schedule_delivery
+import tempfile
+import tracemalloc
+import os
+from itertools import permutations
+from unittest.mock import patch
+from benchmarks.generate import generate
+from wgups import cache
+from wgups.eligibility import EligibilityIndex
+from wgups.eventlog import EventLog, Replayer
+from wgups.ingest import ingest
+from wgups.metrics import capture
+from wgups.multistart import multi_start
+from wgups.package import Package
+from wgups.replan import AddPackage, Change, ChangeAddress, DelayPackage, TruckOutOfService, replan
+from wgups.routing import _Route, held_karp, improve_route
+from wgups.schedule import Depot, Scheduler, schedule_delivery, schedule_horizon
+from wgups.sweep import Scenario, format_table, run_scenario, sweep
+from wgups.timeline import StatusTimeline
+from wgups.truck import Truck
 
 
 def strip_color_codes(string: str) -> str:
@@ -9,6 +29,536 @@ def strip_color_codes(string: str) -> str:
 
 
 class TestSchedule(unittest.TestCase):
+    def assert_requirements_met(self, packages):
+        for (_, pkg) in packages:
+            if pkg._Package__required_truck is not None:
+                self.assertEqual(pkg._Package__required_truck,
+                                 pkg._Package__delivered_by)
+            self.assertLessEqual(pkg.delivered_at, pkg.deadline)
+            self.assertLessEqual(
+                pkg._Package__available_at, pkg._Package__loaded_at)
+
+    def test_fleet(self):
+        fleet = [Truck(n, capacity=10, speed=25, start=7 * 60)
+                 for n in range(1, 6)]
+        packages, trucks = schedule_delivery(fleet)
+        self.assertTrue(all(p.is_delivered() for (_, p) in packages))
+        for (_, pkg) in packages:
+            if pkg.required_truck is not None:
+                self.assertEqual(pkg.required_truck,
+                                 pkg._Package__delivered_by)
+        self.assertEqual(sorted(t.number for t in trucks), [1, 2, 3, 4, 5])
+        self.assertEqual(trucks[0].time_at(25), 8 * 60)
+
+    def test_generated_instance(self):
+        with tempfile.TemporaryDirectory() as directory:
+            packages_path, distances_path = generate(300, 30, directory)
+            timings = {}
+            packages, _ = schedule_delivery(packages_path=packages_path,
+                                            distances_path=distances_path,
+                                            timings=timings)
+        self.assertEqual(len(packages), 300)
+        self.assertTrue(all(p.is_delivered() for (_, p) in packages))
+        self.assertTrue(any(p.wrong_address is False and p.address == '410 S State St (84111)'
+                            for (_, p) in packages))
+        self.assertEqual(set(timings), {'parsing', 'priority',
+                                        'distribution', 'dispatch'})
+
+    def test_neighbor_index(self):
+        with tempfile.TemporaryDirectory() as directory:
+            paths = generate(300, 30, directory, seed=1)
+            miles = []
+            for neighbors in [0, 3, 10]:
+                _, trucks = schedule_delivery(packages_path=paths[0], distances_path=paths[1],
+                                              neighbors=neighbors)
+                miles.append(sum(t.miles_traveled for t in trucks))
+        self.assertEqual(miles[0], miles[1])
+        self.assertEqual(miles[0], miles[2])
+
+    def test_priority_loading_order(self):
+        load = Scheduler._Scheduler__load
+        deliver_priority = Scheduler._Scheduler__deliver_priority_packages
+        # the trucks loaded by each round of priority packages, in order
+        rounds = []
+
+        def recording_priority(scheduler):
+            rounds.append([])
+            deliver_priority(scheduler)
+            rounds.append(None)
+
+        def recording_load(scheduler, truck, package):
+            if rounds[-1] is not None and (truck.number, truck.miles_traveled) not in rounds[-1]:
+                rounds[-1].append((truck.number, truck.miles_traveled))
+            load(scheduler, truck, package)
+
+        with tempfile.TemporaryDirectory() as directory, \
+                patch.object(Scheduler, '_Scheduler__load', recording_load), \
+                patch.object(Scheduler, '_Scheduler__deliver_priority_packages', recording_priority):
+            paths = generate(600, 40, directory, seed=3)
+            schedule_delivery(Truck.fleet(6), packages_path=paths[0], distances_path=paths[1])
+        # the trucks at the hub take the priority packages fewest miles first
+        rounds = [trucks for trucks in rounds if trucks is not None]
+        for trucks in rounds:
+            self.assertEqual(trucks, sorted(trucks, key=lambda truck: truck[1]))
+        self.assertTrue(any(len(trucks) > 1 and trucks[0][1] != trucks[-1][1] for trucks in rounds))
+
+    def test_priority_groups_that_fit(self):
+        deliver_priority = Scheduler._Scheduler__deliver_priority_packages
+        left_behind = []
+
+        def checked_priority(scheduler):
+            deliver_priority(scheduler)
+            # a truck only stops loading priority packages once none of the
+            # groups it could take still fit
+            for truck in scheduler.trucks:
+                if truck.en_route or not truck.on_shift() or truck.empty():
+                    continue
+                left_behind.extend(
+                    p.id for p in scheduler.index.query(status=Package.Status.AT_HUB)
+                    if p.priority(truck.get_time()) and p.available_for(truck)
+                    and len(p.group()) <= truck.capacity())
+
+        # the group of 2 to 4 is closer to package 1 than package 5, but only
+        # two packages fit after package 1
+        lines = ['1;4300 S 1300 E;Millcreek;UT;84117;10:30 AM;1;',
+                 '2;3595 Main St;Salt Lake City;UT;84115;10:30 AM;1;Must be delivered with 3, 4',
+                 '3;3595 Main St;Salt Lake City;UT;84115;10:30 AM;1;',
+                 '4;3595 Main St;Salt Lake City;UT;84115;10:30 AM;1;',
+                 '5;2530 S 500 E;Salt Lake City;UT;84106;10:30 AM;1;']
+        with tempfile.TemporaryDirectory() as directory, \
+                patch.object(Scheduler, '_Scheduler__deliver_priority_packages', checked_priority):
+            path = os.path.join(directory, 'packages.csv')
+            with open(path, 'w') as f:
+                f.write('\n'.join(lines))
+            packages, _ = schedule_delivery(Truck.fleet(2, capacity=3), packages_path=path)
+        self.assertEqual(left_behind, [])
+        self.assertEqual(packages.get(1).delivered_by, packages.get(5).delivered_by)
+        self.assertTrue(all(p.is_delivered() for (_, p) in packages))
+
+    def test_simulation(self):
+        schedule = schedule_delivery(simulate=True)
+        packages, trucks = schedule
+        self.assertTrue(all(p.is_delivered() for (_, p) in packages))
+        self.assertFalse(any(t.en_route for t in trucks))
+        self.assert_requirements_met(packages)
+        wrong_address = packages.get(9)
+        self.assertGreaterEqual(
+            wrong_address._Package__loaded_at, wrong_address.available_at)
+        # the corrected package was taken out of its listed destination
+        self.assertNotIn(wrong_address, schedule.destinations.get('300 State St (84103)') or [])
+        self.assertIn(wrong_address, schedule.destinations.get('410 S State St (84111)'))
+
+    def test_timeline(self):
+        packages, _ = schedule_delivery()
+        timeline = StatusTimeline(p for (_, p) in packages)
+        for time in [n * 60 for n in range(8, 13)]:
+            statuses = timeline.status_at(time)
+            counts = timeline.counts_at(time)
+            for (i, pkg) in enumerate(timeline.packages):
+                line = pkg.info(time)
+                self.assertIn(str(statuses[i]), line)
+                self.assertEqual(timeline.status_of(pkg.id, time), statuses[i])
+                self.assertEqual(timeline.info_at(time)[i], line)
+            for status in Package.Status:
+                self.assertEqual(counts[status], statuses.count(status))
+
+        changes = timeline.changes_between(9 * 60, 10 * 60)
+        self.assertNotEqual(len(changes), 0)
+        for (package_id, before, after) in changes:
+            self.assertEqual(timeline.status_of(package_id, 9 * 60), before)
+            self.assertEqual(timeline.status_of(package_id, 10 * 60), after)
+            self.assertNotEqual(before, after)
+
+    def test_route_improvement(self):
+        packages, trucks = schedule_delivery(route_improver=improve_route)
+        self.assertLess(sum(t.miles_traveled for t in trucks), 116.5)
+        self.assertGreater(sum(sum(t.trip_savings) for t in trucks), 0)
+        self.assert_requirements_met(packages)
+
+    def test_held_karp(self):
+        def shortest(route) -> float:
+            stops = set(route.stops)
+            orders = ([i for s in perm for i in route.order if route.stops[i] == s]
+                      for perm in permutations(stops))
+            return min(route.miles(order) for order in orders if route.feasible(order))
+
+        def exact(truck, graph):
+            expected = shortest(_Route(truck, graph)) if len(
+                set(p.address for p in truck.packages)) <= 7 else None
+            saved = held_karp(truck, graph)
+            if expected is not None:
+                route = _Route(truck, graph)
+                self.assertAlmostEqual(route.miles(route.order), expected)
+            return saved
+
+        packages, trucks = schedule_delivery(route_improver=exact)
+        self.assertLessEqual(sum(t.miles_traveled for t in trucks), 100.2)
+        self.assert_requirements_met(packages)
+        # loads with more stops than the limit are left to the heuristic
+        _, trucks = schedule_delivery(route_improver=lambda t, g: held_karp(t, g, 1, None))
+        self.assertEqual(round(sum(t.miles_traveled for t in trucks), 1), 116.5)
+
+    def test_deadline_boundary(self):
+        # swapping the first two stops saves miles but reaches package 35
+        # exactly at its deadline, which Schedule.valid counts as late
+        for improver in [held_karp, improve_route]:
+            schedule = schedule_delivery()
+            truck = Truck(1, speed=60)
+            truck.packages = [schedule.packages.get(i) for i in [35, 17, 29]]
+            route = _Route(truck, schedule.graph)
+            package = truck.packages[0]
+            package.store.deadlines[package.row] = int(route.arrivals([1, 0, 2])[0])
+            self.assertLess(route.miles([1, 0, 2]), route.miles([0, 1, 2]))
+            self.assertEqual(improver(truck, schedule.graph), 0)
+            self.assertEqual([p.id for p in truck.packages], [35, 17, 29])
+
+    def test_replan(self):
+        schedule = schedule_delivery()
+        departed = [trip.key() for trip in schedule.trips()
+                    if trip.departed_at <= 9 * 60 + 30]
+        new_package = Package('41', '1060 Dalton Ave S', 'Salt Lake City', 'UT', '84104',
+                              'EOD', '5', 'Must be delivered with 26')
+        changed = replan(schedule, 9 * 60 + 30, [
+            ChangeAddress(25, '5383 S 900 East #104', '84117'),
+            AddPackage(new_package),
+            DelayPackage(28, 11 * 60),
+        ])
+        self.assertNotEqual(changed, [])
+        self.assertTrue(all(trip.departed_at > 9 * 60 + 30 for trip in changed))
+        self.assertEqual([trip.key() for trip in schedule.trips()][:len(departed)], departed)
+        self.assertEqual(schedule.packages.get(25).address, '5383 S 900 E #104 (84117)')
+        self.assertEqual(new_package.delivered_by, schedule.packages.get(26).delivered_by)
+        self.assertIs(new_package.store, schedule.store)
+        self.assertGreaterEqual(schedule.packages.get(28).loaded_at, 11 * 60)
+        self.assertTrue(schedule.valid())
+
+        changed = replan(schedule, 10 * 60 + 31, [TruckOutOfService(1)])
+        self.assertTrue(all(trip.truck == 2 for trip in changed))
+        self.assertTrue(schedule.valid())
+        summary = schedule.summary()
+        with self.assertRaises(Exception):
+            replan(schedule, 12 * 60, [DelayPackage(1, 13 * 60)])
+        self.assertEqual(schedule.summary(), summary)
+        # every replan reuses the schedule's index
+        self.assertIs(schedule.store.index, schedule.index)
+        self.assertEqual(len(schedule.store._PackageStore__listeners), 1)
+
+        class Unchecked(Change):
+            def apply(self, schedule, time):
+                pass
+        with self.assertRaises(TypeError):
+            Unchecked()
+
+    def test_failed_replan(self):
+        schedule = schedule_delivery()
+        miles, trips, valid = schedule.miles(), [t.key() for t in schedule.trips()], schedule.valid()
+        statuses = [p.status(12 * 60) for (_, p) in schedule.packages]
+        new_package = Package('41', '1060 Dalton Ave S', 'Salt Lake City', 'UT', '84104',
+                              'EOD', '5', 'Can only be on truck 2')
+        # the changes can each be made, but nothing can deliver the new package
+        with self.assertRaises(Exception):
+            replan(schedule, 9 * 60 + 10, [TruckOutOfService(2), AddPackage(new_package)])
+        self.assertEqual(schedule.miles(), miles)
+        self.assertEqual([t.key() for t in schedule.trips()], trips)
+        self.assertEqual(schedule.valid(), valid)
+        self.assertEqual(len(schedule.store), 40)
+        self.assertIsNone(schedule.packages.get(41))
+        self.assertEqual([p.status(12 * 60) for (_, p) in schedule.packages], statuses)
+        self.assertEqual(schedule.index.equal('status', Package.Status.DELIVERED), list(range(40)))
+        self.assertEqual(new_package.id, 41)
+        self.assertIsNot(new_package.store, schedule.store)
+        # the schedule can still be replanned
+        replan(schedule, 9 * 60 + 10, [TruckOutOfService(2)])
+        self.assertTrue(schedule.valid())
+
+    def test_distance_cache(self):
+        with tempfile.TemporaryDirectory() as directory:
+            compiled = schedule_delivery(cache_dir=directory)
+            self.assertEqual(len(os.listdir(directory)), 1)
+            mapped = schedule_delivery(cache_dir=directory)
+            self.assertIsInstance(mapped.graph.triangle(), memoryview)
+            self.assertEqual(list(mapped.graph.triangle()),
+                             list(compiled.graph.triangle()))
+            self.assertEqual(mapped.summary(), compiled.summary())
+            # an edited table is compiled again under its new hash
+            with open('distances.csv') as f:
+                edited = os.path.join(directory, 'distances.csv')
+                with open(edited, 'w') as out:
+                    out.write(f.read().replace('7.2', '7.3', 1))
+            schedule_delivery(distances_path=edited, cache_dir=directory)
+            self.assertEqual(len([name for name in os.listdir(directory)
+                                  if name.endswith('.bin')]), 2)
+
+    def test_schedule_cache(self):
+        packages, trucks = schedule_delivery()
+        key = cache.key('packages.csv', 'distances.csv', {'trucks': 2})
+        self.assertNotEqual(key, cache.key('packages.csv', 'distances.csv', {'trucks': 3}))
+        with tempfile.TemporaryDirectory() as directory:
+            path = cache.cache_path(directory, key)
+            self.assertIsNone(cache.load(path, key))
+            cache.save(path, packages, trucks, key)
+            self.assertIsNone(cache.load(path, b'stale'))
+            cached, cached_trucks = cache.load(path, key)
+            self.assertEqual([t.miles_traveled for t in cached_trucks],
+                             [t.miles_traveled for t in trucks])
+            for (_, p) in packages:
+                self.assertEqual(cached.get(p.id).info(600), p.info(600))
+            # the packages are the views of one store, grouped as before
+            package = cached.get(15)
+            self.assertIs(package.store.view(package.row), package)
+            self.assertEqual(sorted(p.id for p in package.group()),
+                             sorted(p.id for p in packages.get(15).group()))
+            self.assertIn(package, cached_trucks[0].trips[0].packages +
+                          cached_trucks[1].trips[0].packages)
+            with open(path, 'wb') as f:
+                f.write(b'garbage')
+            self.assertIsNone(cache.load(path, key))
+
+    def test_ingest(self):
+        with open('packages.csv') as f:
+            lines = f.readlines()
+        whole = [p for chunk in ingest('packages.csv') for p in chunk]
+        chunks = list(ingest(lines, chunk_size=3))
+        self.assertEqual([len(c) for c in chunks], [3] * 13 + [1])
+        chunked = [p for chunk in chunks for p in chunk]
+        self.assertEqual([p.id for p in chunked], [p.id for p in whole])
+        # 14 names 15 and 19, which are parsed in later chunks
+        for (a, b) in zip(whole, chunked):
+            self.assertEqual(sorted(d.id for d in a.dependencies),
+                             sorted(d.id for d in b.dependencies))
+        self.assertEqual(sorted(d.id for d in chunked[13].dependencies), [15, 19])
+        subset = [p for chunk in ingest(lines, package_ids=[14, 15]) for p in chunk]
+        self.assertEqual([d.id for d in subset[0].dependencies], [15])
+
+    def test_ingest_memory(self):
+        def peak(count):
+            with tempfile.TemporaryDirectory() as directory:
+                path, _ = generate(count, 30, directory)
+                tracemalloc.start()
+                for chunk in ingest(path, chunk_size=1000):
+                    del chunk
+                    # a store and its views reference each other
+                    gc.collect()
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+            return peak
+
+        # streaming four times the packages keeps the same chunks alive
+        self.assertLess(peak(20_000), peak(5_000) * 1.2)
+
+    def test_package_store(self):
+        schedule = schedule_delivery()
+        store = schedule.store
+        self.assertEqual(len(store), 40)
+        self.assertFalse(hasattr(store.view(0), '__dict__'))
+        self.assertIs(schedule.packages.get(1), store.view(0))
+        # every view reads its row
+        self.assertEqual([p.id for p in store], list(range(1, 41)))
+        self.assertEqual(store.view(8).address, '410 S State St (84111)')
+        self.assertEqual(store.view(5).available_at, 9 * 60 + 5)
+        self.assertEqual(store.view(2).required_truck, 2)
+        self.assertEqual(sorted(p.id for p in store.view(13).dependencies), [15, 19])
+        self.assertEqual(store.undelivered(), 0)
+        # the scans match the per-package checks
+        for p in store:
+            p.reset()
+        self.assertEqual(store.at_hub_before(10 * 60 + 30),
+                         [p.row for p in store if p.at_hub() and p.deadline < 10 * 60 + 30])
+        self.assertEqual(store.next_available(9 * 60 + 5), 10 * 60 + 20)
+        self.assertEqual(store.undelivered(), 40)
+        # strings are interned once per store
+        self.assertLess(len(store.strings), 5 * 40)
+
+    def test_metrics(self):
+        with capture(profile=True, memory=True, top=5) as metrics:
+            _, trucks = schedule_delivery(timings=metrics.timings)
+        self.assertEqual(round(sum(t.miles_traveled for t in trucks), 1), 116.5)
+        exported = json.loads(metrics.to_json())
+        self.assertTrue({'parsing', 'priority', 'distribution', 'dispatch', 'total'}
+                        <= exported['timings'].keys())
+        counters = exported['counters']
+        for counter in ['distance_between_indexes', 'available_for', 'hashmap_resizes',
+                        'hashmap_probes', 'int_hashmap_probes', 'packages_scanned']:
+            self.assertGreater(counters[counter], 0, counter)
+        self.assertGreaterEqual(counters['hashmap_probes'], counters['hashmap_lookups'])
+        self.assertEqual(len(exported['profile']), 5)
+        self.assertGreater(exported['memory']['peak_bytes'], 0)
+        # the counting wrappers are removed once the capture ends
+        with capture() as after:
+            pass
+        schedule_delivery()
+        self.assertEqual(after.counters, {})
+
+    def test_groups(self):
+        packages = {p.id: p for chunk in ingest('packages.csv', chunk_size=5) for p in chunk}
+        # the notes of 14, 16 and 20 only link the packages after them, which
+        # puts 16 in the group of 14 through 19 but leaves 13 and 20 alone
+        self.assertEqual(sorted(p.id for p in packages[15].group()), [14, 15, 16, 19])
+        self.assertEqual([p.id for p in packages[13].group()], [13])
+        # the group spans two chunks, whose stores have groups of their own
+        groups = packages[14].store.groups
+        self.assertIsNot(packages[19].store.groups, groups)
+        self.assertEqual(sorted(p.id for p in packages[19].group()), [14, 15, 16, 19])
+        root = groups.find(packages[14].store.group_elements[packages[14].row])
+        self.assertEqual(groups.size(root), 4)
+        self.assertEqual(groups.deadlines[root], packages[15].deadline)
+        truck = Truck(1)
+        self.assertTrue(packages[19].available_for(truck))
+        packages[16].delay(9 * 60)
+        self.assertEqual(groups.available_at[root], 9 * 60)
+        self.assertFalse(packages[19].available_for(truck))
+        truck.wait_until(9 * 60)
+        self.assertTrue(packages[19].available_for(truck))
+        # a group can't be restricted to two trucks
+        lines = ['1;a;b;c;84101;EOD;1;Must be delivered with 2, 3',
+                 '2;a;b;c;84101;EOD;1;Can only be on truck 1',
+                 '3;a;b;c;84101;EOD;1;Can only be on truck 2']
+        with self.assertRaises(Exception):
+            list(ingest(lines))
+
+    def test_eligibility_index(self):
+        store = next(ingest('packages.csv', chunk_size=100)).pop().store
+        index = EligibilityIndex(store)
+        self.assertEqual(len(index), 0)
+        index.release(8 * 60)
+        truck1, truck2 = Truck(1), Truck(2)
+        first = [p.id for p in index.candidates(truck1)]
+        # delayed packages, the wrong address and those restricted to truck 2
+        self.assertTrue(all(p not in first for p in [6, 9, 3, 18, 25, 28, 32, 36, 38]))
+        self.assertEqual(first, sorted(first))
+        self.assertIn(3, [p.id for p in index.candidates(truck2)])
+        truck1.load_package(store.view(0))
+        index.remove(store.view(0))
+        self.assertNotIn(1, [p.id for p in index.candidates(truck1)])
+        # truck 2's clock passes the delayed packages' arrival
+        truck2.wait_until(9 * 60 + 5)
+        index.release(truck2.get_time())
+        self.assertIn(6, [p.id for p in index.candidates(truck2)])
+        self.assertNotIn(6, [p.id for p in index.candidates(truck1)])
+        store.view(8).update_address()
+        index.release(10 * 60 + 20)
+        truck1.wait_until(10 * 60 + 20)
+        self.assertIn(9, [p.id for p in index.candidates(truck1)])
+
+    def test_event_log(self):
+        out = io.StringIO()
+        schedule = schedule_delivery(event_log=EventLog(out))
+        replayer = Replayer(out.getvalue().splitlines(), interval=8)
+        # the golden files are regenerated from the day at its end
+        packages, trucks = replayer.final()
+        self.assertEqual(sorted(round(t.miles_traveled, 1) for t in trucks), [45.2, 71.3])
+        for time in [n * 60 for n in range(8, 13)]:
+            with open(f'test/packages/{time}.json', 'r') as f:
+                data = json.loads(f.read())
+            self.assertEqual(data, {str(p.id): strip_color_codes(p.info(time))
+                                    for (_, p) in packages})
+
+        # package 9 has the address it was listed with until it's corrected
+        packages, trucks = replayer.at(10 * 60)
+        self.assertEqual(packages.get(9).address, '300 State St (84103)')
+        self.assertTrue(packages.get(9).wrong_address)
+        self.assertEqual(packages.get(9).info(600, False), schedule.packages.get(9).info(600, False)
+                         .replace(schedule.packages.get(9).address, packages.get(9).address))
+        self.assertEqual([round(t.miles_traveled, 1) for t in trucks], [36.0, 36.0])
+        self.assertTrue(all(t.en_route for t in trucks))
+        self.assertEqual(replayer.at(0)[0].get(1).loaded_at, None)
+
+    def test_depots(self):
+        horizon = schedule_horizon([Depot('HUB', Truck.fleet(2)),
+                                    Depot('1060 Dalton Ave S (84104)', Truck.fleet(2, first=3))],
+                                   ['packages.csv'])
+        hub, dalton = horizon.days[0]
+        self.assertEqual(len(hub.packages) + len(dalton.packages), 40)
+        self.assertTrue(hub.valid() and dalton.valid())
+        self.assertIs(hub.graph, dalton.graph)
+        # packages restricted to truck 2 are sent to its depot
+        self.assertIsNotNone(hub.packages.get(3))
+        self.assertTrue(all(t.depot == '1060 Dalton Ave S (84104)' for t in dalton.trucks))
+        self.assert_requirements_met(hub.packages)
+        with self.assertRaises(Exception):
+            schedule_horizon([Depot(), Depot('HUB')], ['packages.csv'])
+
+    def test_carry_over(self):
+        # the trucks are only loaded until 9:00, what's left waits for the next day
+        horizon = schedule_horizon([Depot('HUB', Truck.fleet(2, end=9 * 60))],
+                                   ['packages.csv'], days=2)
+        first, second = horizon.summary()
+        self.assertNotEqual(first['carried_over'], 0)
+        self.assertEqual(second['packages'], first['carried_over'])
+        self.assertEqual(horizon.undelivered(), [])
+        self.assertEqual(set(i for (i, _) in horizon.days[1][0].packages),
+                         set(p.id for p in horizon.carried[0]))
+        # the first day still shows the packages it carried over at the hub,
+        # the second day delivers copies of them
+        day_one = horizon.days[1][0].packages
+        for p in horizon.carried[0]:
+            self.assertTrue(p.at_hub())
+            self.assertNotIn('Delivered', p.status(17 * 60))
+            self.assertIsNot(day_one.get(p.id), p)
+            self.assertTrue(day_one.get(p.id).is_delivered())
+        self.assertFalse(horizon.days[0][0].valid())
+        self.assertEqual(sum(1 for (_, p) in horizon.days[0][0].packages if not p.is_delivered()),
+                         first['carried_over'])
+        self.assertIs(horizon.days[0][0].graph, horizon.days[1][0].graph)
+
+    def test_package_index(self):
+        schedule = schedule_delivery()
+        index, packages = schedule.index, [p for (_, p) in schedule.packages]
+        for (field, value) in [('zipcode', '84111'), ('city', 'Salt Lake City'), ('truck', 2),
+                               ('status', Package.Status.DELIVERED)]:
+            self.assertEqual(set(p.id for p in index.query(**{field: value})),
+                             set(p.id for p in packages if {
+                                 'zipcode': p.zipcode, 'city': p.city, 'truck': p.delivered_by,
+                                 'status': Package.Status.DELIVERED}[field] == value))
+        self.assertIn(9, [p.id for p in index.query(zipcode='84111')])
+        self.assertEqual(set(p.id for p in index.query(truck=1, deadline=(None, 10 * 60 + 30))),
+                         set(p.id for p in packages
+                             if p.delivered_by == 1 and p.deadline < 10 * 60 + 30))
+        self.assertEqual(index.rows(delivered_at=(0, float('inf'))), list(range(len(packages))))
+        with self.assertRaises(Exception):
+            index.equal('deadline', 0)
+
+        # the index follows the packages
+        package = schedule.packages.get(1)
+        package.change_address('410 S State St', '84111')
+        self.assertIn(package, index.query(zipcode='84111'))
+        self.assertNotIn(package, index.query(zipcode='84115'))
+        truck = package.delivered_by
+        package.reset()
+        self.assertEqual(index.query(status=Package.Status.AT_HUB), [package])
+        self.assertNotIn(package, index.query(truck=truck))
+        self.assertNotIn(package, index.query(delivered_at=(None, None)))
+
+    def test_reentrant(self):
+        first = schedule_delivery()
+        second = schedule_delivery(package_ids=range(1, 21))
+        self.assertEqual(len(second.packages), 20)
+        self.assertEqual(first.summary(), schedule_delivery().summary())
+        self.assertIsNot(first.graph, second.graph)
+        self.assert_requirements_met(first.packages)
+
+    def test_sweep(self):
+        scenarios = [Scenario('default'), Scenario('three trucks', 3, start=9 * 60),
+                     Scenario('one truck', 1)]
+        results = sweep(scenarios, workers=2)
+        self.assertEqual([r['scenario'] for r in results],
+                         ['default', 'three trucks', 'one truck'])
+        self.assertEqual(results[0]['miles'], 116.5)
+        self.assertEqual(results[1], run_scenario(scenarios[1]))
+        # packages 3, 18 and 36 can only be on truck 2
+        self.assertIn('error', results[2])
+        self.assertEqual(len(format_table(results).splitlines()), 4)
+
+    def test_multi_start(self):
+        self.assertEqual(schedule_delivery(seed=7).summary(),
+                         schedule_delivery(seed=7).summary())
+        schedule = multi_start(starts=16, workers=2)
+        self.assertTrue(schedule.valid())
+        self.assertLessEqual(schedule.miles(), 116.5)
+        self.assertEqual(schedule.miles(), schedule_delivery(
+            seed=schedule.seed).miles())
+        self.assert_requirements_met(schedule.packages)
+
     def test_schedule(self):
         packages, trucks = schedule_delivery()
         trucks.sort(key=lambda t: t.number)
@@ -23,10 +573,4 @@ class TestSchedule(unittest.TestCase):
                     self.assertEqual(
                         data[str(pkg.id)], strip_color_codes(pkg.info(time)))
 
-        for (_, pkg) in packages:
-            if pkg._Package__required_truck is not None:
-                self.assertEqual(pkg._Package__required_truck,
-                                 pkg._Package__delivered_by)
-            self.assertLessEqual(pkg.delivered_at, pkg.deadline)
-            self.assertLessEqual(
-                pkg._Package__available_at, pkg._Package__loaded_at)
+        self.assert_requirements_met(packages)
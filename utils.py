@@ -1,5 +1,8 @@
 import os
-from typing import Any, Match
+from contextlib import contextmanager
+from functools import lru_cache
+from time import perf_counter
+from typing import Any, Callable, Iterator, Match, Optional, Union
 import re
 
 dirs = {'north': 'N', 'south': 'S', 'east': 'E', 'west': 'W', '\n': ' '}
@@ -10,12 +13,17 @@ def __direction_to_letter(m: Match[str]) -> str:
     return ' ' if match == '\n' else match.upper()
 
 
+__DIRECTIONS__ = re.compile(r'(?i)(north|south|east|west|\n)')
+
+
+@lru_cache(maxsize=1 << 16)
 def normalize_address(address: str) -> str:
     """
     Normalizes an address so that it is uniformly displayed in both packages and
-    places.
+    places. Manifests send many packages to the same addresses, so recent
+    results are cached
     """
-    return re.sub(r'(?i)(north|south|east|west|\n)', __direction_to_letter, address.strip())
+    return __DIRECTIONS__.sub(__direction_to_letter, address.strip())
 
 
 def minutes_to_clock(minutes: float) -> str:
@@ -36,9 +44,33 @@ def clock_to_minutes(clock: str) -> int:
     raise Exception
 
 
-def debug(*args) -> None:
-    if 'DEBUG' in os.environ:
-        print(*args)
+def debug(message: Union[str, Callable[[], str]], *args: Any) -> None:
+    """
+    Prints the message if the DEBUG environment variable is set. The message
+    is only built then, either by calling it or by %-formatting it with the
+    args, so a disabled call on a hot path costs no formatting
+    """
+    if 'DEBUG' not in os.environ:
+        return
+    if callable(message):
+        message = message()
+    print(message % args if len(args) != 0 else message)
+
+
+@contextmanager
+def timed(timings: Optional[dict[str, float]], phase: str) -> Iterator[None]:
+    """
+    Adds the wall-clock seconds spent in the block to the phase's total in the
+    timings, does nothing if there are no timings to record into
+    """
+    if timings is None:
+        yield
+        return
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        timings[phase] = timings.get(phase, 0.0) + perf_counter() - start
 
 
 class ANSICodes:
@@ -64,14 +96,3 @@ class ANSICodes:
     def red(line: Any) -> str:
         return f'{ANSICodes.RED}{line}{ANSICodes.CLEAR}'
 
-
-def gen_primes():
-    primes = [2]
-    while True:
-        prime = primes[-1]
-        yield prime
-
-        while any(map(lambda p: prime % p == 0, primes)):
-            prime += 1
-
-        primes.append(prime)
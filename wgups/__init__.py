@@ -1,4 +1,15 @@
 from wgups.package import *
 from wgups.truck import *
 from wgups.place import *
-from wgups.schedule import *
+
+# the names of wgups.schedule, which is only imported once one of them is
+# used so the app can start from a cached schedule without loading it
+__SCHEDULE__ = frozenset(['Depot', 'Horizon', 'Schedule', 'Scheduler', 'base_time',
+                          'move_package', 'schedule_delivery', 'schedule_horizon'])
+
+
+def __getattr__(name: str):
+    if name not in __SCHEDULE__:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    import wgups.schedule
+    return getattr(wgups.schedule, name)
@@ -0,0 +1,70 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+import pickle
+from typing import Any, Optional
+from datastructures import IntHashMap
+from wgups.network import digest
+from wgups.package import Package
+from wgups.truck import Truck
+
+# a cached schedule is a pickle of
+#   magic, version, the key it was computed for, the packages and the trucks
+# the packages are views of one store, which pickles its rows as columns
+MAGIC = b'WGUPSDAY'
+VERSION = 1
+
+
+def key(packages_path: str, distances_path: str, settings: dict[str, Any]) -> bytes:
+    """
+    Returns the sha256 identifying a schedule: the contents of both files and
+    the settings it was computed with, which must be JSON
+
+    Time complexity: O(b) for b bytes of the files
+    """
+    sha = hashlib.sha256()
+    sha.update(MAGIC + VERSION.to_bytes(4, 'little'))
+    sha.update(digest(packages_path))
+    sha.update(digest(distances_path))
+    sha.update(json.dumps(settings, sort_keys=True).encode())
+    return sha.digest()
+
+
+def cache_path(cache_dir: str, schedule_key: bytes) -> str:
+    return os.path.join(cache_dir, f'schedule-{schedule_key.hex()[:16]}.pickle')
+
+
+def save(path: str, packages: IntHashMap[Package], trucks: list[Truck], schedule_key: bytes) -> None:
+    """
+    Writes the schedule. The file is written next to its destination and
+    moved into place, so a reader never loads a partially written file
+
+    Time complexity: O(n)
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'wb') as f:
+        pickle.dump((MAGIC, VERSION, schedule_key, packages, trucks), f,
+                    protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary, path)
+
+
+def load(path: str, schedule_key: bytes) -> Optional[tuple[IntHashMap[Package], list[Truck]]]:
+    """
+    Reads a cached schedule, returns None if there is no usable file for the
+    key. Only the package, truck and map modules are imported to unpickle it,
+    never the scheduler
+
+    Time complexity: O(n)
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'rb') as f:
+            magic, version, stored_key, packages, trucks = pickle.load(f)
+    except Exception:
+        return None
+    if (magic, version, stored_key) != (MAGIC, VERSION, schedule_key):
+        return None
+    return packages, trucks
@@ -0,0 +1,111 @@
+from __future__ import annotations
+from bisect import bisect_left, insort
+import heapq
+from typing import TYPE_CHECKING, Iterator, Optional
+from datastructures import HashMap
+from wgups.store import AT_HUB, UNSET, PackageStore
+if TYPE_CHECKING:
+    from wgups.package import Package
+    from wgups.truck import Truck
+
+
+class EligibilityIndex:
+    """
+    Keeps the packages at the hub that can be loaded, so picking the next
+    package doesn't check every remaining package again. Packages wait in a
+    heap ordered by the time their group becomes available and are released
+    into pools as the trucks' clocks pass that time. There is a pool for the
+    unrestricted packages and one for each truck that packages are restricted
+    to. Packages whose group still has a wrong address are held back until it
+    is corrected. Loaded packages are taken out of their pool
+
+    Packages are identified by their row in the store, which is also the order
+    ties between equally close packages are resolved in, so each pool is a
+    sorted list of rows
+    """
+
+    def __init__(self, store: PackageStore) -> None:
+        """
+        Indexes the packages of the store that are at the hub
+
+        Time complexity: O(n log n)
+        """
+        self.store = store
+        self.__pending: list[tuple[float, int]] = []
+        self.__blocked: list[int] = []
+        # the released rows by the truck their group is restricted to, UNSET
+        # for the unrestricted ones
+        self.__pools = HashMap[int, list[int]]()
+        groups = store.groups
+        for row in store.with_status(AT_HUB):
+            root = groups.find(store.group_elements[row])
+            if groups.wrong_addresses[root] != 0:
+                self.__blocked.append(row)
+            else:
+                self.__pending.append((groups.available_at[root], row))
+        heapq.heapify(self.__pending)
+
+    def release(self, time: float) -> None:
+        """
+        Moves the packages that became available by the time into their pools,
+        and those whose group's address was corrected into the heap
+
+        Time complexity: O(b + r log n) for b held back and r released packages
+        """
+        store = self.store
+        groups = store.groups
+        if len(self.__blocked) != 0:
+            blocked = []
+            for row in self.__blocked:
+                root = groups.find(store.group_elements[row])
+                if groups.wrong_addresses[root] != 0:
+                    blocked.append(row)
+                else:
+                    heapq.heappush(self.__pending, (groups.available_at[root], row))
+            self.__blocked = blocked
+
+        pending = self.__pending
+        while len(pending) != 0 and pending[0][0] <= time:
+            (_, row) = heapq.heappop(pending)
+            if store.statuses[row] != AT_HUB:
+                continue
+            truck = groups.required_truck[groups.find(store.group_elements[row])]
+            if (pool := self.__pools.get(truck)) is None:
+                pool = []
+                self.__pools.put(truck, pool)
+            insort(pool, row)
+
+    def candidates(self, truck: Truck) -> Iterator[Package]:
+        """
+        Yields the released packages the truck can load, in row order. A truck
+        whose clock is behind the others' can't load the packages released
+        for them yet, they are skipped
+
+        Time complexity: O(p) for p packages in the truck's pools
+        """
+        rows = heapq.merge(self.__pools.get(UNSET) or [], self.__pools.get(truck.number) or [])
+        return (p for p in map(self.store.view, rows) if p.available_for(truck))
+
+    def remove(self, package: Package) -> None:
+        """
+        Takes the loaded package out of its pool, a package that wasn't released
+        yet is dropped when it would be
+
+        Time complexity: O(log p + p) for p packages in the pool, the shift is
+        a single memmove
+        """
+        store = self.store
+        groups = store.groups
+        truck = groups.required_truck[groups.find(store.group_elements[package.row])]
+        pool: Optional[list[int]] = self.__pools.get(truck)
+        if pool is None:
+            return
+        index = bisect_left(pool, package.row)
+        if index < len(pool) and pool[index] == package.row:
+            del pool[index]
+
+    def __len__(self) -> int:
+        """
+        Returns the number of released packages
+        """
+        return sum(len(pool) for (_, pool) in self.__pools)
@@ -0,0 +1,289 @@
+from __future__ import annotations
+from array import array
+from bisect import bisect_right
+import json
+from typing import IO, TYPE_CHECKING, Any, Iterable, Optional, Union, cast
+from datastructures import IntHashMap
+from utils import normalize_address
+from wgups.package import Package
+from wgups.store import DELIVERED, EN_ROUTE, PackageStore
+if TYPE_CHECKING:
+    from wgups.truck import Trip, Truck
+
+
+class EventLog:
+    """
+    An append-only record of scheduling one day, written as JSON Lines. The
+    first line describes the day: the trucks and the fields of every package
+    before anything was scheduled. Every other line is one event:
+
+        load     a package was loaded onto a truck at the hub
+        depart   a truck left the hub on a trip
+        deliver  a truck delivered a package
+        return   a truck was back at the hub after a trip
+        address  the correct address of a package became known
+
+    Every event has the time it happened at. Events are written as the
+    scheduler produces them, which is in time order for each truck but not
+    across trucks, and a trip is written once the truck is back at the hub.
+    See Replayer for reading a log back
+    """
+    VERSION = 1
+
+    def __init__(self, out: Union[str, IO[str]]) -> None:
+        """
+        @param out The path of the file to write, or an open file, which is
+        left open by close
+        """
+        self.__owned = isinstance(out, str)
+        self.__out: IO[str] = open(out, 'w') if isinstance(out, str) else out
+        self.events = 0
+
+    def __write(self, event: dict[str, Any]) -> None:
+        self.__out.write(json.dumps(event, separators=(',', ':')))
+        self.__out.write('\n')
+        self.events += 1
+
+    def day(self, store: PackageStore, trucks: list[Truck]) -> None:
+        """
+        Writes the first line of the log
+
+        Time complexity: O(n)
+        """
+        self.__write({
+            'event': 'day', 'version': self.VERSION,
+            'trucks': [{'number': t.number, 'capacity': t.max_capacity, 'speed': t.speed,
+                        'start': t.start, 'depot': t.depot} for t in trucks],
+            'packages': [store.record(row) for row in range(len(store))],
+        })
+
+    def load(self, truck: Truck, package: Package) -> None:
+        self.__write({'event': 'load', 'time': truck.get_time(), 'truck': truck.number,
+                      'package': package.id})
+
+    def trip(self, truck: Truck, trip: Trip) -> None:
+        """
+        Writes the departure, deliveries and return of a finished trip
+
+        Time complexity: O(p) for p packages on the trip
+        """
+        self.__write({'event': 'depart', 'time': trip.departed_at, 'truck': truck.number,
+                      'trip': trip.number, 'miles': trip.start_miles})
+        for p in trip.packages:
+            self.__write({'event': 'deliver', 'time': p.delivered_at, 'truck': truck.number,
+                          'trip': trip.number, 'package': p.id})
+        self.__write({'event': 'return', 'time': trip.returned_at, 'truck': truck.number,
+                      'trip': trip.number, 'miles': trip.end_miles})
+
+    def address(self, time: float, package: Package) -> None:
+        self.__write({'event': 'address', 'time': time, 'package': package.id,
+                      'street': package.street_address, 'zipcode': package.zipcode})
+
+    def close(self) -> None:
+        if self.__owned:
+            self.__out.close()
+        else:
+            self.__out.flush()
+
+    def __enter__(self) -> EventLog:
+        return self
+
+    def __exit__(self, *_: Any) -> None:
+        self.close()
+
+
+class TruckState:
+    """
+    A truck as replayed from an event log, it has the number and miles of a
+    Truck so the app and the tracking service can read it like one
+    """
+
+    def __init__(self, number: int, speed: float) -> None:
+        self.number = number
+        self.speed = speed
+        self.trips = 0
+        # the odometer when the truck last left or returned to the hub
+        self.odometer: float = 0
+        # None while the truck is at the hub
+        self.departed_at: Optional[float] = None
+        # the IDs of the packages on the truck
+        self.packages: list[int] = []
+        # the miles at the replayed time
+        self.miles_traveled: float = 0
+
+    @property
+    def en_route(self) -> bool:
+        return self.departed_at is not None
+
+    def copy(self) -> TruckState:
+        truck = TruckState(self.number, self.speed)
+        truck.trips, truck.odometer, truck.departed_at = self.trips, self.odometer, self.departed_at
+        truck.packages = list(self.packages)
+        truck.miles_traveled = self.miles_traveled
+        return truck
+
+
+class Replayer:
+    """
+    Rebuilds the packages and trucks at any time of a day from its event log,
+    without scheduling the day again. The events are sorted by time once and
+    the state of every column an event changes is snapshotted every
+    `interval` events, so seeking a time copies the closest earlier snapshot
+    and applies fewer than `interval` events to it
+    """
+    # the columns the events change
+    __COLUMNS__ = ['statuses', 'loaded_at', 'delivered_at', 'delivered_by', 'delivery_numbers',
+                   'wrong_address', 'addresses', 'streets', 'zipcodes']
+
+    def __init__(self, lines: Iterable[str], interval: int = 256) -> None:
+        """
+        @param lines The lines of the log
+        @param interval The number of events between snapshots
+
+        Time complexity: O(e log e + (e / interval) * n) for e events
+        """
+        lines = iter(lines)
+        header = json.loads(next(lines))
+        if header.get('event') != 'day' or header.get('version') != EventLog.VERSION:
+            raise Exception('not an event log of a supported version')
+        self.interval = interval
+        # the packages before the first event
+        self.store = PackageStore.from_records(header['packages'])
+        self.__trucks = [TruckState(t['number'], t['speed']) for t in header['trucks']]
+        self.__wrong_address_rows = self.store.with_wrong_address()
+
+        events = sorted((json.loads(line) for line in lines if line.strip() != ''),
+                        key=lambda event: event['time'])
+        self.__times = array('d', (event['time'] for event in events))
+        self.__events = self.__compile(events)
+
+        working = self.store.copy()
+        trucks = [t.copy() for t in self.__trucks]
+        self.__snapshots: list[tuple[list[array[Any]], list[TruckState]]] = []
+        for (i, event) in enumerate(self.__events):
+            if i % interval == 0:
+                self.__snapshots.append(self.__snapshot(working, trucks))
+            self.__apply(working, trucks, event)
+        if len(self.__events) % interval == 0:
+            self.__snapshots.append(self.__snapshot(working, trucks))
+
+    @staticmethod
+    def load(path: str, interval: int = 256) -> Replayer:
+        with open(path) as f:
+            return Replayer(f, interval)
+
+    def __len__(self) -> int:
+        """
+        Returns the number of events
+        """
+        return len(self.__events)
+
+    def __compile(self, events: list[dict[str, Any]]) -> list[tuple[Any, ...]]:
+        """
+        Turns the events into tuples of the rows and truck positions they
+        change, and the new addresses into indexes of the string table
+        """
+        store = self.store
+        rows = self.__rows = IntHashMap[int](len(store))
+        for p in store:
+            rows.put(p.id, p.row)
+        trucks = IntHashMap[int](len(self.__trucks))
+        for (i, t) in enumerate(self.__trucks):
+            trucks.put(t.number, i)
+
+        compiled: list[tuple[Any, ...]] = []
+        for event in events:
+            kind = event['event']
+            if kind == 'load':
+                compiled.append((kind, rows.get(event['package']), trucks.get(event['truck']),
+                                 event['time']))
+            elif kind == 'deliver':
+                compiled.append((kind, rows.get(event['package']), trucks.get(event['truck']),
+                                 event['trip'], event['time']))
+            elif kind in ('depart', 'return'):
+                compiled.append((kind, trucks.get(event['truck']), event['trip'],
+                                 event['time'], event['miles']))
+            elif kind == 'address':
+                street, zipcode = event['street'], event['zipcode']
+                compiled.append((kind, rows.get(event['package']), store.intern(street),
+                                 store.intern(zipcode),
+                                 store.intern(normalize_address(f'{street} ({zipcode})'))))
+            else:
+                raise Exception(f'unknown event {kind}')
+        return compiled
+
+    def __snapshot(self, store: PackageStore, trucks: list[TruckState]) \
+            -> tuple[list[array[Any]], list[TruckState]]:
+        return [getattr(store, name)[:] for name in self.__COLUMNS__], [t.copy() for t in trucks]
+
+    def __apply(self, store: PackageStore, trucks: list[TruckState], event: tuple[Any, ...]) -> None:
+        kind = event[0]
+        if kind == 'load':
+            _, row, truck, time = event
+            store.statuses[row] = EN_ROUTE
+            store.loaded_at[row] = time
+            store.delivered_by[row] = trucks[truck].number
+            trucks[truck].packages.append(store.ids[row])
+        elif kind == 'deliver':
+            _, row, truck, trip, time = event
+            store.statuses[row] = DELIVERED
+            store.delivered_at[row] = time
+            store.delivery_numbers[row] = trip
+            trucks[truck].packages.remove(store.ids[row])
+        elif kind == 'depart':
+            _, truck, trip, time, miles = event
+            trucks[truck].trips = trip
+            trucks[truck].departed_at = time
+            trucks[truck].odometer = miles
+            # the packages on board are delivered on this trip
+            for package_id in trucks[truck].packages:
+                store.delivery_numbers[cast(int, self.__rows.get(package_id))] = trip
+        elif kind == 'return':
+            _, truck, _, _, miles = event
+            trucks[truck].departed_at = None
+            trucks[truck].odometer = miles
+            trucks[truck].packages.clear()
+        else:
+            _, row, street, zipcode, address = event
+            store.wrong_address[row] = 0
+            store.streets[row] = street
+            store.zipcodes[row] = zipcode
+            store.addresses[row] = address
+
+    def at(self, time: float) -> tuple[IntHashMap[Package], list[TruckState]]:
+        """
+        Returns the packages and trucks as they were at the given time, after
+        every event up to and including it. The packages are views of a store
+        of their own
+
+        Time complexity: O(n + interval)
+        """
+        end = bisect_right(self.__times, time)
+        start = end // self.interval
+        columns, snapshot = self.__snapshots[start]
+        store = self.store.copy()
+        for (name, column) in zip(self.__COLUMNS__, columns):
+            getattr(store, name)[:] = column
+        trucks = [t.copy() for t in snapshot]
+        for event in self.__events[start * self.interval:end]:
+            self.__apply(store, trucks, event)
+
+        # the copy's groups were built before the addresses were corrected
+        for row in self.__wrong_address_rows:
+            if store.wrong_address[row] == 0:
+                store.groups.address_corrected(store.group_elements[row])
+        for t in trucks:
+            t.miles_traveled = t.odometer if t.departed_at is None \
+                else t.odometer + (time - t.departed_at) * t.speed / 60
+
+        packages = IntHashMap[Package](len(store))
+        for p in store:
+            packages.put(p.id, p)
+        return packages, trucks
+
+    def final(self) -> tuple[IntHashMap[Package], list[TruckState]]:
+        """
+        Returns the packages and trucks after the last event, which is the day
+        as schedule_delivery returns it
+        """
+        return self.at(float('inf'))
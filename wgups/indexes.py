@@ -0,0 +1,185 @@
+from __future__ import annotations
+from bisect import bisect_left, insort
+from typing import Any, Callable, Optional, Union
+from datastructures import HashMap
+from wgups.package import Package
+from wgups.store import UNSET, PackageStore
+
+Status = Package.Status
+__STATUSES__ = [Status.AT_HUB, Status.EN_ROUTE, Status.DELIVERED]
+
+
+class PackageIndex:
+    """
+    Secondary indexes over the packages of a store, so a question about some
+    of the packages doesn't scan all of them. There are hash indexes on the
+    zipcode, city, address, truck and status of the packages, and sorted
+    indexes on their deadline and delivery time that answer range queries
+
+    The index listens to the store, every package whose address or status
+    changes, or that is added to the store, is reindexed right away. A package
+    without a truck or a delivery time isn't in those indexes
+    """
+    HASHED = ['zipcode', 'city', 'address', 'truck', 'status']
+    SORTED = ['deadline', 'delivered_at']
+
+    def __init__(self, store: PackageStore) -> None:
+        """
+        Time complexity: O(n log n)
+        """
+        self.store = store
+        self.__keys: dict[str, Callable[[int], Any]] = {
+            'zipcode': lambda row: store.strings[store.zipcodes[row]],
+            'city': lambda row: store.strings[store.cities[row]],
+            'address': lambda row: store.strings[store.addresses[row]],
+            'truck': lambda row: self.__optional(store.delivered_by[row]),
+            'status': lambda row: __STATUSES__[store.statuses[row]],
+            'deadline': lambda row: store.deadlines[row],
+            'delivered_at': lambda row: self.__optional(store.delivered_at[row]),
+        }
+        self.__hashes = {field: HashMap[Any, set[int]]() for field in self.HASHED}
+        self.__sorted: dict[str, list[tuple[float, int]]] = {field: [] for field in self.SORTED}
+        # the key each row is indexed under in each index
+        self.__indexed: dict[str, list[Any]] = {field: [] for field in self.__keys}
+        for row in range(len(store)):
+            self.__add(row, False)
+        for entries in self.__sorted.values():
+            entries.sort()
+        store.on_change(self.reindex)
+
+    @staticmethod
+    def of(store: PackageStore) -> PackageIndex:
+        """
+        Returns the index of the store, building it the first time, so every
+        scheduler and schedule over the store shares one index and the store
+        one listener
+
+        Time complexity: O(n log n) the first time, O(1) after
+        """
+        if store.index is None:
+            store.index = PackageIndex(store)
+        return store.index
+
+    @staticmethod
+    def __optional(value: float) -> Optional[float]:
+        return None if value == UNSET else value
+
+    def __add(self, row: int, keep_sorted: bool = True) -> None:
+        """
+        Indexes a new row, if the sorted indexes aren't kept sorted they have
+        to be sorted afterwards
+        """
+        for field in self.HASHED:
+            key = self.__keys[field](row)
+            self.__indexed[field].append(key)
+            if key is not None:
+                self.__bucket(field, key).add(row)
+        for field in self.SORTED:
+            key = self.__keys[field](row)
+            self.__indexed[field].append(key)
+            if key is not None:
+                if keep_sorted:
+                    insort(self.__sorted[field], (key, row))
+                else:
+                    self.__sorted[field].append((key, row))
+
+    def __bucket(self, field: str, key: Any) -> set[int]:
+        index = self.__hashes[field]
+        if (rows := index.get(key)) is None:
+            rows = set()
+            index.put(key, rows)
+        return rows
+
+    def reindex(self, row: int) -> None:
+        """
+        Moves the row to the keys of its current values, adding it if it's a
+        new row and removing it if it was removed from the end of the store
+
+        Time complexity: O(f + log n) for f fields, plus the shift of the
+        sorted indexes, which is a single memmove
+        """
+        if row >= len(self.__indexed['status']):
+            while row >= len(self.__indexed['status']):
+                self.__add(len(self.__indexed['status']))
+            return
+        if row >= len(self.store):
+            for field in self.HASHED:
+                if (key := self.__indexed[field][row]) is not None:
+                    self.__bucket(field, key).discard(row)
+            for field in self.SORTED:
+                if (key := self.__indexed[field][row]) is not None:
+                    entries = self.__sorted[field]
+                    del entries[bisect_left(entries, (key, row))]
+            for keys in self.__indexed.values():
+                del keys[row:]
+            return
+
+        for field in self.HASHED:
+            old, new = self.__indexed[field][row], self.__keys[field](row)
+            if old != new:
+                if old is not None:
+                    self.__bucket(field, old).discard(row)
+                if new is not None:
+                    self.__bucket(field, new).add(row)
+                self.__indexed[field][row] = new
+        for field in self.SORTED:
+            old, new = self.__indexed[field][row], self.__keys[field](row)
+            if old != new:
+                entries = self.__sorted[field]
+                if old is not None:
+                    del entries[bisect_left(entries, (old, row))]
+                if new is not None:
+                    insort(entries, (new, row))
+                self.__indexed[field][row] = new
+
+    def equal(self, field: str, value: Any) -> list[int]:
+        """
+        Returns the rows whose value of a hashed field is the given one, in
+        order
+
+        Time complexity: O(k log k) for k rows
+        """
+        if field not in self.__hashes:
+            raise Exception(f'{field} isn\'t a hashed field, use one of {", ".join(self.HASHED)}')
+        return sorted(self.__hashes[field].get(value) or ())
+
+    def between(self, field: str, low: Optional[float] = None, high: Optional[float] = None) -> list[int]:
+        """
+        Returns the rows whose value of a sorted field is at least low and
+        less than high, in order. A missing bound is unbounded
+
+        Time complexity: O(log n + k log k) for k rows
+        """
+        if field not in self.__sorted:
+            raise Exception(f'{field} isn\'t a sorted field, use one of {", ".join(self.SORTED)}')
+        entries = self.__sorted[field]
+        start = 0 if low is None else bisect_left(entries, (low, -1))
+        end = len(entries) if high is None else bisect_left(entries, (high, -1))
+        return sorted(row for (_, row) in entries[start:end])
+
+    def rows(self, **conditions: Union[Any, tuple[Optional[float], Optional[float]]]) -> list[int]:
+        """
+        Returns the rows meeting every condition, in order. A condition on a
+        hashed field is the value to match, one on a sorted field is a
+        (low, high) range as for between, e.g.
+
+            index.rows(zipcode='84115', deadline=(None, 10 * 60 + 30))
+
+        Time complexity: O(c * k) for c conditions and k rows of the smallest
+        condition
+        """
+        if len(conditions) == 0:
+            return list(range(len(self.store)))
+        matches = [self.between(field, *condition) if field in self.__sorted
+                   else self.equal(field, condition) for (field, condition) in conditions.items()]
+        matches.sort(key=len)
+        rows = matches[0]
+        for other in map(set, matches[1:]):
+            rows = [row for row in rows if row in other]
+        return rows
+
+    def query(self, **conditions: Union[Any, tuple[Optional[float], Optional[float]]]) -> list[Package]:
+        """
+        Returns the packages meeting every condition, see rows
+        """
+        return self.store.views(self.rows(**conditions))
@@ -0,0 +1,92 @@
+from __future__ import annotations
+import csv
+from itertools import chain, islice
+from typing import Iterable, Iterator, Optional, Sequence, Union
+from datastructures import IntHashMap
+from wgups.package import Package
+from wgups.store import PackageStore
+
+# a path to a package file, its lines or its already split rows
+Source = Union[str, Iterable[str], Iterable[Sequence[str]]]
+
+
+def rows(source: Source) -> Iterator[Sequence[str]]:
+    """
+    Yields the fields of each row of the source, a file is read lazily line by
+    line
+    """
+    if isinstance(source, str):
+        with open(source, newline='') as f:
+            yield from csv.reader(f, delimiter=';')
+        return
+    iterator = iter(source)
+    first = next(iterator, None)
+    if first is None:
+        return
+    remaining = chain([first], iterator)
+    if isinstance(first, str):
+        yield from csv.reader(remaining, delimiter=';')  # type: ignore
+    else:
+        yield from remaining  # type: ignore
+
+
+def ingest(source: Source, chunk_size: int = 10_000,
+           package_ids: Optional[Iterable[int]] = None,
+           store: Optional[PackageStore] = None) -> Iterator[list[Package]]:
+    """
+    Parses the packages of the source and yields them in chunks of up to
+    chunk_size, so only one chunk of rows is held at a time. A package whose
+    note says it must be delivered with packages further down the source is
+    linked to each of them once they are parsed, which may be in a later
+    chunk, so the dependencies of a yielded package are complete once the
+    packages it names were yielded. Like the whole-file parser, the note only
+    links the packages it names that come after it
+
+    Only the references that are still open are kept between chunks, a
+    reference to a package that was already parsed, or that isn't kept, is
+    never linked so it isn't kept at all. Each
+    chunk's store has groups of its own, a group spanning chunks is joined in
+    the groups of each of its stores, so a chunk only keeps the packages of
+    other chunks it's grouped with
+
+    @param package_ids Only keep the packages with these IDs, rows of other
+    packages are skipped before they are parsed
+    @param store The store the packages' rows are added to, if none is given
+    the packages of each chunk share a new store so chunks can still be
+    dropped once they're consumed
+
+    n = number of packages
+    r = number of open references
+    m = largest package ID
+    Time complexity: O(n)
+    Space complexity: O(chunk_size + r + m), where the m is only a bit per ID
+    """
+    subset = None if package_ids is None else set(package_ids)
+    # the packages waiting for the package with the key's ID
+    waiting = IntHashMap[list[Package]]()
+    # a bit per ID of the packages parsed so far, package IDs are small
+    # sequential numbers so this stays a few kilobytes
+    parsed = bytearray()
+    source_rows = rows(source)
+    if subset is not None:
+        source_rows = (row for row in source_rows if int(row[0]) in subset)
+    while len(chunk := list(islice(source_rows, chunk_size))) != 0:
+        chunk_store = PackageStore() if store is None else store
+        packages = [Package(*row, store=chunk_store) for row in chunk]
+        for package in packages:
+            for dep in package.dependent_packages:
+                if dep >> 3 < len(parsed) and parsed[dep >> 3] & (1 << (dep & 7)) \
+                        or subset is not None and dep not in subset:
+                    continue
+                if (dep_list := waiting.get(dep)) is None:
+                    dep_list = []
+                    waiting.put(dep, dep_list)
+                dep_list.append(package)
+            if (waiters := waiting.get(package.id)) is not None:
+                waiting.remove(package.id)
+                for pkg in waiters:
+                    pkg.deliver_with(package)
+            if (byte := package.id >> 3) >= len(parsed):
+                parsed.extend(bytes(max(len(parsed), byte + 1 - len(parsed))))
+            parsed[byte] |= 1 << (package.id & 7)
+        yield packages
@@ -0,0 +1,198 @@
+from __future__ import annotations
+from contextlib import contextmanager
+import cProfile
+import functools
+import io
+import json
+import pstats
+from time import perf_counter
+import tracemalloc
+from typing import Any, Callable, Iterator, Optional
+from datastructures import CompactHashMap, DisjointSet, DistanceMatrix, HashMap, IntHashMap
+from wgups.package import Package
+from wgups.schedule import Scheduler
+
+
+class Metrics:
+    """
+    What was measured while scheduling: the seconds spent in each phase, the
+    counts of the hot operations and, if they were captured, the functions
+    that took the most time and the lines that allocated the most memory.
+    Everything can be exported as JSON
+
+    The counters are only collected inside `capture`, which swaps counting
+    wrappers into the hot methods for its duration, so they cost nothing at
+    any other time
+    """
+
+    def __init__(self) -> None:
+        # passed as the timings of schedule_delivery
+        self.timings: dict[str, float] = {}
+        self.counters: dict[str, int] = {}
+        self.profile: list[dict[str, Any]] = []
+        self.memory: Optional[dict[str, Any]] = None
+
+    def count(self, counter: str, amount: int = 1) -> None:
+        self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def to_dict(self) -> dict[str, Any]:
+        metrics: dict[str, Any] = {'timings': self.timings,
+                                   'counters': dict(sorted(self.counters.items()))}
+        if len(self.profile) != 0:
+            metrics['profile'] = self.profile
+        if self.memory is not None:
+            metrics['memory'] = self.memory
+        return metrics
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), indent=2)
+
+    def dump(self, path: str) -> None:
+        with open(path, 'w') as f:
+            f.write(self.to_json())
+            f.write('\n')
+
+
+def __counting(method: Callable[..., Any], count: Callable[..., None]) -> Callable[..., Any]:
+    """
+    Wraps the method so that `count` is called with the result and the
+    arguments of every call
+    """
+    @functools.wraps(method)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        result = method(*args, **kwargs)
+        count(result, *args, **kwargs)
+        return result
+    return wrapper
+
+
+def __hooks(metrics: Metrics) -> list[tuple[type, str, Callable[..., None]]]:
+    """
+    Returns the methods to count and what to count for each call
+    """
+    count = metrics.count
+
+    def calls(counter: str) -> Callable[..., None]:
+        return lambda *_, **__: count(counter)
+
+    def distances_from(_: list[float], graph: Any, vertex: Any, candidates: Any) -> None:
+        count('distances_from')
+        count('distance_lookups', len(candidates))
+
+    def bucket(result: list[Any], m: Any, key: Any) -> None:
+        # a lookup compares the key against the entries of its bucket
+        count('hashmap_lookups')
+        count('hashmap_probes', max(1, len(result)))
+
+    def probes(prefix: str) -> Callable[..., None]:
+        def find(index: int, m: Any, key: Any, h: int = 0) -> None:
+            # the slots walked from the key's home slot to the one returned
+            home = (key if isinstance(m, IntHashMap) else h) & m._mask
+            count(f'{prefix}_lookups')
+            count(f'{prefix}_probes', ((index - home) & m._mask) + 1)
+        return find
+
+    def pick(_: Optional[Package], scheduler: Any, pkgs: Any, loc: Any) -> None:
+        count('load_decisions')
+        count('packages_scanned', len(pkgs))
+
+    return [
+        (DistanceMatrix, 'distance_between', calls('distance_between')),
+        (DistanceMatrix, 'distance_between_indexes', calls('distance_between_indexes')),
+        (DistanceMatrix, 'distances_from', distances_from),
+        (Package, 'available_for', calls('available_for')),
+        (DisjointSet, 'find', calls('group_finds')),
+        (HashMap, '_HashMap__get_bucket', bucket),
+        (HashMap, '_HashMap__resize', calls('hashmap_resizes')),
+        (CompactHashMap, '_find', probes('compact_hashmap')),
+        (CompactHashMap, '_resize', calls('compact_hashmap_resizes')),
+        (IntHashMap, '_find', probes('int_hashmap')),
+        (IntHashMap, '_resize', calls('int_hashmap_resizes')),
+        (Scheduler, '_Scheduler__pick', pick),
+        (Scheduler, '_Scheduler__find_closest', pick),
+        (Scheduler, '_Scheduler__closest_by_neighbors', calls('neighbor_walks')),
+    ]
+
+
+@contextmanager
+def instrument(metrics: Metrics) -> Iterator[Metrics]:
+    """
+    Counts the hot operations run inside the block into the metrics. The
+    methods are patched on their classes for the duration of the block, so
+    this isn't safe to use from several threads at once
+
+    The counters are
+        distance_between(_indexes): single distance lookups
+        distances_from: scans of a place's distances to candidates, the
+            candidates looked at are counted by distance_lookups
+        available_for: eligibility checks of packages
+        group_finds: lookups of the root of a union-find set, such as the
+            group a package is delivered with
+        *hashmap_lookups, *hashmap_probes, *hashmap_resizes: lookups of the
+            maps, the buckets entries or slots they walked and the rehashes
+        load_decisions, packages_scanned: picks of the next package to load
+            by a full scan and the packages they compared
+        neighbor_walks: picks tried through the neighbor index first
+    """
+    patched: list[tuple[type, str, Any]] = []
+    try:
+        for (cls, name, count) in __hooks(metrics):
+            method = cls.__dict__[name]
+            patched.append((cls, name, method))
+            setattr(cls, name, __counting(method, count))
+        yield metrics
+    finally:
+        for (cls, name, method) in reversed(patched):
+            setattr(cls, name, method)
+
+
+@contextmanager
+def capture(profile: bool = False, memory: bool = False, top: int = 20) -> Iterator[Metrics]:
+    """
+    Collects metrics of the block: the counters, its total time and, if asked
+    for, a cProfile of the functions with the most cumulative time and the
+    peak memory traced by tracemalloc along with the lines that allocated the
+    most. Profiling and tracing slow the block down, so they are off by
+    default. The phase timings are filled by passing `metrics.timings` to
+    schedule_delivery inside the block
+
+    @param top How many functions and allocation sites to report
+    """
+    metrics = Metrics()
+    profiler = cProfile.Profile() if profile else None
+    if memory:
+        tracemalloc.start()
+    start = perf_counter()
+    try:
+        with instrument(metrics):
+            if profiler is not None:
+                profiler.enable()
+            try:
+                yield metrics
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+    finally:
+        metrics.timings['total'] = perf_counter() - start
+        if memory:
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            metrics.memory = {'peak_bytes': peak, 'top': [
+                {'location': str(stat.traceback), 'size_bytes': stat.size, 'count': stat.count}
+                for stat in snapshot.statistics('lineno')[:top]]}
+        if profiler is not None:
+            metrics.profile = __profile_rows(profiler, top)
+
+
+def __profile_rows(profiler: cProfile.Profile, top: int) -> list[dict[str, Any]]:
+    """
+    Returns the functions with the most cumulative time
+    """
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    rows = []
+    for ((filename, line, function), (_, calls, total, cumulative, _)) in stats.stats.items():  # type: ignore
+        rows.append({'function': f'{filename}:{line}({function})', 'calls': calls,
+                     'total_seconds': total, 'cumulative_seconds': cumulative})
+    rows.sort(key=lambda row: row['cumulative_seconds'], reverse=True)
+    return rows[:top]
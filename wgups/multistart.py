@@ -0,0 +1,60 @@
+from __future__ import annotations
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+from time import perf_counter
+from typing import Any, Optional
+from wgups.schedule import Schedule, schedule_delivery
+
+# (seed, miles, valid), the greedy construction has no seed
+Result = tuple[Optional[int], float, bool]
+
+
+def evaluate(seed: Optional[int], options: dict[str, Any]) -> Result:
+    """
+    Builds one schedule in a worker process and reports only its figures, the
+    schedule itself is rebuilt from the seed by the parent if it wins
+    """
+    schedule = schedule_delivery(seed=seed, **options)
+    return seed, schedule.miles(), schedule.valid()
+
+
+def multi_start(starts: int = 64, time_budget: Optional[float] = None,
+                workers: Optional[int] = None, first_seed: int = 0, **options: Any) -> Schedule:
+    """
+    Builds the greedy schedule and `starts` randomized variants of it across a
+    pool of worker processes and returns the one with the fewest miles that
+    meets every deadline, truck restriction and grouping
+
+    @param time_budget The wall-clock seconds after which no more schedules
+    are started, the ones already started are still waited for and compared
+    @param workers The number of processes, defaults to the number of CPUs
+    @param first_seed The seed of the first randomized variant, the others
+    use the seeds following it
+    @param options Passed on to schedule_delivery, they must be picklable
+
+    Time complexity: O(s * n) for s starts
+    """
+    deadline = float('inf') if time_budget is None else perf_counter() + time_budget
+    seeds = iter([None, *range(first_seed, first_seed + starts)])
+    workers = workers or os.cpu_count() or 1
+    results: list[Result] = []
+    with ProcessPoolExecutor(workers) as executor:
+        # only a few schedules per worker are queued at a time, so that no more
+        # are started once the budget is spent
+        pending = {executor.submit(evaluate, seed, options)
+                   for seed in islice(seeds, 2 * workers)}
+        while len(pending) != 0:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            results.extend(future.result() for future in done)
+            if perf_counter() < deadline:
+                pending |= {executor.submit(evaluate, seed, options)
+                            for seed in islice(seeds, len(done))}
+
+    # equal miles are resolved by the lower seed, so the result doesn't depend
+    # on which worker finished first
+    best = min(((miles, -1 if seed is None else seed, seed) for (seed, miles, valid) in results
+                if valid), default=None)
+    if best is None:
+        raise Exception('no valid schedule was found')
+    return schedule_delivery(seed=best[2], **options)
@@ -0,0 +1,104 @@
+from __future__ import annotations
+from array import array
+import hashlib
+import mmap
+import os
+import struct
+import sys
+from typing import Optional, Union
+from datastructures import DistanceMatrix
+from wgups.place import Place
+
+# the compiled distance network is laid out as
+#   header: magic, version, number of places, size of the label table and the
+#           sha256 of the CSV it was compiled from
+#   labels: the name and raw address of every place, each prefixed by its
+#           length in bytes
+#   padding to a multiple of 8 bytes
+#   the lower triangle of distances as little-endian doubles, row by row
+MAGIC = b'WGUPSNET'
+VERSION = 1
+__HEADER__ = struct.Struct('<8sIIQ32s')
+__LENGTH__ = struct.Struct('<I')
+
+
+def digest(path: str) -> bytes:
+    """
+    Returns the sha256 of the file's contents
+
+    Time complexity: O(b) for b bytes
+    """
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(1 << 20):
+            sha.update(chunk)
+    return sha.digest()
+
+
+def cache_path(csv_path: str, cache_dir: str, csv_digest: bytes) -> str:
+    """
+    Returns where the network compiled from the CSV is cached, the name
+    includes the CSV's hash so an edited CSV is compiled again
+    """
+    name = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(cache_dir, f'{name}-{csv_digest.hex()[:16]}.bin')
+
+
+def save(path: str, labels: list[tuple[str, str]], graph: DistanceMatrix[Union[Place, str]],
+         csv_digest: bytes) -> None:
+    """
+    Writes the compiled network. The file is written next to its destination
+    and moved into place, so a reader never maps a partially written file
+
+    Time complexity: O(m^2)
+    """
+    table = bytearray()
+    for (name, address) in labels:
+        for label in (name, address):
+            encoded = label.encode()
+            table += __LENGTH__.pack(len(encoded)) + encoded
+    table += bytes(-(__HEADER__.size + len(table)) % 8)
+    triangle = array('d', graph.triangle())
+    if sys.byteorder != 'little':
+        triangle.byteswap()
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'wb') as f:
+        f.write(__HEADER__.pack(MAGIC, VERSION, len(labels), len(table), csv_digest))
+        f.write(table)
+        f.write(triangle)
+    os.replace(temporary, path)
+
+
+def load(path: str, csv_digest: bytes) -> Optional[DistanceMatrix[Union[Place, str]]]:
+    """
+    Maps a compiled network into memory, the distances are read straight from
+    the mapped pages, which are shared by every process mapping the same file.
+    Returns None if there is no usable file for the CSV
+
+    Time complexity: O(m), the distances are only paged in when read
+    """
+    if sys.byteorder != 'little' or not os.path.exists(path) or \
+            os.path.getsize(path) < __HEADER__.size:
+        return None
+    with open(path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, count, table_size, stored_digest = __HEADER__.unpack_from(
+        mapped)
+    size = count * (count + 1) // 2
+    if (magic, version, stored_digest) != (MAGIC, VERSION, csv_digest) or \
+            len(mapped) != __HEADER__.size + table_size + size * 8:
+        return None
+
+    labels: list[str] = []
+    offset = __HEADER__.size
+    for _ in range(2 * count):
+        (length,) = __LENGTH__.unpack_from(mapped, offset)
+        offset += __LENGTH__.size
+        labels.append(mapped[offset:offset + length].decode())
+        offset += length
+    places: list[Union[Place, str]] = [Place(labels[i], labels[i + 1])
+                                       for i in range(0, len(labels), 2)]
+    start = __HEADER__.size + table_size
+    return DistanceMatrix.from_buffer(places, memoryview(mapped)[start:].cast('d'))
@@ -1,13 +1,21 @@
 from __future__ import annotations
 from enum import Enum, auto
 import re
-from typing import Optional, TYPE_CHECKING, cast
+from typing import AbstractSet, Any, Optional, TYPE_CHECKING, cast
 from utils import minutes_to_clock, normalize_address, ANSICodes
+from wgups.store import PackageGroups, PackageStore, UNSET
 
 if TYPE_CHECKING:
     from wgups.truck import Truck
 
 EOD = 24 * 60
+__TIME__ = re.compile(r'(?i)(\d?\d):(\d\d) ([ap]m)')
+__NOTE_TIME__ = re.compile(r'\d?\d:\d\d [ap]m')
+__NUMBER__ = re.compile(r'\d+')
+__TRUCK__ = re.compile(r'truck (\d)')
+# manifests only use a handful of distinct times, so each is parsed once
+__PARSED_TIMES__: dict[str, int] = {'EOD': EOD}
+__NO_IDS__: AbstractSet[int] = frozenset()
 
 
 class Package:
@@ -18,38 +26,37 @@ class Package:
 
     @staticmethod
     def parse_time(time: str) -> int:
-        if time == 'EOD':
-            return EOD
+        if (parsed := __PARSED_TIMES__.get(time)) is not None:
+            return parsed
 
-        hours, minutes, meridiem = re.search(
-            r'(?i)(\d?\d):(\d\d) ([ap]m)', time).groups()
+        hours, minutes, meridiem = __TIME__.search(time).groups()
         offset = 0 if meridiem.lower() == 'am' else 12
-        return ((int(hours) + offset) * 60) + int(minutes)
-
-    __required_truck: Optional[int] = None
-    __loaded_at: Optional[float] = None
-    __delivered_by: Optional[int] = None
-    delivered_at: Optional[float] = None
-    wrong_address = False
-    __available_at = 0.0
-    dependencies: set[Package]
-    dependent_packages: set[int]
-    __delivery_number = 0
-
-    def __init__(self, id: str, address: str, city: str, state: str, zipcode: str, deadline: str, mass: str, notes: str):
-        self.dependent_packages = set[int]()
-        self.dependencies = set[Package]()
-        self.id = int(id)
-        self.street_address = address
-        self.city = city
-        self.state = state
-        self.zipcode = zipcode
-        self.deadline = self.parse_time(deadline)
-        self.mass = int(mass)
-        self.__status = self.Status.AT_HUB
+        parsed = __PARSED_TIMES__[time] = ((int(hours) + offset) * 60) + int(minutes)
+        return parsed
+
+    __slots__ = ('__store', '__row')
+
+    def __init__(self, id: str, address: str, city: str, state: str, zipcode: str, deadline: str, mass: str, notes: str,
+                 store: Optional[PackageStore] = None):
+        """
+        @param store The store the package's row is added to, a package gets a
+        store of its own if none is given
+        """
+        self.__store = PackageStore() if store is None else store
+        self.__row = self.__store.append(self)
+        store, row = self.__store, self.__row
+        store.ids[row] = int(id)
+        store.streets[row] = store.intern(address)
+        store.cities[row] = store.intern(city)
+        store.states[row] = store.intern(state)
+        store.zipcodes[row] = store.intern(zipcode)
+        store.deadlines[row] = self.parse_time(deadline)
+        store.masses[row] = int(mass)
         self.__parse_note(notes)
-        self.address = normalize_address(
-            f'{self.street_address} ({self.zipcode})')
+        store.addresses[row] = store.intern(
+            normalize_address(f'{address} ({zipcode})'))
+        store.group_elements[row] = store.groups.add_package(self)
+        store.changed(row)
 
     def __str__(self) -> str:
         deadline = minutes_to_clock(self.deadline)
@@ -65,32 +72,215 @@ class Package:
 
         return str.join(', ', info)
 
+    @classmethod
+    def view_of(cls, store: PackageStore, row: int) -> Package:
+        """
+        Returns a new view of a row that is already filled, which is how a
+        store creates the views of the rows it copies
+        """
+        package = cls.__new__(cls)
+        package.__store, package.__row = store, row
+        return package
+
+    @property
+    def store(self) -> PackageStore:
+        return self.__store
+
+    @property
+    def row(self) -> int:
+        return self.__row
+
+    def move_to(self, store: PackageStore) -> None:
+        """
+        Moves the package's row into another store, the package stays the view
+        of it
+        """
+        row = store.copy_row(self.__store, self.__row, self)
+        self.__store, self.__row = store, row
+
+    def copy_to(self, store: PackageStore) -> Package:
+        """
+        Returns a new package viewing a copy of the package's row in another
+        store, the package and its store are left as they are
+        """
+        package = Package.view_of(store, len(store))
+        store.copy_row(self.__store, self.__row, package)
+        return package
+
+    @property
+    def id(self) -> int:
+        return self.__store.ids[self.__row]
+
+    @property
+    def deadline(self) -> int:
+        return self.__store.deadlines[self.__row]
+
+    @property
+    def mass(self) -> int:
+        return self.__store.masses[self.__row]
+
+    @property
+    def address(self) -> str:
+        return self.__store.strings[self.__store.addresses[self.__row]]
+
+    @address.setter
+    def address(self, address: str) -> None:
+        self.__store.addresses[self.__row] = self.__store.intern(address)
+
+    @property
+    def street_address(self) -> str:
+        return self.__store.strings[self.__store.streets[self.__row]]
+
+    @street_address.setter
+    def street_address(self, street_address: str) -> None:
+        self.__store.streets[self.__row] = self.__store.intern(street_address)
+
+    @property
+    def city(self) -> str:
+        return self.__store.strings[self.__store.cities[self.__row]]
+
+    @city.setter
+    def city(self, city: str) -> None:
+        self.__store.cities[self.__row] = self.__store.intern(city)
+
+    @property
+    def state(self) -> str:
+        return self.__store.strings[self.__store.states[self.__row]]
+
+    @state.setter
+    def state(self, state: str) -> None:
+        self.__store.states[self.__row] = self.__store.intern(state)
+
+    @property
+    def zipcode(self) -> str:
+        return self.__store.strings[self.__store.zipcodes[self.__row]]
+
+    @zipcode.setter
+    def zipcode(self, zipcode: str) -> None:
+        self.__store.zipcodes[self.__row] = self.__store.intern(zipcode)
+
+    @property
+    def wrong_address(self) -> bool:
+        return bool(self.__store.wrong_address[self.__row])
+
+    @wrong_address.setter
+    def wrong_address(self, wrong_address: bool) -> None:
+        self.__store.wrong_address[self.__row] = wrong_address
+
+    @property
+    def dependencies(self) -> set[Package]:
+        store, row = self.__store, self.__row
+        if (deps := store.dependencies.get(row)) is None:
+            deps = store.dependencies[row] = set()
+        return deps
+
+    @property
+    def dependent_packages(self) -> AbstractSet[int]:
+        """
+        The IDs named by a "delivered with" note, empty otherwise
+        """
+        return self.__store.dependent_packages.get(self.__row, __NO_IDS__)
+
+    @dependent_packages.setter
+    def dependent_packages(self, ids: AbstractSet[int]) -> None:
+        self.__store.dependent_packages[self.__row] = ids
+
+    @property
+    def delivered_at(self) -> Optional[float]:
+        delivered_at = self.__store.delivered_at[self.__row]
+        return None if delivered_at == UNSET else delivered_at
+
+    @delivered_at.setter
+    def delivered_at(self, delivered_at: Optional[float]) -> None:
+        self.__store.delivered_at[self.__row] = UNSET if delivered_at is None else delivered_at
+
+    # the fields below are only set by the package itself, the private names
+    # are kept so they read like attributes
+    def __get_status(self) -> Package.Status:
+        return __STATUSES__[self.__store.statuses[self.__row]]
+
+    def __set_status(self, status: Package.Status) -> None:
+        self.__store.statuses[self.__row] = __STATUSES__.index(status)
+
+    __status = property(__get_status, __set_status)
+
+    def __column(column: str, optional: bool = False):  # type: ignore
+        """
+        Returns a property reading and writing the package's value in a column
+        of the store, UNSET is read as None if the value is optional
+        """
+        def getter(self: Package) -> Optional[float]:
+            value = getattr(self.__store, column)[self.__row]
+            return None if optional and value == UNSET else value
+
+        def setter(self: Package, value: Optional[float]) -> None:
+            getattr(self.__store, column)[self.__row] = UNSET if value is None else value
+
+        return property(getter, setter)
+
+    __required_truck = __column('required_truck', optional=True)
+    __loaded_at = __column('loaded_at', optional=True)
+    __delivered_by = __column('delivered_by', optional=True)
+    __available_at = __column('available_at')
+    __delivery_number = __column('delivery_numbers')
+    del __column
+
+    @property
+    def required_truck(self) -> Optional[int]:
+        return self.__required_truck
+
+    @property
+    def available_at(self) -> float:
+        return self.__available_at
+
+    @property
+    def loaded_at(self) -> Optional[float]:
+        return self.__loaded_at
+
+    @property
+    def delivered_by(self) -> Optional[int]:
+        return self.__delivered_by
+
     def priority(self, time: float) -> bool:
         return self.at_hub() and self.deadline < EOD and self.__available_at <= time
 
-    def available_for(self, truck: Truck, exclude: set[Package] = set()) -> bool:
+    def available_for(self, truck: Truck) -> bool:
         """
-        Determines if this package (and recursively its dependencies) is
-        available for delivery by the current truck
+        Determines if this package is available for delivery by the current
+        truck, which requires every package of its group to be available by
+        the truck's time, have a known address and be allowed on the truck.
+        The group's aggregates answer that without visiting its packages
+
+        Time complexity: O(α(n))
         """
-        if self.wrong_address:
+        if self.wrong_address or not self.at_hub():
             return False
 
-        if self.__available_at > truck.get_time():
+        groups = self.__store.groups
+        root = groups.find(self.__store.group_elements[self.__row])
+        if groups.available_at[root] > truck.get_time() or groups.wrong_addresses[root] != 0:
             return False
 
-        if not self.at_hub():
-            return False
+        required_truck = groups.required_truck[root]
+        return required_truck == UNSET or required_truck == truck.number
 
-        if self.__required_truck is not None and self.__required_truck != truck.number:
-            return False
+    def group(self) -> list[Package]:
+        """
+        Returns the packages that must be delivered together with this one,
+        including itself
 
-        deps_available = True
-        exclude.add(self)
-        for deps in [d for d in self.dependencies if not d in exclude]:
-            deps_available = deps.available_for(truck, exclude)
+        Time complexity: O(α(n))
+        """
+        return self.__store.groups.members(self.__store.group_elements[self.__row])
 
-        return deps_available
+    def deliver_with(self, other: Package) -> None:
+        """
+        Records that the package must be delivered together with the other,
+        joining their groups, see PackageGroups.link
+        """
+        PackageGroups.link(self, other)
+        self.dependencies.add(other)
+        other.dependencies.add(self)
 
     def __parse_note(self, notes: str) -> None:
         """
@@ -98,13 +288,12 @@ class Package:
         """
         if len(notes) == 0:
             pass
-        elif match := re.search(r'\d?\d:\d\d [ap]m', notes):
+        elif match := __NOTE_TIME__.search(notes):
             self.__available_at = self.parse_time(match.group(0))
-        elif match := re.search(r'truck (\d)', notes):
+        elif match := __TRUCK__.search(notes):
             self.__required_truck = int(match.group(1))
         elif 'delivered with' in notes:
-            self.dependent_packages = set[int](
-                map(int, re.findall(r'\d+', notes)))
+            self.dependent_packages = set(map(int, __NUMBER__.findall(notes)))
         else:
             self.address = ''
             self.__available_at = self.parse_time('10:20 am')
@@ -118,6 +307,7 @@ class Package:
         self.__delivered_by = truck.number
         self.__loaded_at = truck.get_time()
         self.__status = self.Status.EN_ROUTE
+        self.__store.changed(self.__row)
 
     def set_delivered(self, truck: Truck) -> None:
         if self.__status == self.Status.DELIVERED:
@@ -125,6 +315,39 @@ class Package:
         self.__status = self.Status.DELIVERED
         self.delivered_at = truck.get_time()
         self.__delivery_number = truck.deliveries_performed
+        self.__store.changed(self.__row)
+
+    def reset(self) -> None:
+        """
+        Takes the package off the truck it was planned on and puts it back at
+        the hub
+        """
+        self.__status = self.Status.AT_HUB
+        self.__loaded_at = None
+        self.__delivered_by = None
+        self.delivered_at = None
+        self.__delivery_number = 0
+        self.__store.changed(self.__row)
+
+    def carry_over(self) -> None:
+        """
+        Keeps a package that wasn't delivered at the hub for the next day, it
+        is available from the start of that day and its correct address is
+        known by then
+        """
+        if not self.at_hub():
+            raise Exception
+        self.__available_at = 0
+
+    def delay(self, until: float) -> None:
+        """
+        Makes the package available at the hub no earlier than the given time
+        """
+        if not self.at_hub():
+            raise Exception
+        self.__available_at = max(self.__available_at, until)
+        for groups in PackageGroups.holders(self.group()):
+            groups.delay(groups.element_of(self), until)
 
     def is_delivered(self) -> bool:
         return self.__status == self.Status.DELIVERED
@@ -136,10 +359,17 @@ class Package:
         return self.wrong_address and self.__available_at <= time
 
     def update_address(self):
+        self.change_address('410 S State St', '84111')
+
+    def change_address(self, street_address: str, zipcode: str) -> None:
+        if self.wrong_address:
+            for groups in PackageGroups.holders(self.group()):
+                groups.address_corrected(groups.element_of(self))
         self.wrong_address = False
-        self.address = '410 S State St (84111)'
-        self.street_address = '410 S State St'
-        self.zipcode = '84111'
+        self.street_address = street_address
+        self.zipcode = zipcode
+        self.address = normalize_address(f'{street_address} ({zipcode})')
+        self.__store.changed(self.__row)
 
     def status(self, time: int) -> str:
         """
@@ -150,7 +380,11 @@ class Package:
         if self.__available_at > time:
             return f'Delayed, package available at {minutes_to_clock(self.__available_at)}'
 
-        loaded_at = cast(float, self.__loaded_at)
+        if self.__loaded_at is None:
+            # a package that wasn't delivered on its day
+            return 'At hub, not loaded'
+
+        loaded_at = self.__loaded_at
         if time < loaded_at:
             return f'At hub, expected load time {minutes_to_clock(loaded_at)}'
 
@@ -170,19 +404,22 @@ class Package:
 
         return minutes_to_clock(self.deadline)
 
-    def info(self, time: int) -> str:
+    def info(self, time: int, color: bool = True) -> str:
         """
         Returns a string of tab-delimited info on the package for the given time
 
         @param time The time at which to get package status
+        @param color Whether to color the status with ANSI escape codes
         """
+        green, cyan, blue, red = (ANSICodes.green, ANSICodes.cyan, ANSICodes.blue,
+                                  ANSICodes.red) if color else (str, str, str, str)
         info = [f'id: {self.id}', f'address: {self.address}']
         if (self.delivered_at or float('inf')) <= time:
-            info.append(ANSICodes.green(self.Status.DELIVERED))
+            info.append(green(self.Status.DELIVERED))
         elif (self.__loaded_at or float('inf')) <= time:
-            info.append(ANSICodes.cyan(self.Status.EN_ROUTE))
+            info.append(cyan(self.Status.EN_ROUTE))
         else:
-            info.append(ANSICodes.blue(self.Status.AT_HUB))
+            info.append(blue(self.Status.AT_HUB))
 
         info.append(f'deadline: {self.formatted_deadline()}')
 
@@ -196,11 +433,21 @@ class Package:
             info.append(
                 f'delivered at: {minutes_to_clock(self.delivered_at)}')
             on_time = self.delivered_at < self.deadline
-            colored = ANSICodes.green(
-                on_time) if on_time else ANSICodes.red(on_time)
+            colored = green(on_time) if on_time else red(on_time)
             info.append(f'delivered on time: {colored}')
 
         return str.join('\t', info)
 
     def __hash__(self) -> int:
         return hash(self.id)
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        """
+        Pickles the package as the view of its row, so an unpickled package is
+        the view its unpickled store has of the row
+        """
+        return PackageStore.view, (self.__store, self.__row)
+
+
+# the status of each code of the store's status column
+__STATUSES__ = (Package.Status.AT_HUB, Package.Status.EN_ROUTE, Package.Status.DELIVERED)
@@ -0,0 +1,195 @@
+from __future__ import annotations
+from abc import ABC, abstractmethod
+from typing import Iterable, Optional, cast
+from utils import normalize_address
+from wgups.package import Package
+from wgups.routing import RouteImprover
+from wgups.schedule import Schedule, Scheduler, move_package
+from wgups.truck import Trip
+
+
+class Change(ABC):
+    """
+    A change to a live schedule that becomes known during the day
+    """
+
+    @abstractmethod
+    def check(self, schedule: Schedule, time: float) -> None:
+        """
+        Raises if the change can't be made at the given time. Every change is
+        checked before the schedule is touched
+        """
+
+    @abstractmethod
+    def apply(self, schedule: Schedule, time: float) -> None:
+        """
+        Applies the change to the packages and trucks of the schedule, after
+        the trips that haven't departed by the time were taken back
+        """
+
+    @staticmethod
+    def pending(schedule: Schedule, package_id: int, time: float) -> Package:
+        """
+        Returns the package, which must not have left the hub by the time
+        """
+        package = schedule.packages.get(package_id)
+        if package is None:
+            raise Exception(f'unknown package {package_id}')
+        if package.loaded_at is not None and package.loaded_at <= time:
+            raise Exception(f'package {package_id} already left the hub')
+        return package
+
+    @staticmethod
+    def known_address(schedule: Schedule, address: str) -> None:
+        """
+        Packages can only be sent to the places of the distance table
+        """
+        try:
+            schedule.graph.index_of(address)
+        except KeyError:
+            raise Exception(f'unknown address {address}')
+
+
+class AddPackage(Change):
+    def __init__(self, package: Package) -> None:
+        self.package = package
+
+    def check(self, schedule: Schedule, time: float) -> None:
+        package = self.package
+        if schedule.packages.get(package.id) is not None:
+            raise Exception(f'package {package.id} already exists')
+        self.known_address(schedule, package.address)
+        for dep_id in package.dependent_packages:
+            self.pending(schedule, dep_id, time)
+
+    def apply(self, schedule: Schedule, time: float) -> None:
+        package = self.package
+        # a package can't be loaded before it arrives at the hub
+        package.delay(time)
+        if package.store is not schedule.store:
+            package.move_to(schedule.store)
+        for dep_id in package.dependent_packages:
+            package.deliver_with(cast(Package, schedule.packages.get(dep_id)))
+        schedule.packages.put(package.id, package)
+        move_package(schedule.destinations, package)
+
+
+class ChangeAddress(Change):
+    def __init__(self, package_id: int, street_address: str, zipcode: str) -> None:
+        self.package_id = package_id
+        self.street_address = street_address
+        self.zipcode = zipcode
+
+    def check(self, schedule: Schedule, time: float) -> None:
+        self.pending(schedule, self.package_id, time)
+        self.known_address(schedule, normalize_address(
+            f'{self.street_address} ({self.zipcode})'))
+
+    def apply(self, schedule: Schedule, time: float) -> None:
+        package = cast(Package, schedule.packages.get(self.package_id))
+        old_address = package.address
+        package.change_address(self.street_address, self.zipcode)
+        move_package(schedule.destinations, package, old_address)
+
+
+class DelayPackage(Change):
+    def __init__(self, package_id: int, until: float) -> None:
+        self.package_id = package_id
+        self.until = until
+
+    def check(self, schedule: Schedule, time: float) -> None:
+        self.pending(schedule, self.package_id, time)
+
+    def apply(self, schedule: Schedule, time: float) -> None:
+        cast(Package, schedule.packages.get(self.package_id)).delay(self.until)
+
+
+class TruckOutOfService(Change):
+    """
+    Keeps the truck from being loaded again, a trip it is on is finished
+    """
+
+    def __init__(self, number: int) -> None:
+        self.number = number
+
+    def check(self, schedule: Schedule, time: float) -> None:
+        if not any(truck.number == self.number for truck in schedule.trucks):
+            raise Exception(f'unknown truck {self.number}')
+
+    def apply(self, schedule: Schedule, time: float) -> None:
+        for truck in schedule.trucks:
+            if truck.number == self.number:
+                truck.in_service = False
+
+
+def __plan(schedule: Schedule, time: float, changes: list[Change],
+           route_improver: Optional[RouteImprover]) -> list[Trip]:
+    """
+    Takes back the trips that haven't departed by the time, applies the
+    changes and plans the rest of the day. Returns the trips taken back
+    """
+    dropped: list[Trip] = []
+    for truck in schedule.trucks:
+        departed = sum(1 for trip in truck.trips if trip.departed_at <= time)
+        dropped.extend(truck.rewind(departed))
+    for trip in dropped:
+        for package in trip.packages:
+            package.reset()
+
+    for change in changes:
+        change.apply(schedule, time)
+
+    trucks = [truck for truck in schedule.trucks if truck.in_service]
+    for truck in trucks:
+        truck.wait_until(time)
+    # the packages whose trips were taken back are all at the hub again, the
+    # others are left alone by the scheduler
+    Scheduler(schedule.graph, schedule.packages, schedule.destinations, trucks,
+              schedule.neighbors, route_improver, store=schedule.store, index=schedule.index).run()
+    return dropped
+
+
+def replan(schedule: Schedule, time: float, changes: Iterable[Change],
+           route_improver: Optional[RouteImprover] = None) -> list[Trip]:
+    """
+    Applies changes to a computed schedule at the given time of day and plans
+    the rest of the day again. Trips that departed by then, and the packages
+    on them, are kept as they are. Only the trips that hadn't departed yet are
+    taken back and their packages scheduled again, reusing the parsed graph,
+    destinations and neighbor index of the schedule. Returns the trips that
+    were added or changed. If any change can't be made, or the rest of the
+    day can't be planned with them, an exception is raised and the schedule
+    is left as it was
+
+    n = number of packages not yet departed
+    N = number of packages, which are all snapshotted
+    Time complexity: O(N) plus the scheduling of the n packages
+    Space complexity: O(N)
+    """
+    changes = list(changes)
+    for change in changes:
+        change.check(schedule, time)
+
+    # a change can still turn out to be impossible once the rest of the day
+    # is planned, then everything is put back as it was
+    store = schedule.store.snapshot()
+    trucks = [(truck, truck.snapshot()) for truck in schedule.trucks]
+    package_ids = set(package_id for (package_id, _) in schedule.packages)
+    destinations = [(address, packages[:]) for (address, packages) in schedule.destinations]
+    try:
+        dropped = __plan(schedule, time, changes, route_improver)
+    except Exception:
+        schedule.store.restore(store)
+        for (truck, snapshot) in trucks:
+            truck.restore(snapshot)
+        for package_id in [i for (i, _) in schedule.packages if i not in package_ids]:
+            schedule.packages.remove(package_id)
+        for address in [a for (a, _) in schedule.destinations]:
+            schedule.destinations.remove(address)
+        for (address, packages) in destinations:
+            schedule.destinations.put(address, packages)
+        raise
+
+    previous = set(trip.key() for trip in dropped)
+    return [trip for trip in schedule.trips()
+            if trip.departed_at > time and trip.key() not in previous]
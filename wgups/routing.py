@@ -0,0 +1,278 @@
+from __future__ import annotations
+from time import perf_counter
+from typing import TYPE_CHECKING, Callable, Optional, Union
+from utils import debug
+if TYPE_CHECKING:
+    from wgups.place import Place
+    from wgups.truck import Truck
+    from datastructures.matrix import DistanceMatrix
+
+# a route improver reorders the packages loaded on a truck before it departs
+# and returns the number of miles it saved
+RouteImprover = Callable[['Truck', 'DistanceMatrix[Union[Place, str]]'], float]
+
+# moves must improve the route by more than this to be accepted, which keeps
+# floating point noise from making the search cycle
+EPSILON = 1e-9
+
+
+class _Route:
+    """
+    A truck load being improved. The route is kept as a list of positions into
+    the truck's packages and every package is resolved to its interned stop
+    index once, so that evaluating a move only costs a few array lookups
+    """
+
+    def __init__(self, truck: Truck, graph: DistanceMatrix[Union[Place, str]]) -> None:
+        self.truck = truck
+        self.hub = graph.index_of(truck.depot)
+        self.distance = graph.distance_between_indexes
+        self.stops = [graph.index_of(p.address) for p in truck.packages]
+        self.order = list(range(len(truck.packages)))
+        # a package that would already be late on the original route doesn't
+        # constrain the search, every other package must stay on time, which
+        # like Schedule.valid means arriving before its deadline
+        self.deadlines = [p.deadline if arrival < p.deadline else float('inf')
+                          for (p, arrival) in zip(truck.packages, self.arrivals(self.order))]
+
+    def node(self, order: list[int], k: int) -> int:
+        """
+        Returns the stop at position k of the route, the hub lies on both ends
+        """
+        return self.hub if k < 0 or k >= len(order) else self.stops[order[k]]
+
+    def miles(self, order: list[int]) -> float:
+        """
+        Returns the length of the round trip from the hub
+
+        Time complexity: O(n)
+        """
+        miles = 0.0
+        previous = self.hub
+        for i in order:
+            miles += self.distance(previous, self.stops[i])
+            previous = self.stops[i]
+        return miles + self.distance(previous, self.hub)
+
+    def arrivals(self, order: list[int]) -> list[float]:
+        """
+        Returns the arrival time at each package of the route, indexed by the
+        package's position in the truck
+
+        Time complexity: O(n)
+        """
+        arrivals = [0.0] * len(order)
+        miles = self.truck.miles_traveled
+        previous = self.hub
+        for i in order:
+            miles += self.distance(previous, self.stops[i])
+            previous = self.stops[i]
+            arrivals[i] = self.truck.time_at(miles)
+        return arrivals
+
+    def feasible(self, order: list[int]) -> bool:
+        """
+        Returns whether every deadline that was met by the original route is
+        still met by the given route
+
+        Time complexity: O(n)
+        """
+        return all(arrival < deadline for (arrival, deadline)
+                   in zip(self.arrivals(order), self.deadlines))
+
+    def two_opt(self) -> bool:
+        """
+        Applies the first improving 2-opt move, i.e. reverses a segment of the
+        route. Only the two edges at the ends of the segment change, so the
+        delta is evaluated in constant time before checking deadlines
+
+        Time complexity: O(n^2) evaluations
+        """
+        order = self.order
+        distance = self.distance
+        n = len(order)
+        for i in range(n - 1):
+            a, b = self.node(order, i - 1), self.node(order, i)
+            for j in range(i + 1, n):
+                c, d = self.node(order, j), self.node(order, j + 1)
+                delta = distance(a, c) + distance(b, d) - \
+                    distance(a, b) - distance(c, d)
+                if delta < -EPSILON:
+                    candidate = order[:i] + order[i:j + 1][::-1] + order[j + 1:]
+                    if self.feasible(candidate):
+                        self.order = candidate
+                        return True
+        return False
+
+    def or_opt(self) -> bool:
+        """
+        Applies the first improving Or-opt move, i.e. moves a segment of up to
+        three consecutive stops, optionally reversed, to another position of
+        the route
+
+        Time complexity: O(n^2) evaluations
+        """
+        order = self.order
+        distance = self.distance
+        n = len(order)
+        for length in range(1, min(3, n - 1) + 1):
+            for i in range(n - length + 1):
+                prev, nxt = self.node(order, i - 1), self.node(order, i + length)
+                first, last = self.node(order, i), self.node(order, i + length - 1)
+                removal = distance(prev, first) + distance(last, nxt) - \
+                    distance(prev, nxt)
+                segment = order[i:i + length]
+                remaining = order[:i] + order[i + length:]
+                for k in range(-1, len(remaining)):
+                    if k == i - 1:
+                        continue
+                    u = self.node(remaining, k)
+                    v = self.node(remaining, k + 1)
+                    for (head, tail, seg) in [(first, last, segment), (last, first, segment[::-1])]:
+                        delta = distance(u, head) + distance(tail, v) - \
+                            distance(u, v) - removal
+                        if delta < -EPSILON:
+                            candidate = remaining[:k + 1] + \
+                                seg + remaining[k + 1:]
+                            if self.feasible(candidate):
+                                self.order = candidate
+                                return True
+        return False
+
+
+def improve_route(truck: Truck, graph: DistanceMatrix[Union[Place, str]],
+                  max_iterations: int = 1000, time_budget: Optional[float] = None) -> float:
+    """
+    Reorders the packages loaded on the truck with 2-opt and Or-opt moves until
+    no move improves the route or the budget runs out. A move is only accepted
+    if it keeps every package that was on time on the original route on time.
+    Loaded packages are all available by the time the truck departs, so
+    reordering can't violate their available times
+
+    @param max_iterations The maximum number of moves to apply
+    @param time_budget The maximum number of seconds to search for
+    @return The number of miles saved on the trip
+
+    Time complexity: O(i * n^3) for i iterations
+    Space complexity: O(n)
+    """
+    if len(truck.packages) < 3:
+        return 0.0
+
+    route = _Route(truck, graph)
+    before = route.miles(route.order)
+    deadline = None if time_budget is None else perf_counter() + time_budget
+    iterations = 0
+    while iterations < max_iterations and (deadline is None or perf_counter() < deadline):
+        if not (route.two_opt() or route.or_opt()):
+            break
+        iterations += 1
+
+    packages = truck.packages
+    truck.packages = [packages[i] for i in route.order]
+    saved = before - route.miles(route.order)
+    debug('improved route of truck %d by %s miles in %d moves',
+          truck.number, round(saved, 1), iterations)
+    return saved
+
+
+def held_karp(truck: Truck, graph: DistanceMatrix[Union[Place, str]], max_stops: int = 12,
+              fallback: Optional[RouteImprover] = improve_route) -> float:
+    """
+    Sequences the packages loaded on the truck optimally with the Held-Karp
+    dynamic program over (visited stops, last stop). Packages to the same
+    address are one stop and are delivered together. Every package that is on
+    time on the original route stays on time, so a partial route only has to
+    be kept if it is the shortest one to its state, since arriving earlier
+    never hurts a later deadline. Partial routes whose miles plus a lower bound
+    on the rest of the trip exceed the original route are pruned
+
+    @param max_stops Loads with more distinct stops than this are handed to
+    the fallback instead, the state space doubles with every stop
+    @param fallback The improver for large loads, None leaves them as loaded
+    @return The number of miles saved on the trip
+
+    Time complexity: O(2^s * s^2) for s stops
+    Space complexity: O(2^s * s)
+    """
+    route = _Route(truck, graph)
+    # the distinct stops in the order they are first visited by the load
+    stops: list[int] = []
+    packages_at: list[list[int]] = []
+    deadlines: list[float] = []
+    for (i, stop) in enumerate(route.stops):
+        if stop not in stops:
+            stops.append(stop)
+            packages_at.append([])
+            deadlines.append(float('inf'))
+        s = stops.index(stop)
+        packages_at[s].append(i)
+        deadlines[s] = min(deadlines[s], route.deadlines[i])
+
+    n = len(stops)
+    if n > max_stops:
+        return 0.0 if fallback is None else fallback(truck, graph)
+    if n < 3:
+        return 0.0
+
+    # node n is the hub
+    nodes = stops + [route.hub]
+    distance = [[route.distance(a, b) for b in nodes] for a in nodes]
+    # a lower bound on the rest of a trip: every stop not yet visited, and the
+    # hub, is still entered once through at least its shortest edge
+    shortest_in = [min(distance[v][u] for v in range(n + 1) if v != u)
+                   for u in range(n + 1)]
+    full = (1 << n) - 1
+    remaining_bound = [0.0] * (full + 1)
+    for mask in range(full + 1):
+        remaining_bound[mask] = shortest_in[n] + sum(shortest_in[u] for u in range(n)
+                                                     if not mask & (1 << u))
+
+    before = route.miles(route.order)
+    limit = before + EPSILON
+    # the odometer reading each stop has to be reached before to be on time
+    start = truck.miles_traveled
+    latest = [start + (deadline - truck.time_at(start)) * truck.speed / 60
+              for deadline in deadlines]
+    # the shortest miles and the previous stop of every (visited stops, last
+    # stop) state, flattened into mask * n + last
+    inf = float('inf')
+    miles_to = [inf] * ((full + 1) * n)
+    previous = [n] * ((full + 1) * n)
+    for u in range(n):
+        if start + distance[n][u] < latest[u]:
+            miles_to[(1 << u) * n + u] = distance[n][u]
+
+    # every mask is only extended to larger masks, so visiting them in
+    # increasing order finishes each state before it is extended
+    for mask in range(1, full):
+        for last in range(n):
+            miles = miles_to[mask * n + last]
+            if miles == inf:
+                continue
+            row = distance[last]
+            for u in range(n):
+                bit = 1 << u
+                if mask & bit:
+                    continue
+                total = miles + row[u]
+                key = (mask | bit) * n + u
+                if total < miles_to[key] and total + remaining_bound[mask | bit] <= limit \
+                        and start + total < latest[u]:
+                    miles_to[key] = total
+                    previous[key] = last
+
+    after, last = min((miles_to[full * n + u] + distance[u][n], u) for u in range(n))
+    if after >= before - EPSILON:
+        return 0.0
+
+    sequence: list[int] = []
+    mask = full
+    while last != n:
+        sequence.append(last)
+        mask, last = mask & ~(1 << last), previous[mask * n + last]
+    packages = truck.packages
+    truck.packages = [packages[i] for s in reversed(sequence) for i in packages_at[s]]
+    debug('sequenced route of truck %d with %d stops, saving %s miles',
+          truck.number, n, round(before - after, 1))
+    return before - after
@@ -1,122 +1,430 @@
-from typing import Iterable, Union, cast
-from wgups.truck import Truck
+from itertools import islice
+from typing import Any, Callable, Iterable, Iterator, Optional, Sequence, Union, cast
+from wgups.truck import HUB, Trip, Truck
 from wgups.place import Place
-from wgups.package import Package
-from datastructures import Graph, HashMap
+from wgups.package import EOD, Package
+from wgups.routing import RouteImprover
+from wgups.ingest import ingest
+from wgups.simulation import Simulation
+from wgups.eligibility import EligibilityIndex
+from wgups.eventlog import EventLog
+from wgups.indexes import PackageIndex
+from wgups.store import PackageStore
+from wgups import network
+from datastructures import DistanceMatrix, HashMap, IntHashMap, NeighborIndex
+from utils import timed
 import csv
+import heapq
+import random
 
-HUB = 'HUB'
 base_time = 8 * 60
 
-__ALL_TRUCKS__: list[Truck]
-__ALL_PACKAGES__: HashMap[int, Package]
-__GRAPH__: Graph[Union[Place, str]]
 
-
-def __find_closest(pkgs: Iterable[Package], loc: Union[str, Place]) -> Package:
-    """
-    Time complexity: O(n)
-    Space complexity: O(1)
+def move_package(destinations: HashMap[str, list[Package]], package: Package,
+                 old_address: Optional[str] = None) -> None:
     """
-    shortest_dist = float('inf')
-    closest = None
-    for p in pkgs:
-        dist = __GRAPH__.distance_between(p.address, loc)
-        if dist < shortest_dist:
-            shortest_dist = dist
-            closest = p
-
-    return cast(Package, closest)
-
-
-wrong_address_packages = None
-
+    Files a package under its destination, after taking it out of the one it
+    was filed under before its address changed, so the neighbor walk finds it
+    at its new place
 
-def __dispatch_trucks() -> int:
+    Time complexity: O(p) for p packages at the old address
     """
-    Goes over the list of all trucks and calls the delivery method, additionally
-    it checks to see if enough time has passed for any packages with a wrong
-    address to have their corrected address available and updates them if so
-
-    Time complexity: O(m * n) -> O(2 * n) -> O(n)
-    Space complexity: O(1)
-    Space complexity: O(1)
-    """
-    global wrong_address_packages
-    if wrong_address_packages is None:
-        wrong_address_packages = [
-            p[1] for p in __ALL_PACKAGES__ if p[1].wrong_address]
-
-    packages_delivered = 0
-
-    for truck in __ALL_TRUCKS__:
-        packages_delivered += len(truck.packages)
-        truck.run_delivery(__GRAPH__)
-
-        if len(wrong_address_packages) != 0:
-            for p in wrong_address_packages:
-                if p.correct_address_available(truck.get_time()):
-                    p.update_address()
-                    wrong_address_packages.remove(p)
-
-    return packages_delivered
+    if old_address is not None and (old_list := destinations.get(old_address)) is not None \
+            and package in old_list:
+        old_list.remove(package)
+    if (package_list := destinations.get(package.address)) is None:
+        package_list = []
+        destinations.put(package.address, package_list)
+    package_list.append(package)
 
 
-def __distribute_packages(packages: Iterable[Package]):
+class Schedule:
     """
-    Attempts to distribute packages between the trucks to create the shortest
-    possible route for the given packages and trucks
-
-    Time complexity: O(m * n) -> O(2 * n) -> O(n)
-    Space complexity: O(1)
+    The self-contained result of scheduling a day: the packages with their load
+    and delivery times and the trucks with the miles they traveled
     """
-    count = float('inf')
-    while count > 2:
-        count = 0
-        for truck in __ALL_TRUCKS__:
-            if truck.full():
-                continue
-            shortest = float('inf')
-            closest = None
-            for p in packages:
-                if p.available_for(truck):
-                    count += 1
-                    dist = __GRAPH__.distance_between(
-                        truck.location(), p.address)
-                    if dist < shortest:
-                        shortest = dist
-                        closest = p
-
-            if closest is not None:
-                truck.load_package(closest)
-
 
-def __deliver_priority_packages(destination_package_map: HashMap[str, list[Package]]):
+    def __init__(self, packages: IntHashMap[Package], trucks: list[Truck],
+                 graph: DistanceMatrix[Union[Place, str]], seed: Optional[int] = None,
+                 destinations: Optional[HashMap[str, list[Package]]] = None,
+                 neighbors: Optional[NeighborIndex[Union[Place, str]]] = None,
+                 store: Optional[PackageStore] = None,
+                 index: Optional[PackageIndex] = None) -> None:
+        self.packages = packages
+        # holds the rows of the packages, see Scheduler
+        self.store = PackageStore.of(packages) if store is None else store
+        # answers queries over the packages, and stays up to date as the
+        # schedule is re-planned
+        self.index = PackageIndex.of(self.store) if index is None else index
+        self.trucks = trucks
+        self.graph = graph
+        # the seed of the randomized construction, None for the greedy one
+        self.seed = seed
+        # kept so the schedule can be re-planned without parsing again
+        self.destinations = destinations or HashMap[str, list[Package]]()
+        self.neighbors = neighbors
+
+    def __iter__(self) -> Iterator[Any]:
+        """
+        Allows unpacking the schedule as `packages, trucks = schedule`
+        """
+        yield self.packages
+        yield self.trucks
+
+    def miles(self) -> float:
+        return sum(t.miles_traveled for t in self.trucks)
+
+    def trips(self) -> list[Trip]:
+        """
+        Returns the trips of every truck ordered by their departure
+        """
+        return sorted((trip for truck in self.trucks for trip in truck.trips),
+                      key=lambda trip: (trip.departed_at, trip.truck))
+
+    def valid(self) -> bool:
+        """
+        Checks that every package was delivered by its deadline, on the truck
+        it is restricted to, no earlier than it was available and on the same
+        trip as the packages it has to be delivered with
+
+        Time complexity: O(n)
+        """
+        for (_, p) in self.packages:
+            if p.delivered_at is None or p.delivered_at >= p.deadline:
+                return False
+            if p.required_truck is not None and p.required_truck != p.delivered_by:
+                return False
+            if cast(float, p.loaded_at) < p.available_at:
+                return False
+            for dep in p.dependencies:
+                if dep.delivered_by != p.delivered_by or dep.loaded_at != p.loaded_at:
+                    return False
+        return True
+
+    def late_packages(self) -> list[Package]:
+        return [p for (_, p) in self.packages
+                if p.delivered_at is None or p.delivered_at >= p.deadline]
+
+    def summary(self) -> dict[str, Any]:
+        """
+        Returns the figures used to compare schedules with each other
+        """
+        finished = [p.delivered_at for (_, p) in self.packages
+                    if p.delivered_at is not None]
+        return {
+            'packages': len(self.packages),
+            'trucks': len(self.trucks),
+            'miles': round(self.miles(), 1),
+            'late': len(self.late_packages()),
+            'finished_at': max(finished, default=None),
+        }
+
+
+class Scheduler:
     """
-    Time complexity: O(n)
-    Space complexity: O(n)
+    Holds the state of scheduling one day, so that any number of schedules can
+    be built in the same process. The graph and neighbor index are only read,
+    so they can be shared between schedulers
     """
-    priority_packages = set([p[1] for p in __ALL_PACKAGES__ if any([p[1].priority(
-        t.get_time()) and p[1].available_for(t) for t in __ALL_TRUCKS__])])
-    # load the trucks that have the fewest miles traveled first
-    __ALL_TRUCKS__.sort(key=lambda t: t.miles_traveled)
-    for truck in __ALL_TRUCKS__:
-        # load the truck until it's full or there are no more packages remaining
-        while not truck.full() and len(priority_packages) != 0:
-            # find the package whose destination is closest to the trucks
-            # current location
-            closest = __find_closest(priority_packages, truck.location())
-            # get all dependencies of that package
-            deps = closest.dependencies
-            for dep in deps:
-                deps = deps.union(cast(set[Package], dep.dependencies))
-            deps.add(closest)
-            # ensure we have capacity the package and its dependencies
-            if truck.capacity() >= len(deps):
+
+    def __init__(self, graph: DistanceMatrix[Union[Place, str]], packages: IntHashMap[Package],
+                 destinations: HashMap[str, list[Package]], trucks: list[Truck],
+                 neighbors: Optional[NeighborIndex[Union[Place, str]]] = None,
+                 route_improver: Optional[RouteImprover] = None,
+                 timings: Optional[dict[str, float]] = None, simulate: bool = False,
+                 seed: Optional[int] = None, candidates: int = 3, tolerance: float = 0.5,
+                 store: Optional[PackageStore] = None, event_log: Optional[EventLog] = None,
+                 index: Optional[PackageIndex] = None) -> None:
+        """
+        @param seed If given, each package is picked at random out of the
+        `candidates` closest ones instead of always the closest, so every seed
+        constructs a different schedule
+        @param tolerance How much further than the closest package, as a
+        fraction of its distance, a randomly picked package may be
+        @param store The store holding the rows of exactly the given packages,
+        the scans over every package run over its columns. The store of the
+        packages if not given
+        @param event_log If given, the day and every load, trip and address
+        correction are written to it as they happen
+        @param index The index of the store, the store's own if not given
+        """
+        self.graph = graph
+        self.packages = packages
+        self.store = PackageStore.of(packages) if store is None else store
+        self.destinations = destinations
+        self.trucks = trucks
+        self.neighbors = neighbors
+        self.route_improver = route_improver
+        self.timings = timings
+        self.seed = seed
+        self.rng = None if seed is None else random.Random(seed)
+        self.candidates = candidates
+        self.tolerance = tolerance
+        # the order packages are scanned in, closest-package ties are resolved
+        # by it
+        self.__positions = IntHashMap[int](len(packages))
+        for p in self.store:
+            self.__positions.put(p.id, p.row)
+        self.__wrong_address_packages = self.store.views(
+            self.store.with_wrong_address())
+        self.__eligible = EligibilityIndex(self.store)
+        self.index = PackageIndex.of(self.store) if index is None else index
+        self.event_log = event_log
+        # the number of each truck's trips that were written to the log
+        self.__logged_trips = IntHashMap[int](len(trucks))
+
+        self.simulation: Optional[Simulation] = None
+        if simulate:
+            self.simulation = Simulation(graph)
+            for (_, p) in packages:
+                self.simulation.track(p)
+            self.simulation.on(Simulation.Event.ADDRESS_CORRECTED, self.__move_package)
+            if event_log is not None:
+                self.simulation.on(Simulation.Event.ADDRESS_CORRECTED, lambda p, _: event_log.address(
+                    cast(Simulation, self.simulation).time, p))
+
+    def __find_closest(self, pkgs: Iterable[Package], loc: Union[str, Place]) -> Package:
+        """
+        Time complexity: O(n)
+        Space complexity: O(n)
+        """
+        candidates = list(pkgs)
+        index = self.graph.closest(loc, [p.address for p in candidates])
+        return cast(Package, candidates[index] if index != -1 else None)
+
+    def __pick(self, pkgs: list[Package], loc: Union[str, Place]) -> Optional[Package]:
+        """
+        Returns the package closest to the location. When randomized, a package
+        out of the closest few that are nearly as close is picked instead
+
+        Time complexity: O(n log c) for c candidates
+        Space complexity: O(n)
+        """
+        if self.rng is None:
+            index = self.graph.closest(loc, [p.address for p in pkgs])
+            return pkgs[index] if index != -1 else None
+        if len(pkgs) == 0:
+            return None
+        distances = self.graph.distances_from(loc, [p.address for p in pkgs])
+        shortlist = heapq.nsmallest(self.candidates, range(len(pkgs)),
+                                    key=distances.__getitem__)
+        limit = distances[shortlist[0]] * (1 + self.tolerance)
+        return pkgs[self.rng.choice([i for i in shortlist if distances[i] <= limit])]
+
+    def __closest_by_neighbors(self, loc: Union[str, Place], is_candidate: Callable[[Package], bool],
+                               positions: IntHashMap[int]) -> Optional[Package]:
+        """
+        Walks the places nearest to the location, closest first, and returns the
+        closest package that is a candidate. Candidates at the same distance are
+        resolved by their position in the order the caller would have scanned
+        them, so the result is the same as a full scan's. Returns None if
+        there is no neighbor index or its list ran out before the closest
+        candidate was certain, in which case the caller has to do a full scan
+
+        Time complexity: O(k) places, plus the packages at those places
+        Space complexity: O(1)
+        """
+        # the walk only finds the closest package, randomized picks need them all
+        if self.neighbors is None or self.rng is not None:
+            return None
+
+        closest = None
+        shortest = float('inf')
+        for (dist, index) in self.neighbors.neighbors(loc):
+            if dist > shortest:
+                return closest
+            for p in self.destinations.get(str(self.graph.vertex_at(index))) or []:
+                if is_candidate(p) and (dist < shortest or
+                                        cast(int, positions.get(p.id)) < cast(int, positions.get(cast(Package, closest).id))):
+                    shortest = dist
+                    closest = p
+
+        if closest is not None and not self.neighbors.exhausted(loc, shortest):
+            return closest
+        return None
+
+    def __move_package(self, package: Package, old_address: str) -> None:
+        move_package(self.destinations, package, old_address)
+
+    def __dispatch_trucks(self) -> int:
+        """
+        Goes over the list of all trucks and calls the delivery method, additionally
+        it checks to see if enough time has passed for any packages with a wrong
+        address to have their corrected address available and updates them if so
+
+        Time complexity: O(m * n) -> O(2 * n) -> O(n)
+        Space complexity: O(1)
+        Space complexity: O(1)
+        """
+        if self.simulation is not None:
+            return self.__run_simulation()
+
+        packages_delivered = 0
+
+        for truck in self.trucks:
+            packages_delivered += len(truck.packages)
+            # reorder the load before the truck departs so the miles it
+            # accumulates are for the improved route
+            if self.route_improver is not None and not truck.empty():
+                truck.trip_savings.append(self.route_improver(truck, self.graph))
+            truck.run_delivery(self.graph)
+
+            if len(self.__wrong_address_packages) != 0:
+                for p in self.__wrong_address_packages:
+                    if p.correct_address_available(truck.get_time()):
+                        old_address = p.address
+                        p.update_address()
+                        self.__move_package(p, old_address)
+                        if self.event_log is not None:
+                            self.event_log.address(truck.get_time(), p)
+                        self.__wrong_address_packages.remove(p)
+
+        self.__log_trips()
+        return packages_delivered
+
+    def __run_simulation(self) -> int:
+        """
+        Sends every loaded truck at the hub out on its trip and advances the
+        simulation until the first truck is back, so it can be loaded again while
+        the others are still out. Trucks that sat at the hub meanwhile are moved up
+        to the simulation clock as they can't load anything before that time
+
+        Time complexity: O(e log e) for e events
+        Space complexity: O(m)
+        """
+        simulation = cast(Simulation, self.simulation)
+        for truck in self.trucks:
+            if truck.en_route or truck.empty():
+                continue
+            if self.route_improver is not None:
+                truck.trip_savings.append(self.route_improver(truck, self.graph))
+            simulation.dispatch(truck)
+
+        if not any(truck.en_route for truck in self.trucks):
+            return 0
+
+        packages_delivered = simulation.run(stop_on_return=True)
+        self.__log_trips()
+        for truck in self.trucks:
+            if not truck.en_route:
+                truck.wait_until(simulation.time)
+        return packages_delivered
+
+    def __distribute_packages(self):
+        """
+        Attempts to distribute packages between the trucks to create the shortest
+        possible route for the given packages and trucks
+
+        The packages that became available by the latest clock of the trucks at
+        the hub are released from the eligibility index first, so each truck
+        only scans the packages it could load
+
+        Time complexity: O(r * e) for r rounds and e eligible packages
+        Space complexity: O(e)
+        """
+        at_hub = [t.get_time() for t in self.trucks if not t.en_route]
+        if len(at_hub) == 0:
+            return
+        self.__eligible.release(max(at_hub))
+
+        count = float('inf')
+        while count > 2:
+            count = 0
+            for truck in self.trucks:
+                if truck.full() or truck.en_route or not truck.on_shift():
+                    continue
+
+                # only whether more than two packages are available matters, so
+                # counting stops as soon as that is known
+                if count <= 2:
+                    count += sum(1 for _ in islice(self.__eligible.candidates(truck), 3 - count))
+
+                closest = self.__closest_by_neighbors(
+                    truck.location(), lambda p: p.available_for(truck), self.__positions)
+                if closest is None:
+                    closest = self.__pick(list(self.__eligible.candidates(truck)), truck.location())
+                if closest is not None:
+                    self.__load(truck, closest)
+
+    def __load(self, truck: Truck, package: Package) -> None:
+        truck.load_package(package)
+        self.__eligible.remove(package)
+        if self.event_log is not None:
+            self.event_log.load(truck, package)
+
+    def __log_trips(self) -> None:
+        """
+        Writes the trips the trucks finished since the last call to the log
+
+        Time complexity: O(m + p) for p packages on the finished trips
+        """
+        if self.event_log is None:
+            return
+        for truck in self.trucks:
+            logged = self.__logged_trips.get(truck.number) or 0
+            for trip in truck.trips[logged:]:
+                if trip.returned_at is None:
+                    break
+                self.event_log.trip(truck, trip)
+                logged += 1
+            self.__logged_trips.put(truck.number, logged)
+
+    def __deliver_priority_packages(self):
+        """
+        Time complexity: O(n + m log m)
+        Space complexity: O(n + m)
+        """
+        # a package restricted to a truck can only be loaded by that truck, any
+        # other package is checked against the truck whose clock is the furthest
+        # along as it's the first to see delayed packages become available
+        # load the trucks that have the fewest miles traveled first
+        self.trucks.sort(key=lambda t: t.miles_traveled)
+        at_hub = [t for t in self.trucks if not t.en_route and t.on_shift()]
+        if len(at_hub) == 0:
+            return
+        trucks_by_number = HashMap[int, Truck].from_items(
+            [(t.number, t) for t in at_hub])
+        latest = max(at_hub, key=lambda t: t.get_time())
+        priority_packages = set[Package]()
+        for p in self.index.query(status=Package.Status.AT_HUB, deadline=(None, EOD)):
+            truck = latest if p.required_truck is None else trucks_by_number.get(
+                p.required_truck)
+            if truck is not None and p.priority(truck.get_time()) and p.available_for(truck):
+                priority_packages.add(p)
+        # a full scan would visit the priority packages in the set's iteration
+        # order, which doesn't change as packages are discarded from it
+        positions = IntHashMap[int](len(priority_packages))
+        for (position, p) in enumerate(priority_packages):
+            positions.put(p.id, position)
+        for truck in at_hub:
+            # the groups that didn't fit in what was left of the truck
+            too_large = set[Package]()
+            # load the truck until it's full or there are no more packages remaining
+            while not truck.full() and len(priority_packages) != 0:
+                # find the package whose destination is closest to the trucks
+                # current location, out of those this truck is allowed to carry
+                closest = self.__closest_by_neighbors(truck.location(), lambda p: p in priority_packages
+                                                      and p not in too_large and p.available_for(truck),
+                                                      positions)
+                if closest is None:
+                    eligible = [p for p in priority_packages
+                                if p not in too_large and p.available_for(truck)]
+                    if len(eligible) == 0:
+                        break
+                    closest = cast(Package, self.__pick(
+                        eligible, truck.location()))
+                # get the package's whole group, which it's in itself
+                deps = set(closest.group())
+                # ensure we have capacity the package and its dependencies,
+                # otherwise leave them for a truck with more room and keep
+                # loading the smaller groups that still fit
+                if truck.capacity() < len(deps):
+                    too_large.update(deps)
+                    continue
                 while len(deps) != 0:
                     # find the closest package of the dependencies, for most
                     # packages this will be the original closes package
-                    pkg = __find_closest(deps, truck.location())
+                    pkg = self.__find_closest(deps, truck.location())
                     deps.discard(pkg)
                     # make sure this wasn't processed already
                     if not pkg.at_hub():
@@ -124,114 +432,404 @@ def __deliver_priority_packages(destination_package_map: HashMap[str, list[Packa
                     # add the package and remove it from the priority packages
                     # to ensure it's not loaded twice
                     priority_packages.discard(pkg)
-                    truck.load_package(pkg)
-                    # while we still have space, load any packages that are
-                    # being delivered to the same address as the previously-
-                    # loaded package
-                    for p in (destination_package_map.get(pkg.address) or []):
-                        if not truck.full() and p.available_for(truck):
+                    self.__load(truck, pkg)
+                    # while we still have space left over from the remaining
+                    # dependencies, load any packages that are being delivered to
+                    # the same address as the previously-loaded package
+                    for p in (self.destinations.get(pkg.address) or []):
+                        if truck.capacity() > len(deps) and p.available_for(truck):
                             priority_packages.discard(p)
-                            truck.load_package(p)
-
-
-def __deliver_remaining_packages() -> int:
-    """
-    Time complexity: O(n) + O(n) + O(n) -> O(n)
-    Space complexity: O(n)
-    """
-    remaining_packages = [p[1] for p in __ALL_PACKAGES__ if p[1].at_hub()]
-    __distribute_packages(remaining_packages)
-    return __dispatch_trucks()
-
-
-def __parse_packages() -> tuple[HashMap[int, Package], HashMap[str, list[Package]]]:
+                            self.__load(truck, p)
+
+    def __deliver_remaining_packages(self) -> int:
+        """
+        Time complexity: O(n) + O(n) + O(n) -> O(n)
+        Space complexity: O(n)
+        """
+        with timed(self.timings, 'distribution'):
+            self.__distribute_packages()
+        with timed(self.timings, 'dispatch'):
+            return self.__dispatch_trucks()
+
+    def __wait_for_packages(self) -> bool:
+        """
+        Called when no truck could be loaded. Idles the trucks at the hub until the
+        next remaining package becomes available, without this the trucks' clocks
+        would never advance past the packages' available times. Returns whether
+        any truck had to wait
+
+        Time complexity: O(n + m)
+        Space complexity: O(1)
+        """
+        earliest = min(t.get_time() for t in self.trucks)
+        next_available = self.store.next_available(earliest)
+        if next_available is None:
+            return False
+        for truck in self.trucks:
+            truck.wait_until(next_available)
+        if self.simulation is not None:
+            self.simulation.run(until=next_available)
+        return True
+
+    def run(self) -> Schedule:
+        """
+        Loads and dispatches the trucks until every package is delivered
+
+        Time complexity: O(n)
+        Space complexity: O(n)
+        """
+        if self.event_log is not None:
+            self.event_log.day(self.store, self.trucks)
+
+        # make sure all priority packages are fully delivered
+        priority_remaining = True
+        # time complexity of while block: O(n) + O(n) -> O(n)
+        while priority_remaining:
+            with timed(self.timings, 'priority'):
+                self.__deliver_priority_packages()
+            if priority_remaining := any([not truck.empty() for truck in self.trucks]):
+                self.__deliver_remaining_packages()
+
+        # continue delivering packages until none remain
+        remaining_package_count = self.store.undelivered()
+        # time complexity of while block: O(n)
+        stalled = False
+        while remaining_package_count != 0:
+            if not any(truck.en_route or truck.on_shift() for truck in self.trucks):
+                # the shifts are over, the remaining packages stay at the hub
+                break
+            if (delivered := self.__deliver_remaining_packages()) == 0 and not self.__wait_for_packages():
+                # address corrections are applied while dispatching, so a round
+                # that neither loads nor waits is only a stall if it happens twice
+                if stalled:
+                    raise Exception('unable to deliver the remaining packages')
+                stalled = True
+            else:
+                stalled = False
+            remaining_package_count -= delivered
+
+        # bring the trucks still out on their last trip back to the hub
+        if self.simulation is not None:
+            self.simulation.run()
+            self.__log_trips()
+
+        return Schedule(self.packages, self.trucks, self.graph, self.seed,
+                        self.destinations, self.neighbors, self.store, self.index)
+
+
+def __parse_packages(path: str, package_ids: Optional[Iterable[int]] = None) \
+        -> tuple[IntHashMap[Package], HashMap[str, list[Package]], PackageStore]:
     """
     parses the packages from the .csv into a list of package objects and a map
     containing the all the packages for a destination, this is used later to
-    load as many packages as possible that have the same destination
+    load as many packages as possible that have the same destination. the
+    packages are keyed by their integer ID, so they are stored in the compact
+    IntHashMap rather than the bucket HashMap. if package IDs are given, only
+    those packages are kept. the packages' fields are held in the columns of
+    one store
+
+    the file is streamed in chunks by wgups.ingest, which also links packages
+    that must be delivered together
 
     Time complexity: O(n)
     Space complexity: O(n)
     """
-    packages = HashMap[int, Package]()
+    store = PackageStore()
+    packages = IntHashMap[Package]()
     destination_package_map = HashMap[str, list[Package]]()
-    dependency_map = HashMap[int, set[Package]]()
-    with open('packages.csv') as f:
-        for row in csv.reader(f, delimiter=';'):
-            new_package = Package(*row)
+    for chunk in ingest(path, package_ids=package_ids, store=store):
+        for new_package in chunk:
             packages.put(new_package.id, new_package)
             if (package_list := destination_package_map.get(new_package.address)) is None:
                 package_list: list[Package] = []
                 destination_package_map.put(new_package.address, package_list)
             package_list.append(new_package)
-            for dep in new_package.dependent_packages:
-                if (dep_set := dependency_map.get(dep)) is None:
-                    dep_set = set()
-                    dependency_map.put(dep, dep_set)
-                dep_set.add(new_package)
-            for pkg in dependency_map.get(new_package.id) or []:
-                pkg.dependencies.add(new_package)
-                new_package.dependencies.add(pkg)
 
-    return packages, destination_package_map
+    return packages, destination_package_map, store
 
 
-def __parse_distances() -> Graph[Union[Place, str]]:
+def __parse_distances(path: str, cache_dir: Optional[str] = None) -> DistanceMatrix[Union[Place, str]]:
     """
     we parse the the distances csv into a place objects. we use the the street
     address and zip code to build a unique identifier for each place. this id
     is used to look it up in the graph so we can use a string or the place
     object itself for that lookup
 
-    Time complexity: O(n * (n/2)) = O(n^2) as it is essentially a summation
+    the places are interned into a distance matrix so the scheduler can look up
+    rows of distances by index instead of going through nested maps
+
+    with a cache directory, the parsed matrix is compiled into a binary file
+    keyed by the hash of the csv, later calls memory map that file instead of
+    parsing the csv again
+
+    Time complexity: O(n * (n/2)) = O(n^2) as it is essentially a summation,
+    O(n) when the compiled matrix is cached
     Space complexity: O(n^2)
     """
-    graph = Graph[Union[Place, str]]()
-    with open('distances.csv') as f:
+    if cache_dir is not None:
+        csv_digest = network.digest(path)
+        compiled = network.cache_path(path, cache_dir, csv_digest)
+        if (cached := network.load(compiled, csv_digest)) is not None:
+            return cached
+
+    graph = DistanceMatrix[Union[Place, str]]()
+    labels: list[tuple[str, str]] = []
+    with open(path) as f:
         places: list[Place] = []
 
         for name, address, *dists in csv.reader(f, delimiter=';', quotechar='"'):
             place = Place(name, address)
             graph.add_vertex(place)
             places.append(place)
+            labels.append((name, address))
             for (i, dist) in enumerate(dists):
                 graph.add_edge(place, places[i], float(dist))
 
+    if cache_dir is not None:
+        network.save(compiled, labels, graph, csv_digest)
     return graph
 
 
-def schedule_delivery() -> tuple[HashMap[int, Package], list[Truck]]:
+def schedule_delivery(fleet: Optional[Iterable[Truck]] = None,
+                      route_improver: Optional[RouteImprover] = None,
+                      packages_path: str = 'packages.csv',
+                      distances_path: str = 'distances.csv',
+                      timings: Optional[dict[str, float]] = None,
+                      neighbors: int = 10,
+                      simulate: bool = False,
+                      package_ids: Optional[Iterable[int]] = None,
+                      seed: Optional[int] = None,
+                      candidates: int = 3,
+                      tolerance: float = 0.5,
+                      cache_dir: Optional[str] = None,
+                      event_log: Optional[EventLog] = None) -> Schedule:
     """
     The method responsible for figuring out how to best deliver the packages.
+    Every call parses its own files and builds its own trucks' state, so any
+    number of schedules can be built in one process. The returned Schedule
+    unpacks as `packages, trucks`
+
+    @param fleet The trucks to deliver the packages with, each carrying its
+    own capacity, speed and shift start. Defaults to two standard trucks
+    numbered 1 and 2
+    @param route_improver An optional stage, such as routing.improve_route,
+    that reorders every truck load before it departs. The miles it saves are
+    recorded per trip in Truck.trip_savings
+    @param packages_path The package file to schedule
+    @param distances_path The distance table between the places
+    @param timings If given, the seconds spent in each phase (parsing,
+    priority, distribution and dispatch) are added to it
+    @param neighbors The number of nearest places to index for every place,
+    nearest-package selection walks these before falling back to a full scan.
+    Zero disables the index
+    @param simulate Drive the trucks with the discrete-event simulation, so
+    trucks run in parallel and are reloaded as soon as they are back at the
+    hub, and address corrections take effect at the time they become known
+    @param package_ids Only schedule the packages with these IDs
+    @param seed Randomize the construction with this seed, each package is
+    picked out of the `candidates` closest ones that are at most `tolerance`
+    further than the closest one. See wgups.multistart
+    @param cache_dir Where to keep the compiled distance table, see
+    wgups.network. None parses the csv every time
+    @param event_log Where to write the events of the day, see
+    wgups.eventlog
 
     n = number of packages
     m = number of places
     Time complexity: O(m^2) + O(n)
     Space complexity: O(m^2) + O(n)
     """
-    global __ALL_TRUCKS__
-    global __ALL_PACKAGES__
-    global __GRAPH__
-    __ALL_TRUCKS__ = [Truck(), Truck()]
-    __ALL_PACKAGES__, destination_package_map = __parse_packages()  # O(n)
-    __GRAPH__ = __parse_distances()  # O(m^2)
-
-    # m is number of places, n is number of packages
-    # complexity to here -> O(m^2) + O(n)
-
-    # make sure all priority packages are fully delivered
-    priority_remaining = True
-    # time complexity of while block: O(n) + O(n) -> O(n)
-    while priority_remaining:
-        __deliver_priority_packages(destination_package_map)
-        if priority_remaining := any([not truck.empty() for truck in __ALL_TRUCKS__]):
-            __deliver_remaining_packages()
-
-    # continue delivering packages until none remain
-    remaining_package_count = sum(
-        map(lambda p: 0 if p[1].is_delivered() else 1, __ALL_PACKAGES__))
-    # time complexity of while block: O(n)
-    while remaining_package_count != 0:
-        remaining_package_count -= __deliver_remaining_packages()
-
-    return __ALL_PACKAGES__, __ALL_TRUCKS__
+    with timed(timings, 'parsing'):
+        packages, destinations, store = __parse_packages(
+            packages_path, package_ids)  # O(n)
+        graph = __parse_distances(distances_path, cache_dir)  # O(m^2)
+        neighbor_index = NeighborIndex(
+            graph, neighbors) if neighbors > 0 else None  # O(m^2 log k)
+
+    trucks = Truck.fleet(2) if fleet is None else list(fleet)
+    return Scheduler(graph, packages, destinations, trucks, neighbor_index,
+                     route_improver, timings, simulate, seed, candidates, tolerance, store,
+                     event_log).run()
+
+
+class Depot:
+    """
+    A hub with a fleet of its own. Truck numbers are unique over all depots,
+    so a package restricted to a truck belongs to the depot of that truck
+    """
+
+    def __init__(self, address: str = HUB, fleet: Optional[Iterable[Truck]] = None) -> None:
+        """
+        @param address The depot's address in the distance table
+        @param fleet The trucks of the depot, which are copied for every day.
+        Defaults to two standard trucks numbered 1 and 2
+        """
+        self.address = address
+        self.fleet = Truck.fleet(2) if fleet is None else list(fleet)
+
+    def trucks(self) -> list[Truck]:
+        """
+        Returns fresh trucks for a day, starting from this depot
+        """
+        return [Truck(t.number, t.max_capacity, t.speed, t.start, t.end, self.address)
+                for t in self.fleet]
+
+
+class Horizon:
+    """
+    The plan of several days and depots made in one run: a schedule per
+    depot for each day, and the packages each day carried over to the next
+    """
+
+    def __init__(self, depots: list[Depot]) -> None:
+        self.depots = depots
+        self.days: list[list[Schedule]] = []
+        self.carried: list[list[Package]] = []
+
+    def miles(self) -> float:
+        return sum(schedule.miles() for day in self.days for schedule in day)
+
+    def undelivered(self) -> list[Package]:
+        """
+        Returns the packages that weren't delivered by the last day
+        """
+        return self.carried[-1] if len(self.carried) != 0 else []
+
+    def summary(self) -> list[dict[str, Any]]:
+        """
+        Returns the figures of every day
+        """
+        return [{
+            'day': day,
+            'packages': sum(len(s.packages) for s in schedules),
+            'delivered': sum(len(s.packages) for s in schedules) - len(self.carried[day]),
+            'carried_over': len(self.carried[day]),
+            'miles': round(sum(s.miles() for s in schedules), 1),
+        } for (day, schedules) in enumerate(self.days)]
+
+
+def __depot_of(graph: DistanceMatrix[Union[Place, str]], depots: list[Depot],
+               owners: IntHashMap[int], group: list[Package]) -> int:
+    """
+    Returns the depot that delivers a group of packages: the depot of the
+    truck it's restricted to, otherwise the depot closest to its first package
+    """
+    for p in group:
+        if p.required_truck is not None:
+            if (depot := owners.get(p.required_truck)) is None:
+                raise Exception(f'package {p.id} is restricted to truck {p.required_truck}, '
+                                'which no depot has')
+            return depot
+    return graph.closest(group[0].address, [depot.address for depot in depots])
+
+
+def schedule_horizon(depots: Iterable[Depot], manifests: Sequence[str], days: int = 0,
+                     route_improver: Optional[RouteImprover] = None,
+                     distances_path: str = 'distances.csv',
+                     timings: Optional[dict[str, float]] = None,
+                     neighbors: int = 10,
+                     simulate: bool = False,
+                     cache_dir: Optional[str] = None) -> Horizon:
+    """
+    Plans several days of several depots in one run. The distance table and
+    the neighbor index are built once and shared by every depot and day,
+    only each day's manifest is parsed on its day
+
+    Every group of packages that must be delivered together is sent to one
+    depot, the depot of the truck it's restricted to or else the closest one,
+    and each depot is scheduled with its own fleet. A package that wasn't
+    delivered when the shifts of its depot's trucks ended is carried over to
+    the next day, where it's available from the start. The times of each day
+    are minutes after that day's midnight
+
+    @param depots The depots with their fleets, truck numbers must be unique
+    over all depots
+    @param manifests The package file of each day, package IDs must be unique
+    over all of them
+    @param days The number of days to plan, at least one per manifest. The
+    days without a manifest only deliver the packages carried over
+    @param route_improver, timings, neighbors, simulate, cache_dir See
+    schedule_delivery, the timings add up over every day and depot
+
+    n = number of packages
+    m = number of places
+    d = number of days
+    Time complexity: O(m^2) + O(d * n)
+    Space complexity: O(m^2) + O(n)
+    """
+    depots = list(depots)
+    with timed(timings, 'parsing'):
+        graph = __parse_distances(distances_path, cache_dir)  # O(m^2)
+        neighbor_index = NeighborIndex(
+            graph, neighbors) if neighbors > 0 else None  # O(m^2 log k)
+
+    # the depot of each truck number
+    owners = IntHashMap[int]()
+    for (i, depot) in enumerate(depots):
+        try:
+            graph.index_of(depot.address)
+        except KeyError:
+            raise Exception(f'unknown depot {depot.address}')
+        for truck in depot.fleet:
+            if owners.get(truck.number) is not None:
+                raise Exception(f'truck {truck.number} belongs to more than one depot')
+            owners.put(truck.number, i)
+
+    horizon = Horizon(depots)
+    carried: list[Package] = []
+    for day in range(max(days, len(manifests))):
+        with timed(timings, 'parsing'):
+            if day < len(manifests):
+                packages, _, store = __parse_packages(manifests[day])
+            else:
+                packages, store = IntHashMap[Package](), PackageStore()
+        # the packages carried over are copied, so the schedules of the days
+        # before keep theirs as they were at the end of their day. The copies
+        # are carried over before they're moved into the day's store, where
+        # their groups start from their carried over fields
+        copies = IntHashMap[Package](len(carried))
+        carried_store = PackageStore()
+        for p in carried:
+            if packages.get(p.id) is not None:
+                raise Exception(f'package {p.id} is in the manifests of more than one day')
+            copy = p.copy_to(carried_store)
+            copy.carry_over()
+            copy.move_to(store)
+            copies.put(p.id, copy)
+            packages.put(p.id, copy)
+        # and grouped anew with the copies of the packages they were grouped with
+        for p in carried:
+            copy = cast(Package, copies.get(p.id))
+            deps = copy.dependencies
+            for dep in list(deps):
+                if (dep_copy := copies.get(dep.id)) is not None:
+                    deps.discard(dep)
+                    deps.add(dep_copy)
+                    store.groups.join(store.group_elements[copy.row],
+                                      store.group_elements[dep_copy.row])
+
+        # the stores of the depots share the day's groups, which are sent to
+        # one depot as a whole
+        depot_packages = [IntHashMap[Package]() for _ in depots]
+        depot_stores = [PackageStore(store.groups) for _ in depots]
+        depot_destinations = [HashMap[str, list[Package]]() for _ in depots]
+        assigned = set[int]()
+        for p in list(store):
+            if p.id in assigned:
+                continue
+            group = p.group()
+            depot = __depot_of(graph, depots, owners, group)
+            for member in group:
+                assigned.add(member.id)
+                member.move_to(depot_stores[depot])
+                depot_packages[depot].put(member.id, member)
+                move_package(depot_destinations[depot], member)
+
+        schedules = [Scheduler(graph, depot_packages[i], depot_destinations[i], depot.trucks(),
+                               neighbor_index, route_improver, timings, simulate,
+                               store=depot_stores[i]).run()
+                     for (i, depot) in enumerate(depots)]
+        carried = [p for schedule in schedules for p in schedule.store if not p.is_delivered()]
+        horizon.days.append(schedules)
+        horizon.carried.append(carried)
+    return horizon
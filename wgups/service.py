@@ -0,0 +1,189 @@
+from __future__ import annotations
+import asyncio
+from bisect import bisect_right
+import json
+from typing import Any
+from urllib.parse import parse_qs, urlsplit
+from datastructures import IntHashMap
+from utils import clock_to_minutes, minutes_to_clock
+from wgups.package import Package
+from wgups.truck import Truck
+
+__REASONS__ = {200: 'OK', 400: 'Bad Request', 404: 'Not Found',
+               405: 'Method Not Allowed'}
+
+
+class TrackingService:
+    """
+    Answers the tracking queries of the command-line app over HTTP with JSON
+    bodies, so any number of clients can query one computed schedule at once:
+
+        GET /packages/<id>?time=HH:MM  a package's status, deadline, weight
+                                       and address (option 1)
+        GET /packages?time=HH:MM       the same for every package (options 2
+                                       and 3)
+        GET /trucks                    the miles each truck traveled (option 4)
+
+    The schedule doesn't change while the service runs, so a response only
+    depends on which of the package's load and delivery times (and the time
+    it arrives at the hub) the queried time has passed. Responses are cached
+    per such time bucket and every later query in the same bucket is answered
+    with the cached bytes
+
+    The service runs on a single asyncio event loop on localhost, a request
+    is answered without awaiting anything but the socket
+    """
+
+    def __init__(self, packages: IntHashMap[Package], trucks: list[Truck]) -> None:
+        """
+        Time complexity: O(n log n)
+        """
+        self.packages = packages
+        self.__sorted = sorted((p for (_, p) in packages), key=lambda p: p.id)
+        # the times at which each package's status changes, and those of all
+        # packages together
+        self.__changes = IntHashMap[list[float]](len(packages))
+        for p in self.__sorted:
+            self.__changes.put(p.id, sorted(self.__change_times(p)))
+        self.__all_changes = sorted(t for p in self.__sorted for t in self.__change_times(p))
+        self.__package_cache: dict[tuple[int, int], bytes] = {}
+        self.__all_cache: dict[int, bytes] = {}
+        self.__trucks = json.dumps({
+            'trucks': [{'number': t.number, 'miles': round(t.miles_traveled, 1)} for t in trucks],
+            'total_miles': round(sum(t.miles_traveled for t in trucks), 1),
+        }).encode()
+        self.hits = 0
+        self.misses = 0
+
+    def respond(self, method: str, target: str) -> tuple[int, bytes]:
+        """
+        Returns the status code and JSON body of the response to a request
+
+        Time complexity: O(log n) for a cached response, O(n) to build the
+        response for all packages
+        """
+        if method != 'GET':
+            return 405, self.__error('only GET is supported')
+        url = urlsplit(target)
+        parts = [part for part in url.path.split('/') if part != '']
+        if parts == ['trucks']:
+            return 200, self.__trucks
+        if len(parts) == 0 or parts[0] != 'packages' or len(parts) > 2:
+            return 404, self.__error(f'no such resource {url.path}')
+
+        query = parse_qs(url.query)
+        try:
+            time = clock_to_minutes(query['time'][0])
+        except Exception:
+            return 400, self.__error('the time must be given as ?time=HH:MM')
+
+        if len(parts) == 1:
+            bucket = bisect_right(self.__all_changes, time)
+            if (packages := self.__all_cache.get(bucket)) is None:
+                self.misses += 1
+                packages = self.__all_cache[bucket] = json.dumps(
+                    [self.__package_json(p, time) for p in self.__sorted]).encode()
+            else:
+                self.hits += 1
+            # the cached packages are shared by every time of the bucket
+            return 200, b'{"time": "%s", "packages": %s}' % (
+                minutes_to_clock(time).encode(), packages)
+
+        try:
+            package_id = int(parts[1])
+        except ValueError:
+            return 400, self.__error(f'invalid package ID {parts[1]}')
+        if (changes := self.__changes.get(package_id)) is None:
+            return 404, self.__error(f'package {package_id} was not found')
+        key = (package_id, bisect_right(changes, time))
+        if (body := self.__package_cache.get(key)) is None:
+            self.misses += 1
+            body = self.__package_cache[key] = json.dumps(self.__package_json(
+                self.packages.get(package_id), time)).encode()  # type: ignore
+        else:
+            self.hits += 1
+        return 200, body
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        Answers the requests of one connection, which is kept open between
+        requests unless the client asks to close it
+        """
+        try:
+            while len(request_line := await reader.readline()) != 0:
+                close = False
+                length = 0
+                while (line := await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    name, _, value = line.decode('latin-1').partition(':')
+                    name, value = name.strip().lower(), value.strip().lower()
+                    if name == 'connection':
+                        close = value == 'close'
+                    elif name == 'content-length':
+                        length = int(value)
+                if length != 0:
+                    await reader.readexactly(length)
+
+                request = request_line.decode('latin-1').split()
+                status, body = self.respond(request[0], request[1]) \
+                    if len(request) == 3 else (400, self.__error('malformed request line'))
+                writer.write(f'HTTP/1.1 {status} {__REASONS__[status]}\r\n'
+                             'Content-Type: application/json\r\n'
+                             f'Content-Length: {len(body)}\r\n'
+                             f'Connection: {"close" if close else "keep-alive"}\r\n\r\n'
+                             .encode('latin-1') + body)
+                await writer.drain()
+                if close:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def __change_times(package: Package) -> list[float]:
+        return [t for t in (package.available_at, package.loaded_at, package.delivered_at)
+                if t is not None]
+
+    @staticmethod
+    def __package_json(package: Package, time: int) -> dict[str, Any]:
+        """
+        The fields the command-line app prints for a package
+        """
+        return {
+            'id': package.id,
+            'status': package.status(time),
+            'deadline': package.formatted_deadline(),
+            'weight': package.mass,
+            'address': {'street': package.street_address, 'city': package.city,
+                        'state': package.state, 'zipcode': package.zipcode},
+        }
+
+    @staticmethod
+    def __error(message: str) -> bytes:
+        return json.dumps({'error': message}).encode()
+
+    async def start(self, host: str = '127.0.0.1', port: int = 8950) -> asyncio.AbstractServer:
+        """
+        Starts listening, port 0 picks a free port
+        """
+        return await asyncio.start_server(self.handle, host, port)
+
+
+def serve(packages: IntHashMap[Package], trucks: list[Truck], host: str = '127.0.0.1',
+          port: int = 8950) -> None:
+    """
+    Serves the schedule until interrupted
+    """
+    service = TrackingService(packages, trucks)
+
+    async def main() -> None:
+        server = await service.start(host, port)
+        for sock in server.sockets:
+            print(f'serving on http://{sock.getsockname()[0]}:{sock.getsockname()[1]}', flush=True)
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
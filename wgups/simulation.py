@@ -0,0 +1,114 @@
+from __future__ import annotations
+from enum import Enum, auto
+from itertools import count
+from typing import TYPE_CHECKING, Any, Callable, Union
+import heapq
+if TYPE_CHECKING:
+    from wgups.package import Package
+    from wgups.place import Place
+    from wgups.truck import Truck
+    from datastructures.graph import Graph
+
+
+class Simulation:
+    """
+    A discrete-event engine that advances trucks and packages in global time
+    order. Events are kept in a heap ordered by time, events at the same time
+    are processed in the order they were scheduled
+    """
+    class Event(Enum):
+        TRUCK_ARRIVES = auto()
+        TRUCK_RETURNS = auto()
+        PACKAGE_AVAILABLE = auto()
+        ADDRESS_CORRECTED = auto()
+
+    __queue: list[tuple[float, int, Simulation.Event, Any]]
+    __listeners: dict[Simulation.Event, list[Callable[..., None]]]
+
+    def __init__(self, graph: Graph[Union[Place, str]]) -> None:
+        self.__graph = graph
+        self.__queue = []
+        self.__sequence = count()
+        self.__listeners = {event: [] for event in self.Event}
+        self.time = 0.0
+        self.deliveries = 0
+
+    def on(self, event: Simulation.Event, listener: Callable[..., None]) -> None:
+        """
+        Registers a listener that is called with the event's subject, a truck
+        or a package, after the event was processed. Listeners of
+        ADDRESS_CORRECTED are also passed the address the package had before
+        """
+        self.__listeners[event].append(listener)
+
+    def schedule(self, time: float, event: Simulation.Event, subject: Any) -> None:
+        """
+        Time complexity: O(log e) for e pending events
+        """
+        heapq.heappush(self.__queue, (time, next(self.__sequence), event, subject))
+
+    def track(self, package: Package) -> None:
+        """
+        Schedules the events of a package that arrives late or whose correct
+        address only becomes known later in the day
+        """
+        if package.wrong_address:
+            self.schedule(package.available_at,
+                          self.Event.ADDRESS_CORRECTED, package)
+        elif package.available_at > 0:
+            self.schedule(package.available_at,
+                          self.Event.PACKAGE_AVAILABLE, package)
+
+    def dispatch(self, truck: Truck) -> None:
+        """
+        Sends a loaded truck out on its trip, its first arrival is scheduled
+        """
+        truck.depart()
+        self.__schedule_next_stop(truck)
+
+    def __schedule_next_stop(self, truck: Truck) -> None:
+        event = self.Event.TRUCK_ARRIVES if truck.has_next_delivery() else self.Event.TRUCK_RETURNS
+        arrival = truck.time_at(truck.miles_traveled +
+                                truck.miles_to_next_stop(self.__graph))
+        self.schedule(arrival, event, truck)
+
+    def pending(self) -> bool:
+        return len(self.__queue) != 0
+
+    def step(self) -> Simulation.Event:
+        """
+        Processes the next event and moves the clock to its time
+
+        Time complexity: O(log e) for e pending events
+        """
+        time, _, event, subject = heapq.heappop(self.__queue)
+        self.time = max(self.time, time)
+        details: tuple[Any, ...] = ()
+        if event == self.Event.TRUCK_ARRIVES:
+            subject.deliver_next(self.__graph)
+            self.deliveries += 1
+            self.__schedule_next_stop(subject)
+        elif event == self.Event.TRUCK_RETURNS:
+            subject.return_to_hub(self.__graph)
+        elif event == self.Event.ADDRESS_CORRECTED:
+            details = (subject.address,)
+            subject.update_address()
+        for listener in self.__listeners[event]:
+            listener(subject, *details)
+        return event
+
+    def run(self, until: float = float('inf'), stop_on_return: bool = False) -> int:
+        """
+        Processes events in time order until the next one lies past the given
+        time, or, if requested, until a truck is back at the hub. Returns the
+        number of packages delivered
+
+        Time complexity: O(e log e) for e processed events
+        """
+        delivered = self.deliveries
+        while len(self.__queue) != 0 and self.__queue[0][0] <= until:
+            if self.step() == self.Event.TRUCK_RETURNS and stop_on_return:
+                return self.deliveries - delivered
+        if until != float('inf'):
+            self.time = max(self.time, until)
+        return self.deliveries - delivered
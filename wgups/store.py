@@ -0,0 +1,523 @@
+from __future__ import annotations
+from array import array
+from itertools import compress, repeat
+from operator import eq
+from typing import TYPE_CHECKING, AbstractSet, Any, Callable, Iterable, Iterator, Optional, cast
+from datastructures import DisjointSet
+if TYPE_CHECKING:
+    from wgups.indexes import PackageIndex
+    from wgups.package import Package
+
+AT_HUB = 0
+EN_ROUTE = 1
+DELIVERED = 2
+# the sentinel of the time and truck columns for a value that isn't set
+UNSET = -1
+
+
+class PackageGroups(DisjointSet):
+    """
+    The groups of packages that must be delivered together, resolved with a
+    union-find as the "delivered with" notes are parsed. Each group keeps the
+    aggregates that decide whether it can be loaded: its earliest deadline,
+    the latest time any of its packages becomes available, the truck it's
+    restricted to and how many of its packages still have a wrong address, so
+    checking a package's group takes constant time instead of a walk over the
+    packages it's grouped with
+
+    The aggregates are only meaningful at the root of a group. A group can
+    span stores with groups of their own, like the chunks of a streamed
+    manifest. Then each of those groups holds every package of the group,
+    the ones of other stores as foreign elements, and link keeps them alike,
+    so a store only keeps the packages of other stores it's grouped with
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.deadlines = array('l')
+        self.available_at = array('d')
+        self.required_truck = array('l')
+        self.wrong_addresses = array('l')
+        self.__packages: list[Package] = []
+        # the packages of each group with more than one, by root
+        self.__members: dict[int, list[Package]] = {}
+        # the elements of the packages of stores with other groups
+        self.__foreign: dict[Package, int] = {}
+
+    def add_package(self, package: Package) -> int:
+        """
+        Adds the package in a group of its own and returns its element
+
+        Time complexity: O(1) amortized
+        """
+        element = self.add()
+        self.deadlines.append(package.deadline)
+        self.available_at.append(package.available_at)
+        self.required_truck.append(UNSET if package.required_truck is None
+                                   else package.required_truck)
+        self.wrong_addresses.append(1 if package.wrong_address else 0)
+        self.__packages.append(package)
+        return element
+
+    def element_of(self, package: Package) -> int:
+        """
+        Returns the package's element, a package of a store with other groups
+        is added as a foreign element the first time
+
+        Time complexity: O(1) amortized
+        """
+        if package.store.groups is self:
+            return package.store.group_elements[package.row]
+        if (element := self.__foreign.get(package)) is None:
+            element = self.__foreign[package] = self.add_package(package)
+        return element
+
+    @staticmethod
+    def holders(packages: Iterable[Package]) -> list[PackageGroups]:
+        """
+        Returns the groups of the packages' stores, each once
+        """
+        holders: dict[int, PackageGroups] = {}
+        for package in packages:
+            holders.setdefault(id(package.store.groups), package.store.groups)
+        return list(holders.values())
+
+    @staticmethod
+    def link(a: Package, b: Package) -> None:
+        """
+        Joins the groups of two packages. The packages of the joined group are
+        joined in the groups of every store holding one of them, so the group
+        reads the same from each
+
+        Time complexity: O(g * h) for g packages in the joined group and h
+        stores holding them
+        """
+        members = list({p: None for p in a.group() + b.group()})
+        for groups in PackageGroups.holders(members):
+            elements = [groups.element_of(p) for p in members]
+            for element in elements[1:]:
+                groups.join(elements[0], element)
+
+    def join(self, a: int, b: int) -> int:
+        """
+        Joins the groups of the two elements and combines their aggregates.
+        Raises if the groups are restricted to different trucks, as no truck
+        could deliver them together
+
+        Time complexity: O(α(n) + s) for s packages in the smaller group
+        """
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return a
+        trucks = set(self.required_truck[r] for r in (a, b)) - {UNSET}
+        if len(trucks) > 1:
+            raise Exception(f'packages {self.__packages[a].id} and {self.__packages[b].id} must be '
+                            'delivered together but are restricted to different trucks')
+        root = self.union(a, b)
+        other = b if root == a else a
+        self.deadlines[root] = min(self.deadlines[a], self.deadlines[b])
+        self.available_at[root] = max(self.available_at[a], self.available_at[b])
+        self.required_truck[root] = trucks.pop() if len(trucks) != 0 else UNSET
+        self.wrong_addresses[root] += self.wrong_addresses[other]
+        members = self.__members.pop(root, None) or [self.__packages[root]]
+        members.extend(self.__members.pop(other, None) or [self.__packages[other]])
+        self.__members[root] = members
+        return root
+
+    def members(self, element: int) -> list[Package]:
+        """
+        Returns the packages in the element's group
+
+        Time complexity: O(α(n))
+        """
+        root = self.find(element)
+        return self.__members.get(root) or [self.__packages[root]]
+
+    def copy(self) -> PackageGroups:
+        """
+        Returns a copy of the groups and their aggregates, holding the same
+        packages
+
+        Time complexity: O(n)
+        """
+        copy = cast(PackageGroups, super().copy())
+        copy.deadlines = self.deadlines[:]
+        copy.available_at = self.available_at[:]
+        copy.required_truck = self.required_truck[:]
+        copy.wrong_addresses = self.wrong_addresses[:]
+        copy.__packages = list(self.__packages)
+        copy.__members = {root: list(members) for (root, members) in self.__members.items()}
+        copy.__foreign = dict(self.__foreign)
+        return copy
+
+    def copy_with(self, packages: list[Package]) -> PackageGroups:
+        """
+        Returns a copy of the groups whose packages are the given ones, the
+        package at each element replacing the one there
+
+        Time complexity: O(n)
+        """
+        copy = self.copy()
+        copy.__packages = list(packages)
+        copy.__foreign = {}
+        copy.__members = {root: [packages[m.store.group_elements[m.row]] for m in members]
+                          for (root, members) in self.__members.items()}
+        return copy
+
+    def delay(self, element: int, until: float) -> None:
+        root = self.find(element)
+        self.available_at[root] = max(self.available_at[root], until)
+
+    def address_corrected(self, element: int) -> None:
+        self.wrong_addresses[self.find(element)] -= 1
+
+
+class PackageStore:
+    """
+    Holds the fields of many packages in columns of typed arrays, one row per
+    package, so a package costs a few machine words per field instead of a
+    full object. Strings are interned into a table that the string columns
+    index into. Package objects are views over one row each, there is exactly
+    one view per row so views can be compared and hashed like packages
+
+    The scans the scheduler runs over every package are methods that loop over
+    the columns at C speed, without touching the views
+    """
+    __NUMERIC__ = ['ids', 'deadlines', 'masses', 'statuses', 'available_at', 'loaded_at',
+                   'delivered_at', 'required_truck', 'delivered_by', 'delivery_numbers',
+                   'wrong_address', 'group_elements']
+    __STRINGS__ = ['addresses', 'streets', 'cities', 'states', 'zipcodes']
+    __OPTIONAL__ = ['loaded_at', 'delivered_at', 'required_truck', 'delivered_by']
+
+    def __init__(self, groups: Optional[PackageGroups] = None) -> None:
+        """
+        @param groups The groups the packages are added to, a store has groups
+        of its own if none are given
+        """
+        self.groups = PackageGroups() if groups is None else groups
+        self.ids = array('q')
+        self.deadlines = array('l')
+        self.masses = array('l')
+        self.statuses = array('b')
+        self.available_at = array('d')
+        self.loaded_at = array('d')
+        self.delivered_at = array('d')
+        self.required_truck = array('l')
+        self.delivered_by = array('l')
+        self.delivery_numbers = array('l')
+        self.wrong_address = array('b')
+        # the element of each package in the groups
+        self.group_elements = array('q')
+        # indexes into the string table
+        self.addresses = array('l')
+        self.streets = array('l')
+        self.cities = array('l')
+        self.states = array('l')
+        self.zipcodes = array('l')
+        self.strings: list[str] = []
+        self.__interned: dict[str, int] = {}
+        # most packages aren't grouped with others, so the sets are only kept
+        # for those that are
+        self.dependencies: dict[int, set[Package]] = {}
+        self.dependent_packages: dict[int, AbstractSet[int]] = {}
+        self.__views: list[Package] = []
+        # called with the row of every package that changed, see changed
+        self.__listeners: list[Callable[[int], None]] = []
+        # the index listening to the store, see PackageIndex.of
+        self.index: Optional[PackageIndex] = None
+        # the value of each column in a new row
+        self.__defaults = [(getattr(self, name), UNSET if name in self.__OPTIONAL__ else 0)
+                           for name in self.__NUMERIC__ + self.__STRINGS__]
+
+    @staticmethod
+    def of(packages: Iterable[tuple[int, Package]]) -> PackageStore:
+        """
+        Returns the store holding the rows of exactly the given packages, which
+        is an empty store if there are none
+
+        Time complexity: O(n)
+        """
+        stores = set(id(p.store) for (_, p) in packages)
+        if len(stores) == 0:
+            return PackageStore()
+        store = next(iter(packages))[1].store
+        if len(stores) != 1 or len(store) != sum(1 for _ in packages):
+            raise Exception('the packages are not the rows of one store')
+        return store
+
+    def __len__(self) -> int:
+        return len(self.__views)
+
+    def on_change(self, listener: Callable[[int], None]) -> None:
+        """
+        Registers a listener that is called with the row of every package that
+        was added to the store, or whose address or status changed, and with
+        the rows that restore removed
+        """
+        self.__listeners.append(listener)
+
+    def changed(self, row: int) -> None:
+        for listener in self.__listeners:
+            listener(row)
+
+    def __iter__(self) -> Iterator[Package]:
+        return iter(self.__views)
+
+    def view(self, row: int) -> Package:
+        return self.__views[row]
+
+    def views(self, rows: list[int]) -> list[Package]:
+        views = self.__views
+        return [views[row] for row in rows]
+
+    def intern(self, string: str) -> int:
+        """
+        Returns the index of the string in the string table, adding it if it's
+        new
+
+        Time complexity: O(1) amortized
+        """
+        if (index := self.__interned.get(string)) is None:
+            index = self.__interned[string] = len(self.strings)
+            self.strings.append(string)
+        return index
+
+    def append(self, package: Package) -> int:
+        """
+        Adds an empty row viewed by the package and returns its index. The
+        columns grow by doubling, so they may be longer than the number of rows
+
+        Time complexity: O(1) amortized
+        """
+        row = len(self.__views)
+        if row == len(self.ids):
+            for (column, default) in self.__defaults:
+                column.extend(array(column.typecode, [default]) * max(16, row))
+        self.__views.append(package)
+        return row
+
+    def copy_row(self, source: PackageStore, row: int, package: Package) -> int:
+        """
+        Copies a row of another store into a new row of this one, viewed by the
+        package. If the stores don't share their groups, the package starts a
+        group of its own in this store's
+
+        Time complexity: O(1) amortized
+        """
+        new_row = self.append(package)
+        for name in self.__NUMERIC__:
+            getattr(self, name)[new_row] = getattr(source, name)[row]
+        if source.groups is not self.groups:
+            self.group_elements[new_row] = self.groups.add_package(package)
+        for name in self.__STRINGS__:
+            getattr(self, name)[new_row] = self.intern(
+                source.strings[getattr(source, name)[row]])
+        if (deps := source.dependencies.get(row)) is not None:
+            self.dependencies[new_row] = set(deps)
+        if (dependents := source.dependent_packages.get(row)) is not None:
+            self.dependent_packages[new_row] = dependents
+        self.changed(new_row)
+        return new_row
+
+    def record(self, row: int) -> dict[str, Any]:
+        """
+        Returns the fields of a row keyed by their column, with the strings
+        instead of their indexes and the IDs of the packages it is delivered
+        with, so the row can be written out and read back by from_records
+
+        Time complexity: O(f + d) for f fields and d packages it's grouped with
+        """
+        record: dict[str, Any] = {name: getattr(self, name)[row] for name in self.__NUMERIC__
+                                  if name != 'group_elements'}
+        for name in self.__STRINGS__:
+            record[name] = self.strings[getattr(self, name)[row]]
+        record['dependent_packages'] = sorted(self.dependent_packages.get(row, ()))
+        record['dependencies'] = sorted(p.id for p in self.dependencies.get(row, ()))
+        return record
+
+    @staticmethod
+    def from_records(records: Iterable[dict[str, Any]]) -> PackageStore:
+        """
+        Builds a store of the records returned by record, in the given order.
+        Packages that were delivered with each other are grouped again
+
+        Time complexity: O(n)
+        """
+        from wgups.package import Package
+        records = list(records)
+        store = PackageStore()
+        rows: dict[int, int] = {}
+        for record in records:
+            row = len(store)
+            package = Package.view_of(store, row)
+            store.append(package)
+            for name in store.__NUMERIC__:
+                if name != 'group_elements':
+                    getattr(store, name)[row] = record[name]
+            for name in store.__STRINGS__:
+                getattr(store, name)[row] = store.intern(record[name])
+            if len(record['dependent_packages']) != 0:
+                store.dependent_packages[row] = set(record['dependent_packages'])
+            store.group_elements[row] = store.groups.add_package(package)
+            rows[store.ids[row]] = row
+        for (row, record) in enumerate(records):
+            for other in record['dependencies']:
+                if other > store.ids[row]:
+                    store.view(row).deliver_with(store.view(rows[other]))
+        return store
+
+    def copy(self) -> PackageStore:
+        """
+        Returns a store with copies of the rows and views of its own, the
+        packages are grouped in groups of its own too. Groups that hold exactly
+        the rows of this store are copied, otherwise the packages are grouped
+        again, and only with the packages that are rows of this store
+
+        Time complexity: O(n)
+        """
+        from wgups.package import Package
+        store = PackageStore()
+        for name in self.__NUMERIC__ + self.__STRINGS__:
+            getattr(store, name).extend(getattr(self, name))
+        store.strings = list(self.strings)
+        store.__interned = dict(self.__interned)
+        views = store.__views = [Package.view_of(store, row) for row in range(len(self))]
+        store.dependent_packages = dict(self.dependent_packages)
+        if len(self.groups) == len(self) and \
+                self.group_elements[:len(self)] == array('q', range(len(self))):
+            store.groups = self.groups.copy_with(views)
+            store.dependencies = {row: {views[p.row] for p in deps}
+                                  for (row, deps) in self.dependencies.items()}
+            return store
+
+        for package in views:
+            store.group_elements[package.row] = store.groups.add_package(package)
+        for (row, deps) in self.dependencies.items():
+            for other in deps:
+                if other.store is self and other.row > row:
+                    store.view(row).deliver_with(store.view(other.row))
+        return store
+
+    def snapshot(self) -> tuple[Any, ...]:
+        """
+        Returns the rows, groups and string table of the store as they are,
+        for restore to put back
+
+        Time complexity: O(n)
+        """
+        columns = [getattr(self, name)[:len(self)] for name in self.__NUMERIC__ + self.__STRINGS__]
+        return (len(self), columns, len(self.strings), {row: set(deps) for (row, deps) in self.dependencies.items()},
+                dict(self.dependent_packages), self.groups.copy())
+
+    def restore(self, snapshot: tuple[Any, ...]) -> None:
+        """
+        Puts the store back as it was when the snapshot was taken, the views
+        keep viewing their rows. The rows added since are removed, their views
+        are moved to stores of their own. The groups are put back too, so the
+        store must have groups of its own
+
+        Time complexity: O(n)
+        """
+        rows, columns, strings, dependencies, dependent_packages, groups = snapshot
+        for view in self.__views[rows:]:
+            view.move_to(PackageStore())
+        removed = len(self.__views)
+        del self.__views[rows:]
+        for row in reversed(range(rows, removed)):
+            self.changed(row)
+        for (name, column) in zip(self.__NUMERIC__ + self.__STRINGS__, columns):
+            getattr(self, name)[:rows] = column
+        for string in self.strings[strings:]:
+            del self.__interned[string]
+        del self.strings[strings:]
+        self.dependencies = {row: set(deps) for (row, deps) in dependencies.items()}
+        self.dependent_packages = dict(dependent_packages)
+        self.groups = groups.copy()
+        for row in range(rows):
+            self.changed(row)
+
+    def __getstate__(self) -> dict[str, Any]:
+        """
+        Pickles the rows as plain columns, the packages a row is delivered with
+        by their rows. The groups aren't pickled, they are built again from
+        those packages when the store is unpickled, so only the packages of
+        this store can be grouped
+
+        Time complexity: O(n)
+        """
+        dependencies: dict[int, list[int]] = {}
+        for (row, deps) in self.dependencies.items():
+            if any(p.store is not self for p in deps):
+                raise Exception('a store grouping packages of other stores can\'t be pickled')
+            dependencies[row] = sorted(p.row for p in deps)
+        return {
+            'columns': {name: getattr(self, name)[:len(self)]
+                        for name in self.__NUMERIC__ + self.__STRINGS__},
+            'strings': self.strings,
+            'dependencies': dependencies,
+            'dependent_packages': self.dependent_packages,
+        }
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        """
+        Time complexity: O(n)
+        """
+        from wgups.package import Package
+        self.__init__()  # type: ignore
+        for (name, column) in state['columns'].items():
+            getattr(self, name).extend(column)
+        self.strings = state['strings']
+        self.__interned = {string: index for (index, string) in enumerate(self.strings)}
+        self.dependent_packages = state['dependent_packages']
+        views = self.__views = [Package.view_of(self, row) for row in range(len(self.ids))]
+        for package in views:
+            self.group_elements[package.row] = self.groups.add_package(package)
+        for (row, deps) in state['dependencies'].items():
+            self.dependencies[row] = set(views[other] for other in deps)
+            for other in deps:
+                self.groups.join(self.group_elements[row], self.group_elements[other])
+
+    def with_status(self, status: int) -> list[int]:
+        """
+        Returns the rows of the packages with the given status code
+
+        Time complexity: O(n)
+        """
+        return list(compress(range(len(self)), map(eq, self.statuses, repeat(status))))
+
+    def at_hub_before(self, deadline: float) -> list[int]:
+        """
+        Returns the rows of the packages at the hub that are due before the
+        deadline
+
+        Time complexity: O(n)
+        """
+        deadlines = self.deadlines
+        return [row for row in self.with_status(AT_HUB) if deadlines[row] < deadline]
+
+    def undelivered(self) -> int:
+        """
+        Returns the number of packages that weren't delivered
+
+        Time complexity: O(n)
+        """
+        return len(self) - self.statuses.count(DELIVERED)
+
+    def next_available(self, after: float) -> Optional[float]:
+        """
+        Returns the earliest time after the given one at which a package at the
+        hub becomes available
+
+        Time complexity: O(n)
+        """
+        available_at = self.available_at
+        return min((time for time in map(available_at.__getitem__, self.with_status(AT_HUB))
+                    if time > after), default=None)
+
+    def with_wrong_address(self) -> list[int]:
+        """
+        Returns the rows of the packages whose correct address isn't known yet
+
+        Time complexity: O(n)
+        """
+        return list(compress(range(len(self)), self.wrong_address))
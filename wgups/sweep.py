@@ -0,0 +1,101 @@
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+from typing import Any, Iterable, Optional
+from utils import minutes_to_clock
+from wgups.schedule import schedule_delivery
+from wgups.truck import Truck
+
+
+class Scenario:
+    """
+    One what-if schedule: a fleet, the time it departs and the packages it has
+    to deliver. Scenarios are sent to worker processes, so they only hold
+    plain values
+    """
+
+    def __init__(self, name: str, trucks: int = 2, capacity: int = 16, speed: float = 18,
+                 start: float = 8 * 60, package_ids: Optional[Iterable[int]] = None,
+                 packages_path: str = 'packages.csv', distances_path: str = 'distances.csv',
+                 simulate: bool = False) -> None:
+        """
+        @param name The label of the scenario in the comparison table
+        @param trucks The number of identical trucks, numbered from 1
+        @param start The departure time of every truck in minutes after midnight
+        @param package_ids Only schedule these packages, defaults to all of them
+        """
+        self.name = name
+        self.trucks = trucks
+        self.capacity = capacity
+        self.speed = speed
+        self.start = start
+        self.package_ids = None if package_ids is None else sorted(package_ids)
+        self.packages_path = packages_path
+        self.distances_path = distances_path
+        self.simulate = simulate
+
+
+def run_scenario(scenario: Scenario) -> dict[str, Any]:
+    """
+    Schedules a single scenario and returns its summary. A scenario that
+    can't be scheduled is reported with its error instead of aborting the
+    sweep
+    """
+    result: dict[str, Any] = {'scenario': scenario.name}
+    try:
+        schedule = schedule_delivery(Truck.fleet(scenario.trucks, scenario.capacity,
+                                                 scenario.speed, scenario.start),
+                                     packages_path=scenario.packages_path,
+                                     distances_path=scenario.distances_path,
+                                     simulate=scenario.simulate,
+                                     package_ids=scenario.package_ids)
+    except Exception as e:
+        result['error'] = str(e) or type(e).__name__
+        return result
+    result.update(schedule.summary())
+    return result
+
+
+def grid(fleet_sizes: Iterable[int], starts: Iterable[float],
+         package_subsets: Optional[dict[str, Optional[Iterable[int]]]] = None,
+         **options: Any) -> list[Scenario]:
+    """
+    Returns a scenario for every combination of fleet size, departure time
+    and named package subset. Any other Scenario option applies to all of them
+    """
+    subsets = package_subsets or {'all': None}
+    return [Scenario(f'{trucks} trucks @ {minutes_to_clock(start)}, {subset}', trucks,
+                     start=start, package_ids=ids, **options)
+            for (trucks, start, (subset, ids)) in product(fleet_sizes, starts, subsets.items())]
+
+
+def sweep(scenarios: Iterable[Scenario], workers: Optional[int] = None) -> list[dict[str, Any]]:
+    """
+    Schedules every scenario across a pool of worker processes and returns
+    their summaries in the order the scenarios were given
+
+    @param workers The number of processes, defaults to the number of CPUs
+    """
+    with ProcessPoolExecutor(workers) as executor:
+        return list(executor.map(run_scenario, scenarios))
+
+
+def format_table(results: list[dict[str, Any]]) -> str:
+    """
+    Formats the summaries of a sweep as an aligned text table
+    """
+    columns = ['scenario', 'trucks', 'packages', 'miles', 'late', 'finished_at']
+    rows = [columns]
+    for result in results:
+        if 'error' in result:
+            rows.append([result['scenario'], f'error: {result["error"]}'])
+            continue
+        finished_at = result['finished_at']
+        rows.append([result['scenario'], str(result['trucks']), str(result['packages']),
+                     f'{result["miles"]:.1f}', str(result['late']),
+                     '-' if finished_at is None else minutes_to_clock(finished_at)])
+    # an error spans the remaining columns, so it doesn't widen any of them
+    widths = [max(len(row[i]) for row in rows if i < len(row) and (i == 0 or len(row) == len(columns)))
+              for i in range(len(columns))]
+    return '\n'.join('  '.join(cell.ljust(width) for (cell, width) in zip(row, widths)).rstrip()
+                     for row in rows)
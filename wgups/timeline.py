@@ -0,0 +1,126 @@
+from __future__ import annotations
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Iterable
+from wgups.package import Package
+
+Status = Package.Status
+__STATUSES__ = [Status.AT_HUB, Status.EN_ROUTE, Status.DELIVERED]
+
+
+class StatusTimeline:
+    """
+    An index over the load and delivery times of every package of a computed
+    schedule. The times are kept in typed arrays, both per package and sorted,
+    so the state of the whole day at any time is answered with comparisons and
+    binary searches instead of asking every package for its status.
+    """
+
+    def __init__(self, packages: Iterable[Package]) -> None:
+        """
+        Time complexity: O(n log n)
+        Space complexity: O(n)
+        """
+        inf = float('inf')
+        self.packages = sorted(packages, key=lambda p: p.id)
+        self.ids = array('q', (p.id for p in self.packages))
+        self.loaded_at = array('d', (inf if p.loaded_at is None else p.loaded_at
+                                     for p in self.packages))
+        self.delivered_at = array('d', (inf if p.delivered_at is None else p.delivered_at
+                                        for p in self.packages))
+        self.__sorted_loaded = array('d', sorted(self.loaded_at))
+        self.__sorted_delivered = array('d', sorted(self.delivered_at))
+        # every status change of the day, ordered by time
+        events = sorted([(t, i, 1) for (i, t) in enumerate(self.loaded_at) if t != inf] +
+                        [(t, i, 2) for (i, t) in enumerate(self.delivered_at) if t != inf])
+        self.__event_times = array('d', (t for (t, _, _) in events))
+        self.__event_packages = array('q', (i for (_, i, _) in events))
+        self.__info = [dict[tuple[int, bool], str]() for _ in self.packages]
+
+    def __len__(self) -> int:
+        return len(self.packages)
+
+    def __code_at(self, i: int, time: float) -> int:
+        if self.delivered_at[i] <= time:
+            return 2
+        if self.loaded_at[i] <= time:
+            return 1
+        return 0
+
+    def status_of(self, package_id: int, time: float) -> Package.Status:
+        """
+        Returns the status of a single package at the given time
+
+        Time complexity: O(log n)
+        """
+        return __STATUSES__[self.__code_at(self.index_of(package_id), time)]
+
+    def status_at(self, time: float) -> list[Package.Status]:
+        """
+        Returns the status of every package at the given time, ordered by ID
+
+        Time complexity: O(n)
+        """
+        return [__STATUSES__[(d <= time) + (l <= time)]
+                for (l, d) in zip(self.loaded_at, self.delivered_at)]
+
+    def counts_at(self, time: float) -> dict[Package.Status, int]:
+        """
+        Returns the number of packages in each status at the given time
+
+        Time complexity: O(log n)
+        """
+        loaded = bisect_right(self.__sorted_loaded, time)
+        delivered = bisect_right(self.__sorted_delivered, time)
+        return {
+            Status.AT_HUB: len(self.packages) - loaded,
+            Status.EN_ROUTE: loaded - delivered,
+            Status.DELIVERED: delivered,
+        }
+
+    def changes_between(self, start: float, end: float) -> list[tuple[int, Package.Status, Package.Status]]:
+        """
+        Returns the (id, status at start, status at end) of every package whose
+        status changed after the start and up to and including the end, ordered
+        by ID
+
+        Time complexity: O(log n + c log c) for c changes
+        """
+        first = bisect_right(self.__event_times, start)
+        last = bisect_right(self.__event_times, end)
+        changed = sorted(set(self.__event_packages[first:last]))
+        return [(self.ids[i], __STATUSES__[self.__code_at(i, start)],
+                 __STATUSES__[self.__code_at(i, end)]) for i in changed]
+
+    def info_of(self, i: int, time: float, color: bool = True) -> str:
+        """
+        Returns Package.info for the package at position i of the timeline. A
+        package's info only depends on its status, so it is rendered at most
+        once per status and reused for every later time
+
+        Time complexity: O(1) amortized
+        """
+        key = (self.__code_at(i, time), color)
+        if (line := self.__info[i].get(key)) is None:
+            line = self.__info[i][key] = self.packages[i].info(
+                int(time), color)
+        return line
+
+    def info_at(self, time: float, color: bool = True) -> list[str]:
+        """
+        Returns Package.info for every package at the given time, ordered by ID
+
+        Time complexity: O(n)
+        """
+        return [self.info_of(i, time, color) for i in range(len(self.packages))]
+
+    def index_of(self, package_id: int) -> int:
+        """
+        Returns the position of the package in the timeline
+
+        Time complexity: O(log n)
+        """
+        i = bisect_left(self.ids, package_id)
+        if i == len(self.ids) or self.ids[i] != package_id:
+            raise KeyError(package_id)
+        return i
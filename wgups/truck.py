@@ -1,54 +1,240 @@
 from __future__ import annotations
-from typing import TYPE_CHECKING, Union
+from typing import TYPE_CHECKING, Any, Optional, Union, cast
 from utils import debug, minutes_to_clock
 if TYPE_CHECKING:
     from wgups.place import Place
     from wgups.package import Package
     from datastructures.graph import Graph
 
+# the address of the default depot in the distance table
+HUB = 'HUB'
 
-class Truck:
-    __number = 0
 
-    @staticmethod
-    def __get_number() -> int:
-        Truck.__number += 1
-        return Truck.__number
+class Trip:
+    """
+    The record of one round trip of a truck from the hub
+    """
+    returned_at: Optional[float] = None
+    end_miles: Optional[float] = None
 
-    @staticmethod
-    def __calc_time(time: float) -> float:
-        return (8 * 60) + (time / 18 * 60)
+    def __init__(self, truck: int, number: int, departed_at: float, start_miles: float,
+                 packages: list[Package]) -> None:
+        """
+        @param number The truck's count of trips when it departed
+        """
+        self.truck = truck
+        self.number = number
+        self.departed_at = departed_at
+        self.start_miles = start_miles
+        self.packages = list(packages)
+
+    def miles(self) -> float:
+        return (self.end_miles or self.start_miles) - self.start_miles
+
+    def key(self) -> tuple[int, float, tuple[int, ...]]:
+        """
+        Identifies the trip by its truck, departure and delivery order
+        """
+        return self.truck, self.departed_at, tuple(p.id for p in self.packages)
+
+
+class Truck:
+    def __calc_time(self, miles: float) -> float:
+        return self.start + self.idle_minutes + (miles / self.speed * 60)
 
     miles_traveled: float = 0
+    # minutes spent waiting at the hub for packages to become available
+    idle_minutes: float = 0
     packages: list[Package]
     number: int
     deliveries_performed = 0
+    # miles saved on each trip by the route improvement stage, if it ran
+    trip_savings: list[float]
+    # every trip that delivered packages, in the order they departed
+    trips: list[Trip]
+    # a truck out of service isn't loaded again
+    in_service = True
+    # the position of the next package to deliver while the truck is out on a
+    # trip, None while it is at the hub
+    __next_stop: Optional[int] = None
 
-    def __init__(self) -> None:
-        self.number = self.__get_number()
+    def __init__(self, number: int, capacity: int = 16, speed: float = 18,
+                 start: float = 8 * 60, end: float = float('inf'), depot: str = HUB) -> None:
+        """
+        @param number The truck number, packages restricted to a truck refer to
+        it by this number
+        @param capacity The number of packages the truck can carry
+        @param speed The average speed of the truck in miles per hour
+        @param start The start of the truck's shift in minutes after midnight
+        @param end The end of the truck's shift, it isn't loaded for another
+        trip after that time
+        @param depot The address of the depot the truck's trips start and end
+        at
+        """
+        self.number = number
+        self.max_capacity = capacity
+        self.speed = speed
+        self.start = start
+        self.end = end
+        self.depot = depot
         self.packages = []
+        self.trip_savings = []
+        self.trips = []
+
+    @staticmethod
+    def fleet(count: int, capacity: int = 16, speed: float = 18, start: float = 8 * 60,
+              end: float = float('inf'), depot: str = HUB, first: int = 1) -> list[Truck]:
+        """
+        Returns the given number of identical trucks, numbered from the first
+        """
+        return [Truck(n, capacity, speed, start, end, depot) for n in range(first, first + count)]
+
+    @property
+    def en_route(self) -> bool:
+        return self.__next_stop is not None
 
     def load_package(self, package: Package) -> None:
-        if self.full():
+        if self.full() or self.en_route:
             raise Exception
 
         package.set_en_route(self)
         self.packages.append(package)
 
+    def on_shift(self) -> bool:
+        """
+        Whether the truck's shift hasn't ended, so it can be loaded again
+        """
+        return self.get_time() < self.end
+
     def capacity(self) -> int:
-        return 16 - len(self.packages)
+        return self.max_capacity - len(self.packages)
 
     def get_time(self) -> float:
         return self.__calc_time(self.miles_traveled)
 
+    def wait_until(self, time: float) -> None:
+        """
+        Idles the truck at the hub until the given time
+        """
+        if time > self.get_time():
+            self.idle_minutes += time - self.get_time()
+
+    def time_at(self, miles: float) -> float:
+        """
+        Returns the time of day at which the truck's odometer reads the given
+        miles
+        """
+        return self.__calc_time(miles)
+
     def empty(self) -> bool:
         return len(self.packages) == 0
 
     def full(self) -> bool:
-        return len(self.packages) == 16
+        return len(self.packages) >= self.max_capacity
 
     def location(self) -> str:
-        return 'HUB' if self.empty() else self.packages[-1].address
+        return self.depot if self.empty() else self.packages[-1].address
+
+    def depart(self) -> None:
+        """
+        Starts a trip delivering the loaded packages
+        """
+        if self.en_route:
+            raise Exception
+        self.deliveries_performed += 1
+        self.__next_stop = 0
+        if not self.empty():
+            self.trips.append(Trip(self.number, self.deliveries_performed, self.get_time(),
+                                   self.miles_traveled, self.packages))
+
+    def has_next_delivery(self) -> bool:
+        return self.__next_stop is not None and self.__next_stop < len(self.packages)
+
+    def current_stop(self) -> str:
+        """
+        Returns the address the truck is at while on a trip
+        """
+        if not self.__next_stop:
+            return self.depot
+        return self.packages[self.__next_stop - 1].address
+
+    def miles_to_next_stop(self, graph: Graph[Union[Place, str]]) -> float:
+        """
+        Returns the distance to the next package's address, or to the depot
+        once every package was delivered
+        """
+        destination = self.packages[cast(int, self.__next_stop)].address \
+            if self.has_next_delivery() else self.depot
+        return graph.distance_between(self.current_stop(), destination)
+
+    def deliver_next(self, graph: Graph[Union[Place, str]]) -> Package:
+        """
+        Drives to the next package's address and delivers it
+        """
+        self.miles_traveled += self.miles_to_next_stop(graph)
+        pkg = self.packages[cast(int, self.__next_stop)]
+        self.__next_stop = cast(int, self.__next_stop) + 1
+        pkg.set_delivered(self)
+        debug(lambda: f'truck {self.number} delivered package {pkg.id} '
+              f'at {minutes_to_clock(cast(float, pkg.delivered_at))} to address {pkg.address} '
+              f'after {round(self.miles_traveled, 1)} miles')
+        return pkg
+
+    def return_to_hub(self, graph: Graph[Union[Place, str]]) -> None:
+        """
+        Drives back to the hub, ending the trip
+        """
+        self.miles_traveled += self.miles_to_next_stop(graph)
+        if not self.empty():
+            self.trips[-1].end_miles = self.miles_traveled
+            self.trips[-1].returned_at = self.get_time()
+        self.packages.clear()
+        self.__next_stop = None
+        debug('returned to %s with %s miles on the odo', self.depot,
+              round(self.miles_traveled, 1))
+
+    def rewind(self, trips: int) -> list[Trip]:
+        """
+        Puts the truck back at the hub as it was after its first trips, the
+        later trips are dropped from its records and returned. The packages of
+        the dropped trips are left as they are
+        """
+        if self.en_route:
+            raise Exception
+        dropped = self.trips[trips:]
+        del self.trips[trips:]
+        del self.trip_savings[trips:]
+        if len(self.trips) == 0:
+            self.miles_traveled = 0
+            self.idle_minutes = 0
+            self.deliveries_performed = 0
+        else:
+            last = self.trips[-1]
+            self.miles_traveled = cast(float, last.end_miles)
+            self.idle_minutes = 0
+            self.idle_minutes = cast(float, last.returned_at) - self.get_time()
+            self.deliveries_performed = last.number
+        return dropped
+
+    def snapshot(self) -> tuple[Any, ...]:
+        """
+        Returns the records of the truck at the hub, for restore to put back
+        """
+        if self.en_route:
+            raise Exception
+        return (self.trips[:], self.trip_savings[:], self.miles_traveled, self.idle_minutes,
+                self.deliveries_performed, self.in_service)
+
+    def restore(self, snapshot: tuple[Any, ...]) -> None:
+        """
+        Puts the truck back at the hub with the records of the snapshot
+        """
+        trips, trip_savings, self.miles_traveled, self.idle_minutes, \
+            self.deliveries_performed, self.in_service = snapshot
+        self.trips[:] = trips
+        self.trip_savings[:] = trip_savings
+        self.packages.clear()
+        self.__next_stop = None
 
     def run_delivery(self, graph: Graph[Union[Place, str]]) -> None:
         """
@@ -57,22 +243,7 @@ class Truck:
         the current location to the next location, and returns to the hub at
         the end
         """
-        self.deliveries_performed += 1
-        previous: str = ''
-        current: str = 'HUB'
-        for pkg in self.packages:
-            previous = current
-            current = pkg.address
-            self.miles_traveled += graph.distance_between(previous, current)
-            pkg.set_delivered(self)
-            info = f'truck {self.number}'
-            info += f' delivered package {pkg.id}'
-            info += f' at {minutes_to_clock(pkg.delivered_at)}'
-            info += f' to address {pkg.address}'
-            info += f' after {round(self.miles_traveled, 1)} miles'
-            debug(info)
-
-        self.packages.clear()
-        self.miles_traveled += graph.distance_between(current, 'HUB')
-        debug(
-            f'returned to HUB with {round(self.miles_traveled, 1)} miles on the odo')
+        self.depart()
+        while self.has_next_delivery():
+            self.deliver_next(graph)
+        self.return_to_hub(graph)